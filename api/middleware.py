@@ -0,0 +1,36 @@
+# api/middleware.py
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.datastructures import Headers
+from starlette.types import Message, Receive, Scope, Send
+
+class StreamingGZipResponder(GZipResponder):
+    """
+    GZip responder passing the streamed responses through uncompressed
+    """
+
+    def __init__(self, app, minimum_size: int, compresslevel: int, excluded_media_types: tuple):
+        super().__init__(app, minimum_size, compresslevel=compresslevel)
+        self.excluded_media_types = excluded_media_types
+
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            media_type = Headers(raw=message["headers"]).get("content-type", "").split(";")[0].strip()
+            # The compressor holds the events back until its buffer fills, send them as the parent sends an encoded body
+            if media_type in self.excluded_media_types:
+                self.content_encoding_set = True
+
+class StreamingGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware for the large JSON responses that leaves Server-Sent Events and NDJSON streams uncompressed,
+    their lines must reach the client as they are produced
+    """
+
+    EXCLUDED_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = StreamingGZipResponder(self.app, self.minimum_size, self.compresslevel, StreamingGZipMiddleware.EXCLUDED_MEDIA_TYPES)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
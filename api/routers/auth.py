@@ -1,31 +1,39 @@
 # api/routers/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from schemas.jwt import Token
 from services.auth import AuthService
 from db import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.jwt import JwtService
+from services.http_cache import HttpCacheService
 from schemas.user import UserGet
 
 # Create the auth router
 auth_router = APIRouter()
 
 @auth_router.post("/token", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     Login to get an access token
     """
 
     # Call the authenticate_user method of the AuthService class to authenticate the user and get the user
-    user = AuthService.authenticate_user(form_data.username.strip(), form_data.password, db)
+    user = await AuthService.authenticate_user(form_data.username.strip(), form_data.password, db)
     # Return the access token as a Pydantic model
-    return Token(access_token=JwtService.create_access_token(user_id=user.id), token_type="bearer")
+    return Token(access_token=JwtService.create_access_token(user=user), token_type="bearer")
 
 @auth_router.get("/me", response_model=UserGet)
-def read_users_me(current_user = Depends(JwtService.get_current_user)):
+async def read_users_me(request: Request, response: Response, current_user = Depends(JwtService.get_current_user)):
     """
     Protected endpoint to get the current user
+
+    Send the ETag back in If-None-Match to get a 304 while the user did not change
     """
+    # The token version changes with the credentials of the user
+    etag = HttpCacheService.make_etag(current_user.id, current_user.email, current_user.token_version)
+    if HttpCacheService.is_not_modified(request, etag):
+        return HttpCacheService.not_modified(etag)
+    HttpCacheService.set_headers(response, etag)
     # Return the current user
     return current_user
\ No newline at end of file
@@ -1,28 +1,133 @@
 # api/routers/summarization.py
-from fastapi import APIRouter, Depends
-from schemas.summarization import SummarizationCreate, SummarizationGet
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from schemas.summarization import SummarizationCreate, SummarizationBatchCreate, SummarizationGet, SummarizationJobGet, SummarizationSearchHit
+from schemas.chat_entry import ChatEntryCreate, ChatEntryGet
 from db import get_db
 from services.jwt import JwtService
-from sqlalchemy.orm import Session
+from services.admission import AdmissionService
+from services.http_cache import HttpCacheService
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.summarization import SummarizationService
-from typing import List
+from services.chat_entry import ChatEntryService
+from typing import List, Optional
 
 summarization_router = APIRouter()
 
-@summarization_router.post("/", response_model=SummarizationGet)
-def create_summarization(summarization: SummarizationCreate, db: Session = Depends(get_db), current_user = Depends(JwtService.get_current_user)):
+@summarization_router.post("/", response_model=SummarizationJobGet, status_code=status.HTTP_202_ACCEPTED)
+async def create_summarization(summarization: SummarizationCreate, db: AsyncSession = Depends(get_db), current_user = Depends(AdmissionService.rate_limit("summarization"))):
     """
     Create a new summarization
+
+    The pipeline runs in the background, poll the returned job to follow its progress.
+    Requests above the rate limit of the user are answered with a 429 and a Retry-After header
+    """
+
+    # Call the enqueue_video_summarization method of the SummarizationService class
+    return await SummarizationService.enqueue_video_summarization(summarization, current_user.id, db)
+
+
+@summarization_router.post("/batch")
+async def create_summarization_batch(batch: SummarizationBatchCreate, db: AsyncSession = Depends(get_db), current_user = Depends(AdmissionService.rate_limit("batch"))):
+    """
+    Create the summarizations of a list of videos or of a playlist
+
+    The result of every video is streamed as a line of JSON, videos that go through the pipeline
+    are first reported as queued with their job id, then again when their job finishes.
+    Requests above the rate limit of the user are answered with a 429 and a Retry-After header
+    """
+    # Create the summarizations and the jobs before the stream starts so that errors are returned as such
+    results, scheduled = await SummarizationService.enqueue_batch_summarization(batch, current_user.id, db)
+    # Call the stream_batch_results method of the SummarizationService class
+    return StreamingResponse(SummarizationService.stream_batch_results(results, scheduled), media_type="application/x-ndjson")
+
+
+@summarization_router.get("/jobs/{job_id}", response_model=SummarizationJobGet)
+async def get_summarization_job(job_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(JwtService.get_current_user)):
+    """
+    Get the state of a summarization job
     """
+    # Call the get_job method of the SummarizationService class
+    return await SummarizationService.get_job(job_id, current_user.id, db)
+
+
+@summarization_router.get("/jobs/{job_id}/events")
+async def stream_summarization_job(job_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(JwtService.get_current_user)):
+    """
+    Stream the progress of a summarization job as Server-Sent Events
+
+    state events report the pipeline stages, token events carry the summary as it is generated,
+    and the stream ends with a done event holding the job or a failed event holding the error
+    """
+    # Check the job before the stream starts so that a missing job is a 404
+    job = await SummarizationService.get_job(job_id, current_user.id, db)
+    # Call the stream_job_events method of the SummarizationService class
+    return StreamingResponse(
+        SummarizationService.stream_job_events(job.id),
+        media_type="text/event-stream",
+        # Keep proxies from caching or buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    # Call the create_summarization method of the SummarizationService class
-    return SummarizationService.generate_video_summarization(summarization, current_user.id, db)
-    
 
 @summarization_router.get("/", response_model=List[SummarizationGet])
-def get_summarizations_by_user(db: Session = Depends(get_db), current_user = Depends(JwtService.get_current_user)):
+async def get_summarizations_by_user(request: Request, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, db: AsyncSession = Depends(get_db), current_user = Depends(JwtService.get_current_user)):
     """
-    Get list of summarizations
+    Get a page of the list of summarizations, newest first
+
+    The cursor of the next page is returned in the X-Next-Cursor header, it is absent on the last page.
+    Send the ETag of a page back in If-None-Match to get a 304 while the library of the user did not change
     """
+    # The page only changes with the library of the user and with the period of the signed URLs it holds
+    etag = HttpCacheService.make_etag(current_user.id, await SummarizationService.get_library_version(current_user.id, db), HttpCacheService.get_signed_url_epoch(), limit, cursor)
+    if HttpCacheService.is_not_modified(request, etag):
+        return HttpCacheService.not_modified(etag)
     # Call the get_summarizations_by_user method of the SummarizationService class
-    return SummarizationService.get_summarizations_by_user(current_user.id, db)
\ No newline at end of file
+    summarizations, next_cursor = await SummarizationService.get_summarizations_by_user(current_user.id, db, limit, cursor)
+    # The page is built from validated models, rendering it directly skips the second validation of the response model
+    response = ORJSONResponse([summarization.dict() for summarization in summarizations])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    HttpCacheService.set_headers(response, etag)
+    return response
+
+
+@summarization_router.get("/search", response_model=List[SummarizationSearchHit])
+async def search_summarizations(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0), db: AsyncSession = Depends(get_db), current_user = Depends(JwtService.get_current_user)):
+    """
+    Search the transcripts and summaries of the summarizations of the current user
+
+    Every word of q must match, in any of its forms. Transcript hits carry their position in the video
+    """
+    # Call the search_summarizations method of the SummarizationService class
+    return await SummarizationService.search_summarizations(q, current_user.id, db, limit, offset)
+
+
+@summarization_router.post("/{summarization_id}/chat", response_model=ChatEntryGet, status_code=status.HTTP_201_CREATED)
+async def create_chat_entry(summarization_id: int, chat_entry: ChatEntryCreate, db: AsyncSession = Depends(get_db), current_user = Depends(AdmissionService.rate_limit("chat"))):
+    """
+    Ask a question about the video of a summarization
+
+    The answer is generated from the parts of the transcript most relevant to the question, returned as sources.
+    Requests above the rate limit of the user, or arriving while the API slots stay busy, are answered with a 429 and a Retry-After header
+    """
+    # Call the create_chat_entry method of the ChatEntryService class
+    return await ChatEntryService.create_chat_entry(summarization_id, chat_entry, current_user.id, db)
+
+
+@summarization_router.get("/{summarization_id}/chat", response_model=List[ChatEntryGet])
+async def get_chat_entries(summarization_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(JwtService.get_current_user)):
+    """
+    Get the questions asked about the video of a summarization, oldest first
+    """
+    # Call the get_chat_entries method of the ChatEntryService class
+    return await ChatEntryService.get_chat_entries(summarization_id, current_user.id, db)
+
+
+@summarization_router.get("/{summarization_id}", response_model=SummarizationGet)
+async def get_summarization(summarization_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(JwtService.get_current_user)):
+    """
+    Get a summarization with fresh URLs to its transcription and summary
+    """
+    # Call the get_summarization method of the SummarizationService class
+    return await SummarizationService.get_summarization(summarization_id, current_user.id, db)
@@ -0,0 +1,105 @@
+# benchmarks/query_plans.py
+"""
+Query plans and latencies of the hot query paths before and after the hot path indexes migration.
+
+Seeds a SQLite database at revision 0002 (the schema before the indexes), runs the queries,
+upgrades to head and runs them again:
+
+    python benchmarks/query_plans.py --users 200 --videos 2000 --per-user 100
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Point the app at a throwaway database before importing it
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "query_plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+
+# Hot queries, parameters are drawn from the seeded ids
+QUERIES = {
+    "list summarizations (keyset page)": (
+        "SELECT summarization.id, summarization.created_at, youtube_video_resource.title FROM summarization "
+        "JOIN youtube_video_resource ON summarization.youtube_video_resource_id = youtube_video_resource.id "
+        "WHERE summarization.user_id = :user_id AND summarization.status = 1 "
+        "ORDER BY summarization.created_at DESC, summarization.id DESC LIMIT 21"
+    ),
+    "summarization of user & video": "SELECT id FROM summarization WHERE user_id = :user_id AND youtube_video_resource_id = :video_id",
+    "summarizations of video": "SELECT id FROM summarization WHERE youtube_video_resource_id = :video_id",
+    "chat entries of summarization": "SELECT id FROM chat_entry WHERE summarization_id = :summarization_id",
+    "jobs of user": "SELECT id FROM summarization_job WHERE user_id = :user_id",
+}
+
+def seed(engine, users: int, videos: int, per_user: int):
+    """
+    Insert users, videos, summarizations (with chat entries) and jobs
+    """
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO user (id, email, password, status) VALUES (:id, :email, 'x', 1)"), [{"id": i, "email": f"user{i}@example.com"} for i in range(1, users + 1)])
+        connection.execute(text("INSERT INTO youtube_video_resource (id, title, youtube_video_id, transcription_url, summarization_url, status) VALUES (:id, :title, :video_id, 't', 's', 1)"), [{"id": i, "title": f"video {i}", "video_id": f"v{i:010d}"} for i in range(1, videos + 1)])
+        summarizations = []
+        for user_id in range(1, users + 1):
+            for video_id in random.sample(range(1, videos + 1), per_user):
+                summarizations.append({"id": len(summarizations) + 1, "user_id": user_id, "video_id": video_id, "created_at": now - timedelta(minutes=random.randint(0, 100000))})
+        connection.execute(text("INSERT INTO summarization (id, user_id, youtube_video_resource_id, created_at, status) VALUES (:id, :user_id, :video_id, :created_at, 1)"), summarizations)
+        connection.execute(text("INSERT INTO chat_entry (summarization_id, input_text, output_text, status) VALUES (:id, 'q', 'a', 1)"), [{"id": s["id"]} for s in summarizations[::3]])
+        connection.execute(text("INSERT INTO summarization_job (user_id, youtube_video_url, youtube_video_id, state, status) VALUES (:user_id, 'u', 'v', 'done', 1)"), [{"user_id": s["user_id"]} for s in summarizations[::2]])
+
+def measure(engine, repeat: int) -> dict:
+    """
+    Get the plan and the median latency in milliseconds of every query
+    """
+
+    results = {}
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            params = {"user_id": random.randint(1, 50), "video_id": random.randint(1, 500), "summarization_id": random.randint(1, 500)}
+            plan = " | ".join(row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + query), params))
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                connection.execute(text(query), params).all()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = (plan, statistics.median(timings))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--per-user", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    random.seed(0)
+
+    config = Config(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+    engine = create_engine(os.environ["DATABASE_URL"])
+
+    command.upgrade(config, "0002")
+    seed(engine, args.users, args.videos, args.per_user)
+    before = measure(engine, args.repeat)
+    command.upgrade(config, "head")
+    # Reconnect, pooled connections keep the statements prepared against the old schema
+    engine.dispose()
+    after = measure(engine, args.repeat)
+
+    print(f"{args.users} users, {args.videos} videos, {args.users * args.per_user} summarizations\n")
+    for name in QUERIES:
+        print(name)
+        print(f"  before {before[name][1]:8.3f} ms  {before[name][0]}")
+        print(f"  after  {after[name][1]:8.3f} ms  {after[name][0]}")
+
+if __name__ == "__main__":
+    main()
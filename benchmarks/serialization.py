@@ -0,0 +1,70 @@
+# benchmarks/serialization.py
+"""
+Serialization cost of the library pages with the standard JSON response and with orjson, and the gzip trade-off.
+
+Builds pages of summarizations shaped like GET /summarization/ and converts them the way FastAPI does
+for a response model (jsonable_encoder) and the way the route does (dict of the validated models), renders
+the body with JSONResponse and with ORJSONResponse, and compresses it at the level used by the app:
+
+    python benchmarks/serialization.py --items 20 100 --runs 2000
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from schemas.summarization import SummarizationGet
+
+def build_page(items: int) -> list:
+    """
+    Page of summarizations with signed URLs of a realistic length
+    """
+
+    signature = "X-Goog-Algorithm=GOOG4-RSA-SHA256&X-Goog-Expires=604800&X-Goog-Signature=" + "0f" * 256
+    return [
+        SummarizationGet(
+            id=index,
+            title=f"Video number {index} about a topic with a reasonably long title",
+            youtube_video_id=f"vid{index:08d}",
+            transcription_url=f"https://storage.googleapis.com/wiser/transcription-vid{index:08d}.txt?{signature}",
+            summarization_url=f"https://storage.googleapis.com/wiser/summarization-vid{index:08d}.txt?{signature}",
+        )
+        for index in range(items)
+    ]
+
+def timed(fn, runs: int) -> float:
+    """
+    Mean duration of a call in microseconds
+    """
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[20, 100], help="summarizations per page")
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'encode us':>10} {'dict us':>10} {'json us':>10} {'orjson us':>10} {'bytes':>8} {'gzip us':>10} {'gzip bytes':>11}")
+    for items in args.items:
+        page = build_page(items)
+        # validation against the response model and conversion to JSON types, shared by both responses
+        encoded = jsonable_encoder(page)
+        encode = timed(lambda: jsonable_encoder(page), args.runs)
+        convert = timed(lambda: [item.dict() for item in page], args.runs)
+        standard = timed(lambda: JSONResponse(encoded).body, args.runs)
+        fast = timed(lambda: ORJSONResponse(encoded).body, args.runs)
+        body = ORJSONResponse(encoded).body
+        compress = timed(lambda: gzip.compress(body, compresslevel=6), args.runs)
+        print(f"{items:>6} {encode:>10.1f} {convert:>10.1f} {standard:>10.1f} {fast:>10.1f} {len(body):>8} {compress:>10.1f} {len(gzip.compress(body, compresslevel=6)):>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# benchmarks/server.py
+"""
+Throughput, latency and memory of the API served by a single default uvicorn process and by server.py.
+
+A library is seeded with the offline backends, then every server is started on the same database and
+clients send authenticated reads (GET /auth/me, GET /summarization/ and GET /health/live) for a fixed
+duration. The memory of a server is the proportional set size of its processes, so the pages shared
+copy-on-write by the workers of server.py are counted once:
+
+    python benchmarks/server.py --workers 4 --duration 15 --concurrency 64
+    python benchmarks/server.py --modes uvicorn server --client-processes 4
+
+Modes: uvicorn-h11 (uvicorn main:app --loop asyncio --http h11), uvicorn (uvicorn main:app, a single
+process) and server (python server.py --workers N).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load
+
+# Requests of the clients, drawn at random
+ENDPOINTS = [("GET /auth/me", "/auth/me", {}), ("GET /summarization/", "/summarization/", {"limit": 20}), ("GET /health/live", "/health/live", {})]
+
+def commands(args, port: int) -> dict:
+    """
+    Command of every mode
+    """
+
+    return {
+        "uvicorn-h11": [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--loop", "asyncio", "--http", "h11", "--no-access-log"],
+        "uvicorn": [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--no-access-log"],
+        "server": [sys.executable, "server.py", "--port", str(port), "--workers", str(args.workers), "--drain-seconds", "0"],
+    }
+
+async def seed(videos: int) -> str:
+    """
+    Create a user with a library of videos in-process, returns its access token
+    """
+
+    import httpx
+    from main import app
+
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://seed", timeout=None) as client:
+            email, password = "benchmark@example.com", "benchmark-password"
+            await client.post("/user/", json={"email": email, "password": password, "password_confirmation": password})
+            token = (await client.post("/auth/token", data={"username": email, "password": password})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            for index in range(videos):
+                job = (await client.post("/summarization/", json={"youtube_video_url": f"https://www.youtube.com/watch?v=server{index:05d}"}, headers=headers)).json()
+                await client.get(f"/summarization/jobs/{job['id']}/events", headers=headers)
+            return token
+    finally:
+        await app.router.shutdown()
+
+def get_processes(pid: int) -> list:
+    """
+    Pids of a process and of its descendants
+    """
+
+    pids = [pid]
+    for child in open(f"/proc/{pid}/task/{pid}/children").read().split():
+        pids += get_processes(int(child))
+    return pids
+
+def get_memory_mb(pid: int) -> dict:
+    """
+    Resident and proportional set sizes of a process tree
+    """
+
+    total = {"rss_mb": 0.0, "pss_mb": 0.0, "processes": 0}
+    for process in get_processes(pid):
+        for line in open(f"/proc/{process}/smaps_rollup"):
+            if line.startswith("Rss:"):
+                total["rss_mb"] += int(line.split()[1]) / 1024
+            elif line.startswith("Pss:"):
+                total["pss_mb"] += int(line.split()[1]) / 1024
+        total["processes"] += 1
+    return total
+
+def wait_ready(base_url: str, timeout: float = 60):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/health/ready").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{base_url} did not become ready")
+
+def run_client(base_url: str, token: str, concurrency: int, duration: float, seed: int) -> dict:
+    """
+    Send requests from concurrency tasks for duration seconds, in a client process
+    """
+
+    import httpx
+
+    random.seed(seed)
+    latencies = {name: [] for name, _, _ in ENDPOINTS}
+    errors = {name: 0 for name, _, _ in ENDPOINTS}
+
+    async def worker(client, deadline: float):
+        while time.monotonic() < deadline:
+            name, path, params = random.choice(ENDPOINTS)
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies[name].append(time.perf_counter() - start)
+            errors[name] += failed
+
+    async def main():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"}, limits=limits, timeout=30) as client:
+            deadline = time.monotonic() + duration
+            await asyncio.gather(*(worker(client, deadline) for _ in range(concurrency)))
+
+    asyncio.run(main())
+    return {"latencies": latencies, "errors": errors}
+
+def bench(args, mode: str, command: list, token: str, port: int) -> dict:
+    """
+    Start a server, load it and stop it
+    """
+
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(base_url)
+        # Warm the caches of every worker before measuring
+        run_client(base_url, token, args.concurrency, 1, 0)
+        clients = max(1, args.client_processes)
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.starmap(run_client, [(base_url, token, max(1, args.concurrency // clients), args.duration, index + 1) for index in range(clients)])
+        memory = get_memory_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+    latencies = {name: sorted(value for result in results for value in result["latencies"][name]) for name, _, _ in ENDPOINTS}
+    errors = {name: sum(result["errors"][name] for result in results) for name, _, _ in ENDPOINTS}
+    count = sum(len(values) for values in latencies.values())
+    return {
+        "requests_per_second": count / args.duration,
+        "endpoints": {name: load.summarize(values, errors[name]) for name, values in latencies.items() if values},
+        **memory,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["uvicorn-h11", "uvicorn", "server"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="workers of server.py")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per mode")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight")
+    parser.add_argument("--client-processes", type=int, default=2, help="processes sending the requests, a single one can saturate before the server")
+    parser.add_argument("--videos", type=int, default=20, help="summarizations of the seeded library")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    load.configure(types.SimpleNamespace(database_url=None, metadata_latency=0, download_latency=0, transcription_latency=0, transcript_words=300, llm_first_token_latency=0, llm_token_latency=0, storage_latency=0))
+    load.migrate()
+    token = asyncio.run(seed(args.videos))
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = bench(args, mode, commands(args, args.port)[mode], token, args.port)
+
+    print(f"{'mode':<12} {'req/s':>9} {'processes':>9} {'rss MB':>9} {'pss MB':>9}")
+    for mode, result in results.items():
+        print(f"{mode:<12} {result['requests_per_second']:>9.1f} {result['processes']:>9} {result['rss_mb']:>9.1f} {result['pss_mb']:>9.1f}")
+    print()
+    print(f"{'mode / endpoint':<36} {'count':>7} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for mode, result in results.items():
+        for name, row in result["endpoints"].items():
+            print(f"{mode + ' ' + name:<36} {row['count']:>7} {row['errors']:>6} {row['p50_ms']:>9.1f} {row['p99_ms']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "modes": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/startup.py
+"""
+Startup time and memory of the app profiles.
+
+Every run imports main in a fresh interpreter with APP_PROFILE set, then reports the time to
+import and build the app, the resident memory of the process and the heavy modules it loaded:
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --profiles full auth --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies of the pipeline that the API does not need to serve a request
+HEAVY_MODULES = ("langchain", "openai", "tiktoken", "pytube", "moviepy", "imageio_ffmpeg", "google.cloud.storage", "numpy", "faiss")
+
+# Run in the child process, prints its measures as JSON
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+# ru_maxrss is in kilobytes on Linux
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "heavy": [name for name in %r if name in sys.modules],
+}))
+"""
+
+def measure(profile: str, env: dict) -> dict:
+    """
+    Import the app of a profile in a fresh interpreter
+    """
+
+    output = subprocess.run([sys.executable, "-c", PROBE % (HEAVY_MODULES,)], cwd=ROOT, env={**env, "APP_PROFILE": profile}, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["full", "api", "auth", "worker"])
+    parser.add_argument("--runs", type=int, default=5, help="imports per profile, the median is reported")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    # Settings without a default in the app, the database is never reached by an import
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}")
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+    results = {}
+    print(f"{'profile':<10} {'import s':>10} {'rss MB':>10} {'modules':>8}  heavy modules")
+    for profile in args.profiles:
+        runs = [measure(profile, env) for _ in range(args.runs)]
+        results[profile] = {
+            "seconds": statistics.median(run["seconds"] for run in runs),
+            "rss_mb": statistics.median(run["rss_mb"] for run in runs),
+            "modules": runs[-1]["modules"],
+            "heavy": runs[-1]["heavy"],
+        }
+        row = results[profile]
+        print(f"{profile:<10} {row['seconds']:>10.3f} {row['rss_mb']:>10.1f} {row['modules']:>8}  {', '.join(row['heavy']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "profiles": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,80 @@
 # db.py
 from sqlalchemy import create_engine, MetaData
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
+from typing import AsyncIterator
 from dotenv import load_dotenv
 import os
 
 # Load environment variables
 load_dotenv()
 
-# Form the connection string
-DATABASE_URL = f"mysql+mysqlconnector://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+# Form the connection string, DATABASE_URL overrides it (e.g. sqlite:///wiser.db for local benchmarks)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+mysqlconnector://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
-# Create the engine
-engine = create_engine(DATABASE_URL)
+# Async drivers of the sync drivers supported by the app
+ASYNC_DRIVERS = {
+    "mysql+mysqlconnector": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_url(url: str) -> str:
+    """
+    Get the connection string of the async driver matching a sync connection string
+    """
+
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+def get_engine_options(url: str) -> dict:
+    """
+    Get the connection pool options of an engine from the environment variables
+    """
+
+    # Check connections before using them so that connections dropped by the server are replaced
+    options = {"pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"}
+    if url.startswith("sqlite"):
+        # SQLite connections are shared between the request handlers and the pipeline workers,
+        # the pool class chosen by the dialect is kept since the sizing options do not apply to it
+        options["connect_args"] = {"check_same_thread": False}
+        return options
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        # Recycle connections before the server closes them (MySQL wait_timeout)
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
+    return options
+
+# The async connection string, ASYNC_DATABASE_URL overrides the one derived from DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_url(DATABASE_URL)
+
+# Create the engine used by the background workers
+engine = create_engine(DATABASE_URL, **get_engine_options(DATABASE_URL))
+
+# Create the engine used by the request handlers
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **get_engine_options(ASYNC_DATABASE_URL))
 
 # Create the session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create the async session, objects stay loaded after a commit since they cannot be lazily refreshed
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create the metadata
 Base = declarative_base()
 
-def get_db() -> Session:
+async def get_db() -> AsyncIterator[AsyncSession]:
     """
-    Initialize a new database session,
+    Initialize a new async database session,
     yield it to the caller for database operations,
     and close the session when the caller is done.
     """
-    
+
     # Initialize a new session
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         # Yield the session to the caller
         yield db
-    finally:
-        # Close the session 
-        db.close()
\ No newline at end of file
@@ -1,34 +1,159 @@
 # main.py
-from fastapi import FastAPI
-from api.routers.user import user_router
-from api.routers.auth import auth_router
-from api.routers.summarization import summarization_router
-from db import Base, engine
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
+from api.middleware import StreamingGZipMiddleware
+from services.job_queue import JobQueueService
+from services.password import PasswordService
+from services.metrics import MetricsService
 from fastapi.middleware.cors import CORSMiddleware
+from services.health import HealthService
+from prometheus_client import CONTENT_TYPE_LATEST
+from db import engine, async_engine
+from dotenv import load_dotenv
+from typing import Optional
+import time
+import os
 
-# Create the database tables if they do not exist yet
-Base.metadata.create_all(bind=engine)
+# Load environment variables for the profile of the app
+load_dotenv()
 
-# Create the FastAPI app
-app = FastAPI()
+# responses smaller than this are sent uncompressed, gzip does not pay for itself on a few hundred bytes
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
 
-# Add a middleware for CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allows CORS from this list of origins
-    allow_credentials=True,  # Allows cookies to be sent with requests
-    allow_methods=["*"],  # Allows all HTTP methods
-    allow_headers=["*"],  # Allows all headers
-)
+# Routers and background work of every profile:
+#   full    every router, the pipelines run in this process (the default)
+#   api     every router, the pipelines are left queued in the database for the pipeline workers
+#   auth    the user and auth routers only, the summarization pipeline is never imported
+#   worker  no router, claims the queued pipelines from the database and runs them
+PROFILES = {
+    "full": {"routers": ("user", "auth", "summarization"), "runs_jobs": True},
+    "api": {"routers": ("user", "auth", "summarization"), "runs_jobs": False},
+    "auth": {"routers": ("user", "auth"), "runs_jobs": False},
+    "worker": {"routers": (), "runs_jobs": True},
+}
 
-# App routers
-app.include_router(user_router, prefix="/user", tags=["User"])
-app.include_router(auth_router, prefix="/auth", tags=["Auth"])
-app.include_router(summarization_router, prefix="/summarization", tags=["Summarization"])
+def include_routers(app: FastAPI, names: tuple):
+    """
+    Add the routers of a profile, their modules are imported here so that a profile only loads the services it serves.
+    """
+    if "user" in names:
+        from api.routers.user import user_router
+        app.include_router(user_router, prefix="/user", tags=["User"])
+    if "auth" in names:
+        from api.routers.auth import auth_router
+        app.include_router(auth_router, prefix="/auth", tags=["Auth"])
+    if "summarization" in names:
+        from api.routers.summarization import summarization_router
+        app.include_router(summarization_router, prefix="/summarization", tags=["Summarization"])
 
-@app.get("/")
-async def root():
+def create_app(profile: Optional[str] = None) -> FastAPI:
     """
-    Root endpoint for the API that returns a simple message to verify that the API is running.
+    Build the app of a profile, APP_PROFILE by default, see PROFILES.
     """
-    return {"message": "Hello World"}
\ No newline at end of file
+    profile = profile or os.getenv("APP_PROFILE", "full")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown app profile: {profile}")
+    settings = PROFILES[profile]
+    # Processes that do not run the pipelines leave the jobs they create in the database
+    JobQueueService.RUNS_JOBS = settings["runs_jobs"]
+
+    # Create the FastAPI app, responses are serialized with orjson
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.state.profile = profile
+
+    # Add a middleware for CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allows CORS from this list of origins
+        allow_credentials=True,  # Allows cookies to be sent with requests
+        allow_methods=["*"],  # Allows all HTTP methods
+        allow_headers=["*"],  # Allows all headers
+        expose_headers=["X-Next-Cursor", "ETag"],  # Lets the frontend read the cursor of the next page and the validator of the response
+    )
+    # Compress the large JSON responses, the event and NDJSON streams are left alone
+    app.add_middleware(StreamingGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=6)
+
+    # Report the connection pools of the request handlers and of the background workers
+    MetricsService.register_database_pools({"async": async_engine, "sync": engine})
+
+    @app.middleware("http")
+    async def observe_request_duration(request: Request, call_next):
+        """
+        Time the requests by route template, streamed responses are timed until their first byte.
+        """
+        start = time.perf_counter()
+        response = await call_next(request)
+        # The route is set once the request is matched, unmatched paths share a label to bound the number of series
+        route = request.scope.get("route")
+        MetricsService.REQUEST_SECONDS.labels(request.method, route.path if route else "unmatched", response.status_code).observe(time.perf_counter() - start)
+        return response
+
+    # App routers
+    include_routers(app, settings["routers"])
+
+    if settings["runs_jobs"]:
+        @app.on_event("startup")
+        def resume_summarization_jobs():
+            """
+            Schedule again the summarization jobs interrupted by the previous shutdown, pipeline workers then claim the queued jobs,
+            and the other processes the jobs whose worker stopped renewing their lease.
+            """
+            from services.openai import OpenAIService
+            from services.summarization import SummarizationService
+            # A SUMMARY_MAX_TOKENS that leaves no room for the summaries stops the process before it runs a pipeline
+            OpenAIService.get_chunk_tokens()
+            if JobQueueService.RECOVERS_JOBS:
+                SummarizationService.recover_pending_jobs(submit=profile == "full")
+            # This process replaces workers that died, their jobs are not left to their lease
+            if JobQueueService.DEAD_WORKERS:
+                SummarizationService.recover_pending_jobs(submit=profile == "full", workers=JobQueueService.DEAD_WORKERS)
+            if profile == "worker":
+                JobQueueService.start_polling(SummarizationService.claim_queued_jobs, SummarizationService.run_summarization_job)
+            else:
+                JobQueueService.start_polling(SummarizationService.claim_expired_jobs, SummarizationService.run_summarization_job, SummarizationService.JOB_LEASE_SECONDS / 3)
+
+    @app.on_event("shutdown")
+    def stop_summarization_workers():
+        """
+        Stop the background workers without waiting for the running pipelines, they are resumed on the next startup,
+        and the password hashing processes.
+        """
+        JobQueueService.shutdown(wait=False)
+        PasswordService.shutdown()
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """
+        Prometheus metrics endpoint.
+        """
+        return Response(MetricsService.render(), media_type=CONTENT_TYPE_LATEST)
+
+    @app.get("/health/live", include_in_schema=False)
+    async def live():
+        """
+        Liveness endpoint, answers while the event loop of the process runs.
+        """
+        return {"status": "ok", "pid": os.getpid()}
+
+    @app.get("/health/ready", include_in_schema=False)
+    async def ready():
+        """
+        Readiness endpoint, a 503 while the process drains or its database pool does not answer.
+        """
+        error = "draining" if HealthService.is_draining() else await HealthService.check_database()
+        content = {"status": "ready" if error is None else "unavailable", "pid": os.getpid(), "pool": HealthService.get_pool_status()}
+        if error is not None:
+            content["error"] = error
+        return ORJSONResponse(content, status_code=200 if error is None else 503)
+
+    @app.get("/")
+    async def root():
+        """
+        Root endpoint for the API that returns a simple message to verify that the API is running.
+        """
+        return {"message": "Hello World"}
+
+    return app
+
+# App of the configured profile for `uvicorn main:app`
+app = create_app()
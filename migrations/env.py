@@ -0,0 +1,44 @@
+# migrations/env.py
+from alembic import context
+from sqlalchemy import create_engine
+from db import Base, DATABASE_URL
+# Import the models so that they are registered in the metadata
+from models.user import UserModel
+from models.summarization import SummarizationModel
+from models.summarization_job import SummarizationJobModel
+from models.chat_entry import ChatEntryModel
+from models.youtube_video_resource import YoutubeVideoResourceModel
+
+# Alembic configuration, sqlalchemy.url can be set by callers (e.g. the benchmarks) to override DATABASE_URL
+config = context.config
+url = config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+# Metadata compared with the database by --autogenerate
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """
+    Generate the SQL of the migrations without connecting to the database (alembic upgrade --sql)
+    """
+
+    context.configure(url=url, target_metadata=target_metadata, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """
+    Run the migrations against the database
+    """
+
+    connectable = create_engine(url)
+    with connectable.connect() as connection:
+        # SQLite cannot alter tables, batch mode recreates them
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=connection.dialect.name == "sqlite")
+        with context.begin_transaction():
+            context.run_migrations()
+    connectable.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,80 @@
+"""initial schema
+
+Tables as created by Base.metadata.create_all before migrations were introduced,
+existing databases are marked as migrated with `alembic stamp 0001`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def base_columns():
+    # Columns of models.base.BaseModel
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.SmallInteger(), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user',
+        *base_columns(),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    op.create_index('ix_user_id', 'user', ['id'])
+
+    op.create_table(
+        'youtube_video_resource',
+        *base_columns(),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('youtube_video_id', sa.String(length=255), nullable=False),
+        sa.Column('transcription_url', sa.String(length=1000), nullable=False),
+        sa.Column('summarization_url', sa.String(length=1000), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('youtube_video_id'),
+    )
+    op.create_index('ix_youtube_video_resource_id', 'youtube_video_resource', ['id'])
+
+    op.create_table(
+        'summarization',
+        *base_columns(),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('youtube_video_resource_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['youtube_video_resource_id'], ['youtube_video_resource.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_summarization_id', 'summarization', ['id'])
+
+    op.create_table(
+        'chat_entry',
+        *base_columns(),
+        sa.Column('summarization_id', sa.Integer(), nullable=True),
+        sa.Column('input_text', sa.String(length=255), nullable=False),
+        sa.Column('output_text', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['summarization_id'], ['summarization.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_chat_entry_id', 'chat_entry', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('chat_entry')
+    op.drop_table('summarization')
+    op.drop_table('youtube_video_resource')
+    op.drop_table('user')
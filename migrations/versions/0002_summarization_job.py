@@ -0,0 +1,45 @@
+"""summarization job
+
+Jobs of the summarizations running in the background. Databases created by create_all
+once jobs existed but before migrations were introduced already have the table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:15:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('summarization_job'):
+        return
+
+    op.create_table(
+        'summarization_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.SmallInteger(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('youtube_video_url', sa.String(length=1000), nullable=False),
+        sa.Column('youtube_video_id', sa.String(length=255), nullable=False),
+        sa.Column('state', sa.String(length=32), nullable=False),
+        sa.Column('error', sa.String(length=1000), nullable=True),
+        sa.Column('summarization_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['summarization_id'], ['summarization.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_summarization_job_id', 'summarization_job', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('summarization_job')
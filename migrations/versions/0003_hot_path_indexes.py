@@ -0,0 +1,68 @@
+"""hot path indexes
+
+Indexes for the queries run on every request and pipeline:
+- the keyset listing of a user's summarizations, ordered by (created_at, id),
+- the lookup of a user's summarization of a video, now also a unique key,
+- the summarizations of a video and the chat entries of a summarization,
+- the jobs of a user.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:30:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def get_index_names(table: str) -> set:
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    # Keep the oldest summarization when a race stored a video twice for the same user,
+    # the jobs and chat entries of the duplicates are moved to the kept one first
+    for table in ('summarization_job', 'chat_entry'):
+        op.execute(
+            f"UPDATE {table} SET summarization_id = ("
+            "SELECT MIN(kept.id) FROM summarization AS duplicate "
+            "JOIN summarization AS kept ON kept.user_id = duplicate.user_id AND kept.youtube_video_resource_id = duplicate.youtube_video_resource_id "
+            f"WHERE duplicate.id = {table}.summarization_id"
+            ") WHERE summarization_id IS NOT NULL"
+        )
+    op.execute(
+        "DELETE FROM summarization WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM summarization GROUP BY user_id, youtube_video_resource_id) AS kept"
+        ")"
+    )
+
+    # The indexes on foreign key columns are kept by the downgrade, they exist when upgrading again
+    summarization_indexes = get_index_names('summarization')
+    with op.batch_alter_table('summarization') as batch_op:
+        batch_op.create_unique_constraint('uq_summarization_user_id_youtube_video_resource_id', ['user_id', 'youtube_video_resource_id'])
+        if 'ix_summarization_user_id_created_at_id' not in summarization_indexes:
+            batch_op.create_index('ix_summarization_user_id_created_at_id', ['user_id', 'created_at', 'id'])
+        if 'ix_summarization_youtube_video_resource_id' not in summarization_indexes:
+            batch_op.create_index('ix_summarization_youtube_video_resource_id', ['youtube_video_resource_id'])
+
+    if 'ix_chat_entry_summarization_id' not in get_index_names('chat_entry'):
+        with op.batch_alter_table('chat_entry') as batch_op:
+            batch_op.create_index('ix_chat_entry_summarization_id', ['summarization_id'])
+
+    if 'ix_summarization_job_user_id' not in get_index_names('summarization_job'):
+        with op.batch_alter_table('summarization_job') as batch_op:
+            batch_op.create_index('ix_summarization_job_user_id', ['user_id'])
+
+
+def downgrade() -> None:
+    # The indexes are kept: MySQL dropped the indexes it created for the foreign keys of the
+    # previous revision when these were added, and refuses to drop the ones a foreign key needs.
+    # ix_summarization_user_id_created_at_id covers the user_id key once the unique constraint is dropped.
+    with op.batch_alter_table('summarization') as batch_op:
+        batch_op.drop_constraint('uq_summarization_user_id_youtube_video_resource_id', type_='unique')
@@ -0,0 +1,29 @@
+"""chat entry text
+
+Questions can be up to 1000 characters and answers are not limited.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('chat_entry') as batch_op:
+        batch_op.alter_column('input_text', existing_type=sa.String(255), type_=sa.String(1000), existing_nullable=False)
+        batch_op.alter_column('output_text', existing_type=sa.String(255), type_=sa.Text(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('chat_entry') as batch_op:
+        batch_op.alter_column('output_text', existing_type=sa.Text(), type_=sa.String(255), existing_nullable=False)
+        batch_op.alter_column('input_text', existing_type=sa.String(1000), type_=sa.String(255), existing_nullable=False)
@@ -0,0 +1,27 @@
+"""summarization job timings
+
+Duration of the pipeline stages of every job.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('summarization_job') as batch_op:
+        batch_op.add_column(sa.Column('timings', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('summarization_job') as batch_op:
+        batch_op.drop_column('timings')
@@ -0,0 +1,28 @@
+"""user library version
+
+Version of the library of every user, bumped when a summarization of the user is created or
+deleted, the ETags of the library are derived from it.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('library_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('library_version')
@@ -0,0 +1,30 @@
+"""user password version
+
+Version of the password of every user, bumped when the password is changed, the access tokens
+embed it. Rehashing the password at login keeps it, so the sessions of the user stay valid.
+Existing users start at version 0. Tokens issued before this revision have no version and stay
+valid until they expire, their user is loaded from the database on every request.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('password_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('password_version')
@@ -0,0 +1,30 @@
+"""summarization job lease
+
+Worker running every summarization job and the last renewal of its lease. A job whose lease
+was not renewed for JOB_LEASE_SECONDS is queued again, the jobs of live workers are left alone.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:30:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('summarization_job') as batch_op:
+        batch_op.add_column(sa.Column('claimed_by', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('summarization_job') as batch_op:
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('claimed_by')
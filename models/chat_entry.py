@@ -1,5 +1,5 @@
 # models/chat_entry.py
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, ForeignKey
 from sqlalchemy.orm import relationship
 from models.base import BaseModel
 
@@ -13,9 +13,10 @@ class ChatEntryModel(BaseModel):
     __tablename__ = "chat_entry"
 
     # Model's specific attributes
-    summarization_id = Column(Integer, ForeignKey('summarization.id'))
-    input_text = Column(String(255), nullable=False)
-    output_text = Column(String(255), nullable=False)
+    summarization_id = Column(Integer, ForeignKey('summarization.id'), index=True)
+    # question of the user and answer generated from the transcript of the video
+    input_text = Column(String(1000), nullable=False)
+    output_text = Column(Text, nullable=False)
 
     # Relationships
     summarization = relationship("SummarizationModel", back_populates="chat_entries")
\ No newline at end of file
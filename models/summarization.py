@@ -1,5 +1,5 @@
 # models/summarization.py
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from models.base import BaseModel
 from models.chat_entry import ChatEntryModel
@@ -13,6 +13,13 @@ class SummarizationModel(BaseModel):
     # Table name
     __tablename__ = "summarization"
 
+    # Indexes of the hot query paths, see migrations/versions/0003_hot_path_indexes.py
+    __table_args__ = (
+        UniqueConstraint("user_id", "youtube_video_resource_id", name="uq_summarization_user_id_youtube_video_resource_id"),
+        Index("ix_summarization_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_summarization_youtube_video_resource_id", "youtube_video_resource_id"),
+    )
+
     # Model's specific attributes
     user_id = Column(Integer, ForeignKey('user.id'))
     youtube_video_resource_id = Column(Integer, ForeignKey('youtube_video_resource.id'))
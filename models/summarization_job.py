@@ -0,0 +1,43 @@
+# models/summarization_job.py
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON
+from sqlalchemy.orm import relationship
+from models.base import BaseModel
+
+class SummarizationJobModel(BaseModel):
+    """
+    SummarizationJob model class that inherits from BaseModel and maps to the summarization_job table in the database.
+
+    A job tracks a summarization request while the pipeline runs in the background.
+    """
+
+    # Table name
+    __tablename__ = "summarization_job"
+
+    # Pipeline states reported to the client
+    QUEUED = "queued"
+    DOWNLOADING = "downloading"
+    TRANSCRIBING = "transcribing"
+    SUMMARIZING = "summarizing"
+    DONE = "done"
+    FAILED = "failed"
+
+    # States in which the job is still waiting for or running in a worker
+    PENDING_STATES = (QUEUED, DOWNLOADING, TRANSCRIBING, SUMMARIZING)
+
+    # Model's specific attributes
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=False, index=True)
+    youtube_video_url = Column(String(1000), nullable=False)
+    youtube_video_id = Column(String(255), nullable=False)
+    state = Column(String(32), nullable=False, default=QUEUED)
+    error = Column(String(1000), nullable=True)
+    summarization_id = Column(Integer, ForeignKey('summarization.id'), nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # duration in seconds of the pipeline stages run for the job, set when it finishes
+    timings = Column(JSON, nullable=True)
+    # worker running the job, see JobQueueService.get_worker_id, and the last renewal of its lease
+    claimed_by = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    summarization = relationship("SummarizationModel")
@@ -1,11 +1,9 @@
 # models/user.py
-from sqlalchemy import Column, String
+from sqlalchemy import Column, String, Integer
 from models.base import BaseModel
 from sqlalchemy.orm import relationship
 from models.summarization import SummarizationModel
 
-import bcrypt
-
 class UserModel(BaseModel):
     """
     User model class that inherits from BaseModel and maps to the user table in the database.
@@ -17,42 +15,31 @@ class UserModel(BaseModel):
     # Model's specific attributes
     email = Column(String(255), unique=True, nullable=False)
     _password = Column("password", String(255), nullable=False)
+    # Bumped whenever a summarization of the user is created or deleted, see SummarizationService.library_version_update
+    library_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped whenever the user changes the password, rehashing the same password at login keeps it, see PasswordService.get_token_version
+    password_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     summarizations = relationship("SummarizationModel", back_populates="user")
 
     @property
-    def password(self):
-        """
-        Getter method for the password field
-
-        This property raises an AttributeError since the password attribute is not readable.
+    def password_hash(self) -> str:
         """
-
-        raise AttributeError("Password is not a readable attribute")
-
-    @password.setter
-    def password(self, password):
+        Getter method for the bcrypt hash of the password
         """
-        Setter method for the password field
 
-        This property hashes the password using bcrypt and stores the hash in the _password field.
-
-        Parameters
-        ----------
-        password : str
-            Password to hash
-        """
-        
-        self._password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+        return self._password.decode("utf-8") if isinstance(self._password, bytes) else self._password
 
-    def verify_password(self, password):
+    @password_hash.setter
+    def password_hash(self, password_hash: str):
         """
-        Verify the password hash against the password provided
+        Setter method for the bcrypt hash of the password
 
         Parameters
         ----------
-        password : str
+        password_hash : str
+            Password hash created by PasswordService
         """
 
-        return bcrypt.checkpw(password.encode("utf-8"), self._password.encode("utf-8"))
+        self._password = password_hash
@@ -0,0 +1,26 @@
+# schemas/chat_entry.py
+from pydantic import BaseModel, Field
+from typing import List
+from datetime import datetime
+from schemas.transcript import TranscriptSegment
+
+class ChatEntryCreate(BaseModel):
+    """
+    Pydantic model for asking a question about a summarized video
+    """
+
+    question: str = Field(..., description="Question about the video", min_length=1, max_length=1000)
+
+class ChatEntryGet(BaseModel):
+    """
+    Pydantic model for retrieving a chat entry
+    """
+
+    id: int
+    input_text: str = Field(..., description="Question of the user")
+    output_text: str = Field(..., description="Answer generated from the transcript of the video")
+    created_at: datetime
+    sources: List[TranscriptSegment] = Field([], description="Transcript chunks the answer was generated from, only returned when the question is asked")
+
+    class Config:
+        orm_mode = True
@@ -1,22 +1,85 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, root_validator
+from typing import Dict, List, Optional
+from datetime import datetime
 
 class SummarizationCreate(BaseModel):
     """
     Pydantic model for creating a summarization
     """
-    
+
     youtube_video_url: str = Field(..., description="Youtube video URL of the video to be summarized")
 
+class SummarizationBatchCreate(BaseModel):
+    """
+    Pydantic model for creating the summarizations of a list of videos or of a playlist
+    """
+
+    youtube_video_urls: List[str] = Field([], description="Youtube video URLs of the videos to be summarized")
+    playlist_url: Optional[str] = Field(None, description="Youtube playlist URL, its videos are added to the list")
+
+    @root_validator
+    def videos_given(cls, values):
+        """
+        Pydantic validator to check that the batch is not empty
+        """
+        if not values.get('youtube_video_urls') and not values.get('playlist_url'):
+            raise ValueError('Provide youtube_video_urls or a playlist_url')
+        return values
+
+class SummarizationBatchItem(BaseModel):
+    """
+    Pydantic model for the result of a video of a batch, streamed as a line of JSON
+    """
+
+    youtube_video_url: str
+    youtube_video_id: Optional[str] = None
+    state: str = Field(..., description="queued while the pipeline runs, then done or failed")
+    job_id: Optional[int] = Field(None, description="Id of the summarization job, only for videos that go through the pipeline")
+    summarization_id: Optional[int] = None
+    error: Optional[str] = None
+
 class SummarizationGet(BaseModel):
     """
     Pydantic model for retrieving a summarization
     """
-    
+
     id: int
     title: str
     youtube_video_id: str
+    transcription_url: Optional[str] = Field(None, description="Signed URL of the transcription")
+    summarization_url: Optional[str] = Field(None, description="Signed URL of the summarization")
+
+    class Config:
+        orm_mode = True
+
+class SummarizationSearchHit(BaseModel):
+    """
+    Pydantic model for a passage of a transcript or summary matching a search
+    """
+
+    summarization_id: int
+    title: str
+    youtube_video_id: str
+    kind: str = Field(..., description="transcript or summary")
+    start: Optional[float] = Field(None, description="Start of the passage in seconds from the beginning of the video, None for summaries and untimed transcripts")
+    end: Optional[float] = None
+    snippet: str = Field(..., description="Text around the matches, which are between **")
+    score: float = Field(..., description="Relevance of the passage, higher is better")
+    url: str = Field(..., description="URL of the video at the position of the passage")
+
+class SummarizationJobGet(BaseModel):
+    """
+    Pydantic model for retrieving a summarization job
+    """
+
+    id: int
+    state: str = Field(..., description="queued, downloading, transcribing, summarizing, done or failed")
+    youtube_video_id: str
+    summarization_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    timings: Optional[Dict[str, float]] = Field(None, description="Duration in seconds of the pipeline stages run for the job, set when it finishes")
 
-    
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
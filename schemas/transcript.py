@@ -0,0 +1,20 @@
+# schemas/transcript.py
+from pydantic import BaseModel, Field
+from typing import List
+
+class TranscriptSegment(BaseModel):
+    """
+    Pydantic model for a timestamped segment of a transcript
+    """
+
+    start: float = Field(..., description="Start of the segment in seconds from the beginning of the video")
+    end: float = Field(..., description="End of the segment in seconds from the beginning of the video")
+    text: str
+
+class Transcript(BaseModel):
+    """
+    Pydantic model for the transcript of a video
+    """
+
+    text: str
+    segments: List[TranscriptSegment] = []
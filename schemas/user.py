@@ -53,3 +53,10 @@ class UserGet(UserBase):
 
     class Config:
         orm_mode = True
+
+class CurrentUser(UserGet):
+    """
+    Pydantic model for the authenticated user, built from the access token or the user cache
+    """
+
+    token_version: str
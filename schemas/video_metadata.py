@@ -0,0 +1,26 @@
+# schemas/video_metadata.py
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class AudioStreamInfo(BaseModel):
+    """
+    Pydantic model for an audio stream of a video
+    """
+
+    itag: int
+    subtype: str = Field(..., description="Container of the stream, e.g. mp4 or webm")
+    abr: int = Field(0, description="Average bitrate of the stream in kbps")
+    url: str = Field(..., description="Download URL of the stream, signed by YouTube for a few hours")
+
+class VideoMetadata(BaseModel):
+    """
+    Pydantic model for the metadata of a video, or the reason it cannot be summarized
+    """
+
+    video_id: str
+    title: Optional[str] = None
+    length: Optional[int] = Field(None, description="Length of the video in seconds")
+    audio_streams: List[AudioStreamInfo] = []
+    error: Optional[str] = Field(None, description="Reason the video cannot be read, set instead of the metadata")
+    # time.time() after which the URLs of the audio streams must be fetched again
+    streams_expire_at: Optional[float] = None
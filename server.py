@@ -0,0 +1,212 @@
+# server.py
+"""
+Production server of the API: a master process that loads the app once and forks the workers.
+
+The app and, for the profiles that run pipelines or serve the summarization endpoints, their heavy
+dependencies are imported before forking, so the workers share those memory pages copy-on-write.
+Every worker runs uvicorn on uvloop with the httptools parser on the socket bound by the master.
+The master replaces a worker that dies and, on SIGTERM or SIGINT, has the workers drain:
+a worker stops being ready, keeps serving for DRAIN_SECONDS so the load balancer notices,
+then stops accepting connections and waits up to GRACEFUL_TIMEOUT_SECONDS for the requests in flight.
+
+    python server.py --workers 4 --port 8000
+    APP_PROFILE=worker python server.py --workers 2 --port 8001
+"""
+import argparse
+import gc
+import glob
+import importlib
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+# load environment variables for the server
+load_dotenv()
+
+# Modules loaded on first use by the pipeline, imported before forking by the profiles that need them
+PIPELINE_MODULES = ("langchain.llms", "langchain.chains.summarize.map_reduce_prompt", "openai", "tiktoken", "pytube", "imageio_ffmpeg", "google.cloud.storage")
+# Seconds a worker has to stay up to be replaced at once when it dies, workers crashing on startup are replaced after a pause
+MIN_WORKER_UPTIME_SECONDS = 5
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--profile", default=os.getenv("APP_PROFILE", "full"), help="profile of the app, see main.PROFILES")
+    parser.add_argument("--drain-seconds", type=float, default=float(os.getenv("DRAIN_SECONDS", "5")), help="seconds a worker keeps serving once it reports not ready")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30")), help="seconds the requests in flight have to finish")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE_SECONDS", "5")), help="seconds an idle connection is kept open")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("BACKLOG", "2048")))
+    parser.add_argument("--no-preload-pipeline", dest="preload_pipeline", action="store_false", help="leave the pipeline dependencies to be imported by every worker on first use")
+    return parser.parse_args()
+
+def configure_metrics(workers: int):
+    """
+    Aggregate the metrics of the workers, before prometheus_client is imported
+    """
+
+    if workers > 1 or "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        directory = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="wiser-metrics-"))
+        os.makedirs(directory, exist_ok=True)
+        # The files of a previous run would be added to the counters of this one
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """
+    Bind the listening socket shared by the workers
+    """
+
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def preload(args: argparse.Namespace):
+    """
+    Build the app in the master, with the pipeline dependencies of the profiles that use them
+    """
+
+    # main builds the app of APP_PROFILE when it is imported
+    os.environ["APP_PROFILE"] = args.profile
+    import main
+
+    app = main.app
+    settings = main.PROFILES[args.profile]
+    if args.preload_pipeline and (settings["runs_jobs"] or "summarization" in settings["routers"]):
+        for name in PIPELINE_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                # Optional backends that are not installed are never used
+                pass
+    # Objects loaded so far live as long as the workers, keep the collector from writing to their pages
+    gc.freeze()
+    return app
+
+def run_worker(app, sock: socket.socket, args: argparse.Namespace, recovers_jobs: bool, dead_workers: tuple = ()):
+    """
+    Serve the app in a forked worker until it is told to stop
+    """
+
+    import asyncio
+    import uvicorn
+    from db import engine, async_engine
+    from services.health import HealthService
+    from services.job_queue import JobQueueService
+
+    # The master handles its signals itself, the worker gets uvicorn's
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Connections opened before the fork belong to the master, the worker opens its own
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    # A single worker of the deployment queues the interrupted jobs again
+    JobQueueService.RECOVERS_JOBS = recovers_jobs
+    # A replacement queues again the jobs of the workers it replaces at once
+    JobQueueService.DEAD_WORKERS = tuple(JobQueueService.get_worker_id(pid) for pid in dead_workers)
+
+    class DrainingServer(uvicorn.Server):
+        """
+        uvicorn server that reports itself not ready for drain_seconds before it stops accepting connections
+        """
+
+        def handle_exit(self, sig, frame):
+            # A second signal stops the worker at once
+            if HealthService.is_draining() or args.drain_seconds <= 0:
+                return super().handle_exit(sig, frame)
+            HealthService.start_draining()
+            # uvicorn runs the handler in the event loop
+            asyncio.get_running_loop().call_later(args.drain_seconds, super().handle_exit, sig, frame)
+
+    config = uvicorn.Config(
+        app,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=False,
+    )
+    DrainingServer(config).run(sockets=[sock])
+
+def spawn(app, sock: socket.socket, args: argparse.Namespace, recovers_jobs: bool, dead_workers: tuple = ()) -> int:
+    """
+    Fork a worker, returns its pid in the master
+    """
+
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock, args, recovers_jobs, dead_workers)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            # Skip the exit handlers of the master, they belong to it
+            os._exit(code)
+    return pid
+
+def serve(args: argparse.Namespace):
+    """
+    Run the workers until SIGTERM or SIGINT, replacing the ones that die
+    """
+
+    configure_metrics(args.workers)
+    sock = bind_socket(args.host, args.port, args.backlog)
+    app = preload(args)
+    from prometheus_client import multiprocess
+
+    # Workers by pid with the time they started
+    workers = {}
+    for index in range(args.workers):
+        workers[spawn(app, sock, args, recovers_jobs=index == 0)] = time.monotonic()
+    print(f"Serving the {args.profile} profile on {args.host}:{args.port} with {args.workers} workers", file=sys.stderr)
+
+    stopping = {"deadline": None}
+
+    def stop(sig, frame):
+        if stopping["deadline"] is None:
+            # Drain, then let the requests in flight finish, then the workers are killed
+            stopping["deadline"] = time.monotonic() + args.drain_seconds + args.graceful_timeout + 5
+        for pid in list(workers):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if stopping["deadline"] is not None and time.monotonic() > stopping["deadline"]:
+                stop(signal.SIGKILL, None)
+            time.sleep(0.1)
+            continue
+        started = workers.pop(pid, None)
+        if started is None:
+            continue
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            multiprocess.mark_process_dead(pid)
+        if stopping["deadline"] is None:
+            print(f"Worker {pid} exited with status {status}, starting another one", file=sys.stderr)
+            if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+                time.sleep(MIN_WORKER_UPTIME_SECONDS)
+            workers[spawn(app, sock, args, recovers_jobs=False, dead_workers=(pid,))] = time.monotonic()
+    sock.close()
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    serve(parse_args())
@@ -0,0 +1,289 @@
+# services/admission.py
+from services.jwt import JwtService
+from services.metrics import MetricsService
+from fastapi import Depends, HTTPException, status
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from typing import Iterator, Optional
+import asyncio
+import math
+import threading
+import time
+import uuid
+import os
+
+# load environment variables for the admission control
+load_dotenv()
+
+class MemoryAdmissionBackend:
+    """
+    Admission backend keeping the token buckets and the slots in this process
+    """
+
+    # the backend does not do I/O, it is called from the event loop directly
+    blocking = False
+
+    def __init__(self):
+        # (tokens, updated) by bucket key
+        self._buckets = {}
+        # holders by slot name
+        self._slots = {}
+        self._condition = threading.Condition()
+
+    def take_token(self, key: str, rate: float, burst: int) -> float:
+        """
+        Take a token from a bucket
+
+        Returns
+        -------
+        float
+            0 when a token was taken, otherwise the seconds until the next token
+        """
+
+        with self._condition:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            return wait
+
+    def acquire_slot(self, name: str, limit: int, holder: str, timeout: Optional[float]) -> bool:
+        """
+        Wait for one of the limit slots of a name to be free and hold it
+
+        Returns
+        -------
+        bool
+            False when no slot was freed within the timeout
+        """
+
+        with self._condition:
+            holders = self._slots.setdefault(name, set())
+            if not self._condition.wait_for(lambda: len(holders) < limit, timeout):
+                return False
+            holders.add(holder)
+            return True
+
+    def release_slot(self, name: str, holder: str):
+        """
+        Free a slot held by acquire_slot
+        """
+
+        with self._condition:
+            self._slots.get(name, set()).discard(holder)
+            self._condition.notify_all()
+
+class RedisAdmissionBackend:
+    """
+    Admission backend keeping the token buckets and the slots in Redis, shared by the processes of every host
+
+    Slots are leased, a process that dies while holding one only blocks it until its lease expires.
+    """
+
+    # the backend sends requests to Redis, it is called from a thread
+    blocking = True
+
+    # refill the bucket from the time elapsed since its last update, then take a token if there is one
+    TAKE_TOKEN = """
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = math.min(burst, (tonumber(state[1]) or burst) + (now - (tonumber(state[2]) or now)) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+    # drop the expired leases, then lease a slot if fewer than the limit are held
+    ACQUIRE_SLOT = """
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+    if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[1]) then
+        redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, lease_seconds: float, poll_seconds: float):
+        # imported here so that redis is only required by the deployments that use it
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        # seconds after which the slot of a holder that did not release it is freed
+        self.lease_seconds = lease_seconds
+        # interval at which a waiting holder checks for a free slot
+        self.poll_seconds = poll_seconds
+        self._take_token = self.client.register_script(RedisAdmissionBackend.TAKE_TOKEN)
+        self._acquire_slot = self.client.register_script(RedisAdmissionBackend.ACQUIRE_SLOT)
+
+    def take_token(self, key: str, rate: float, burst: int) -> float:
+        return float(self._take_token(keys=[f"wiser:bucket:{key}"], args=[rate, burst]))
+
+    def acquire_slot(self, name: str, limit: int, holder: str, timeout: Optional[float]) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._acquire_slot(keys=[f"wiser:slots:{name}"], args=[limit, self.lease_seconds, holder]):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_seconds)
+        return True
+
+    def release_slot(self, name: str, holder: str):
+        self.client.zrem(f"wiser:slots:{name}", holder)
+
+class AdmissionService:
+    """
+    Service class for admitting the expensive work of the API
+
+    Requests to the expensive endpoints take a token from a bucket of the user, refilled at a
+    steady rate, and are answered with a 429 once it is empty. The pipeline stages hold a slot
+    while they run, so that the transcodes and the calls to the APIs are bounded however many
+    pipelines run: slots are counted per process with the memory backend and across processes
+    with the redis backend.
+    """
+
+    # requests per minute and burst of the buckets of every user by endpoint, a rate of 0 disables the bucket
+    LIMITS = {
+        "summarization": (float(os.getenv("RATE_LIMIT_SUMMARIZATION_PER_MINUTE", "10")), int(os.getenv("RATE_LIMIT_SUMMARIZATION_BURST", "5"))),
+        "batch": (float(os.getenv("RATE_LIMIT_BATCH_PER_MINUTE", "2")), int(os.getenv("RATE_LIMIT_BATCH_BURST", "2"))),
+        "chat": (float(os.getenv("RATE_LIMIT_CHAT_PER_MINUTE", "30")), int(os.getenv("RATE_LIMIT_CHAT_BURST", "10"))),
+    }
+    # stages held at the same time, ffmpeg transcodes are CPU bound, transcription, completion and embedding calls wait on the network
+    SLOTS = {
+        "transcode": int(os.getenv("ADMISSION_TRANSCODE_SLOTS", str(os.cpu_count() or 1))),
+        "api": int(os.getenv("ADMISSION_API_SLOTS", "8")),
+    }
+    # seconds a request waits for a slot before it is answered with a 429, workers wait as long as it takes
+    REQUEST_SLOT_WAIT_SECONDS = float(os.getenv("ADMISSION_REQUEST_SLOT_WAIT_SECONDS", "5"))
+    # backend of the buckets and the slots, memory or redis
+    BACKEND = os.getenv("ADMISSION_BACKEND", "memory")
+    # settings of the redis backend
+    REDIS_URL = os.getenv("ADMISSION_REDIS_URL", "redis://localhost:6379/0")
+    SLOT_LEASE_SECONDS = float(os.getenv("ADMISSION_SLOT_LEASE_SECONDS", "900"))
+    SLOT_POLL_SECONDS = float(os.getenv("ADMISSION_SLOT_POLL_SECONDS", "0.1"))
+
+    # the backend is created on first use
+    _backend = None
+    _lock = threading.Lock()
+    # slots held by the current thread, so that nested stages of the same kind take a single slot
+    _held = threading.local()
+
+    @staticmethod
+    def get_backend():
+        """
+        Get the configured backend
+
+        Returns
+        -------
+        MemoryAdmissionBackend or RedisAdmissionBackend
+        """
+
+        with AdmissionService._lock:
+            if AdmissionService._backend is None:
+                if AdmissionService.BACKEND == "memory":
+                    AdmissionService._backend = MemoryAdmissionBackend()
+                elif AdmissionService.BACKEND == "redis":
+                    AdmissionService._backend = RedisAdmissionBackend(AdmissionService.REDIS_URL, AdmissionService.SLOT_LEASE_SECONDS, AdmissionService.SLOT_POLL_SECONDS)
+                else:
+                    raise ValueError(f"Unknown admission backend: {AdmissionService.BACKEND}")
+            return AdmissionService._backend
+
+    @staticmethod
+    async def take_token(name: str, user_id: int):
+        """
+        Take a token from the bucket of a user for an endpoint
+
+        Parameters
+        ----------
+        name : str
+            Name of the limit of the endpoint
+        user_id : int
+            Id of the user
+
+        Raises
+        ------
+        HTTPException
+            429 with the seconds until the next token in Retry-After when the bucket is empty
+        """
+
+        per_minute, burst = AdmissionService.LIMITS[name]
+        if per_minute <= 0:
+            return
+        backend = AdmissionService.get_backend()
+        args = (f"{name}:{user_id}", per_minute / 60, burst)
+        wait = await asyncio.to_thread(backend.take_token, *args) if backend.blocking else backend.take_token(*args)
+        if wait > 0:
+            MetricsService.ADMISSION_REJECTIONS.labels(name).inc()
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests", headers={"Retry-After": str(math.ceil(wait))})
+
+    @staticmethod
+    def rate_limit(name: str):
+        """
+        Dependency resolving the current user once it took a token from its bucket for an endpoint
+
+        Parameters
+        ----------
+        name : str
+            Name of the limit of the endpoint
+
+        Returns
+        -------
+        callable
+        """
+
+        async def dependency(current_user = Depends(JwtService.get_current_user)):
+            await AdmissionService.take_token(name, current_user.id)
+            return current_user
+
+        return dependency
+
+    @staticmethod
+    @contextmanager
+    def slot(name: str, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Hold one of the slots of a kind of stage while it runs
+
+        Parameters
+        ----------
+        name : str
+            Kind of stage, transcode or api
+        timeout : Optional[float]
+            Seconds to wait for a slot, by default as long as it takes
+
+        Raises
+        ------
+        HTTPException
+            429 when no slot was freed within the timeout
+        """
+
+        held = AdmissionService._held.__dict__
+        # A stage nested in a stage of the same kind runs in its slot
+        if held.get(name):
+            held[name] += 1
+            try:
+                yield
+            finally:
+                held[name] -= 1
+            return
+
+        backend = AdmissionService.get_backend()
+        holder = uuid.uuid4().hex
+        start = time.perf_counter()
+        if not backend.acquire_slot(name, AdmissionService.SLOTS[name], holder, timeout):
+            MetricsService.ADMISSION_REJECTIONS.labels(name).inc()
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="The service is busy", headers={"Retry-After": str(max(1, math.ceil(timeout)))})
+        MetricsService.ADMISSION_WAIT_SECONDS.labels(name).observe(time.perf_counter() - start)
+        held[name] = 1
+        try:
+            yield
+        finally:
+            held[name] = 0
+            backend.release_slot(name, holder)
@@ -0,0 +1,340 @@
+# services/artifact_cache.py
+from services.google_storage import GoogleStorageService
+from dotenv import load_dotenv
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+
+# load environment variables for the artifact cache
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class LocalDiskArtifactBackend:
+    """
+    Artifact cache backend that keeps the artifacts as files, evicting the least recently used ones
+
+    The size and the recency of the artifacts are kept in memory, loaded from the directory on first
+    use, so a write only removes files when the cache grew over max_bytes.
+    """
+
+    # prefix of the files being written, they are neither read nor evicted
+    TEMP_PREFIX = ".tmp-"
+
+    def __init__(self, path: str, max_bytes: int):
+        # directory of the artifacts
+        self.path = path
+        # size above which the least recently used artifacts are removed
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # size of every artifact by key, least recently used first, None until the directory is scanned
+        self._sizes = None
+        self._total = 0
+
+    def get_sizes(self) -> OrderedDict:
+        """
+        Get the size of every artifact, scanning the directory on first use, the lock is held by the caller
+
+        Returns
+        -------
+        OrderedDict
+            Size of every artifact by key, least recently used first
+        """
+
+        if self._sizes is None:
+            files = []
+            for root, _, names in os.walk(self.path):
+                for name in names:
+                    if name.startswith(LocalDiskArtifactBackend.TEMP_PREFIX):
+                        continue
+                    file_path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(file_path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, os.path.relpath(file_path, self.path), stat.st_size))
+            self._sizes = OrderedDict((key, size) for _, key, size in sorted(files))
+            self._total = sum(self._sizes.values())
+        return self._sizes
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Read an artifact
+
+        Parameters
+        ----------
+        key : str
+            Key of the artifact
+
+        Returns
+        -------
+        Optional[bytes]
+            Content of the artifact, None when it is not cached
+        """
+
+        file_path = os.path.join(self.path, key)
+        try:
+            with open(file_path, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                # Removed by another process sharing the directory
+                if self._sizes is not None and key in self._sizes:
+                    self._total -= self._sizes.pop(key)
+            return None
+        # Touch the file so that the next scan of the directory sees it as recently used
+        os.utime(file_path)
+        with self._lock:
+            self.record(key, len(content))
+        return content
+
+    def put(self, key: str, content: bytes):
+        """
+        Write an artifact and evict the least recently used ones if the cache grew too large
+
+        Parameters
+        ----------
+        key : str
+            Key of the artifact
+        content : bytes
+            Content of the artifact
+        """
+
+        file_path = os.path.join(self.path, key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Write to a temporary file first so that readers never see a partial artifact
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=LocalDiskArtifactBackend.TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            # e.g. a full disk, do not leave the partial file behind
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            self.record(key, len(content))
+            if self._total > self.max_bytes:
+                self.evict()
+
+    def record(self, key: str, size: int):
+        """
+        Record an artifact as the most recently used, the lock is held by the caller
+        """
+
+        sizes = self.get_sizes()
+        self._total += size - sizes.pop(key, 0)
+        sizes[key] = size
+
+    def evict(self):
+        """
+        Remove the least recently used artifacts until the cache fits in max_bytes, the lock is held by the caller
+        """
+
+        sizes = self.get_sizes()
+        # The most recently used artifact is kept even when it does not fit alone
+        while self._total > self.max_bytes and len(sizes) > 1:
+            key, size = sizes.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(os.path.join(self.path, key))
+            except FileNotFoundError:
+                pass
+
+class GoogleStorageArtifactBackend:
+    """
+    Artifact cache backend that keeps the artifacts in the storage bucket, shared by every instance
+    """
+
+    def __init__(self, prefix: str = "artifacts/"):
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Read an artifact, None when it is not cached
+        """
+
+        return GoogleStorageService.download_content(self.prefix + key)
+
+    def put(self, key: str, content: bytes):
+        """
+        Write an artifact, the lifecycle rules of the bucket take care of the eviction
+        """
+
+        GoogleStorageService.get_backend().upload(content, self.prefix + key, "application/octet-stream")
+
+class ArtifactCacheService:
+    """
+    Service class for caching the artifacts of the pipeline stages
+
+    Artifacts are keyed by video id, stage, model and a hash of the parameters that produced them,
+    so a failed pipeline resumes from its last completed stage and changing the parameters of a
+    stage only recomputes that stage and the ones that depend on it.
+    """
+
+    # comma separated backends, read in order and all written to
+    BACKENDS = os.getenv("ARTIFACT_CACHE_BACKENDS", "local")
+    # directory and size limit of the local backend
+    LOCAL_PATH = os.getenv("ARTIFACT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "wiser-artifacts"))
+    LOCAL_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+    # backends are created on first use
+    _backends = None
+
+    @staticmethod
+    def get_backends() -> list:
+        """
+        Get the configured backends
+
+        Returns
+        -------
+        list
+        """
+
+        if ArtifactCacheService._backends is None:
+            backends = []
+            for name in filter(None, (name.strip() for name in ArtifactCacheService.BACKENDS.split(","))):
+                if name == "local":
+                    backends.append(LocalDiskArtifactBackend(ArtifactCacheService.LOCAL_PATH, ArtifactCacheService.LOCAL_MAX_BYTES))
+                elif name == "gcs":
+                    backends.append(GoogleStorageArtifactBackend())
+                else:
+                    raise ValueError(f"Unknown artifact cache backend: {name}")
+            ArtifactCacheService._backends = backends
+        return ArtifactCacheService._backends
+
+    @staticmethod
+    def set_backends(backends: list):
+        """
+        Replace the backends, used to plug a custom remote backend
+
+        Parameters
+        ----------
+        backends : list
+            Objects with get(key) and put(key, content) methods
+        """
+
+        ArtifactCacheService._backends = backends
+
+    @staticmethod
+    def key(video_id: str, stage: str, model: str, params: dict) -> str:
+        """
+        Build the key of an artifact
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        stage : str
+            Pipeline stage that produced the artifact
+        model : str
+            Model used by the stage
+        params : dict
+            Parameters of the stage
+
+        Returns
+        -------
+        str
+        """
+
+        digest = hashlib.sha256(json.dumps({"model": model, "params": params}, sort_keys=True).encode("utf-8")).hexdigest()
+        # video ids come from user input, keep them from escaping the cache directory
+        return f"{re.sub(r'[^A-Za-z0-9_-]', '_', video_id)}/{stage}-{digest[:32]}"
+
+    @staticmethod
+    def get(video_id: str, stage: str, model: str, params: dict) -> Optional[str]:
+        """
+        Get a cached artifact
+
+        Returns
+        -------
+        Optional[str]
+            Content of the artifact, None when no backend has it
+        """
+
+        content = ArtifactCacheService.get_bytes(ArtifactCacheService.key(video_id, stage, model, params))
+        return content.decode("utf-8") if content is not None else None
+
+    @staticmethod
+    def put(video_id: str, stage: str, model: str, params: dict, content: str):
+        """
+        Store an artifact in every backend
+        """
+
+        ArtifactCacheService.put_bytes(ArtifactCacheService.key(video_id, stage, model, params), content.encode("utf-8"))
+
+    @staticmethod
+    def get_bytes(key: str) -> Optional[bytes]:
+        """
+        Get a cached binary artifact by key
+
+        Parameters
+        ----------
+        key : str
+            Key of the artifact, built with key
+
+        Returns
+        -------
+        Optional[bytes]
+            Content of the artifact, None when no backend has it
+        """
+
+        backends = ArtifactCacheService.get_backends()
+        for index, backend in enumerate(backends):
+            try:
+                content = backend.get(key)
+            except Exception:
+                # A backend that fails is a miss, the stage is computed again
+                logger.warning("Artifact cache backend %s failed to read %s", type(backend).__name__, key, exc_info=True)
+                continue
+            if content is not None:
+                # Fill the faster backends that missed it
+                for missed in backends[:index]:
+                    ArtifactCacheService.put_backend(missed, key, content)
+                return content
+        return None
+
+    @staticmethod
+    def put_bytes(key: str, content: bytes):
+        """
+        Store a binary artifact in every backend
+
+        Parameters
+        ----------
+        key : str
+            Key of the artifact, built with key
+        content : bytes
+            Content of the artifact
+        """
+
+        for backend in ArtifactCacheService.get_backends():
+            ArtifactCacheService.put_backend(backend, key, content)
+
+    @staticmethod
+    def put_backend(backend, key: str, content: bytes):
+        """
+        Store a binary artifact in a backend, a failed write is logged and only costs a later miss
+
+        Parameters
+        ----------
+        backend : object
+            Backend with a put(key, content) method
+        key : str
+            Key of the artifact
+        content : bytes
+            Content of the artifact
+        """
+
+        try:
+            backend.put(key, content)
+        except Exception:
+            logger.warning("Artifact cache backend %s failed to write %s", type(backend).__name__, key, exc_info=True)
@@ -0,0 +1,265 @@
+# services/audio.py
+from io import BytesIO
+import subprocess
+import re
+import threading
+from services.admission import AdmissionService
+from schemas.video_metadata import AudioStreamInfo
+
+class AudioService:
+    """
+    Service class for extracting the audio of a YouTube video in memory
+    """
+
+    # containers that the transcription API accepts as they are, by pytube stream subtype
+    SUPPORTED_SUBTYPES = {"mp4", "webm", "mpeg", "ogg", "wav", "flac"}
+    # bitrate of the mp3 produced when the stream has to be transcoded, enough for speech
+    TRANSCODE_BITRATE = "64k"
+
+    @staticmethod
+    def select_audio_stream(audio_streams: list[AudioStreamInfo]) -> AudioStreamInfo:
+        """
+        Select the audio stream to transcribe, preferring the smallest stream in a supported container
+
+        Parameters
+        ----------
+        audio_streams : list[AudioStreamInfo]
+            Audio streams of the video, from its metadata
+
+        Returns
+        -------
+        AudioStreamInfo
+            Audio stream
+        """
+
+        if not audio_streams:
+            raise Exception("Video has no audio stream")
+        # Get the audio streams of the video, the smallest first
+        audio_streams = sorted(audio_streams, key=lambda stream: stream.abr)
+        # Prefer a stream that can be sent without transcoding it
+        supported = [stream for stream in audio_streams if stream.subtype in AudioService.SUPPORTED_SUBTYPES]
+        if supported:
+            return supported[0]
+        return audio_streams[0]
+
+    @staticmethod
+    def load_audio(audio_stream: AudioStreamInfo, video_id: str) -> BytesIO:
+        """
+        Load the audio of a stream into memory, ready to be sent to the transcription API
+
+        Parameters
+        ----------
+        audio_stream : AudioStreamInfo
+            Audio stream
+        video_id : str
+            Video id of the YouTube video, used to name the audio file
+
+        Returns
+        -------
+        BytesIO
+            Audio file, its name carries the extension of the container
+        """
+
+        # the streams are downloaded with the chunked range requests of pytube
+        from pytube import request
+
+        # Send the stream as it is when its container is accepted
+        if audio_stream.subtype in AudioService.SUPPORTED_SUBTYPES:
+            audio_file = BytesIO()
+            for chunk in request.stream(audio_stream.url):
+                audio_file.write(chunk)
+            audio_file.seek(0)
+            audio_file.name = f"{video_id}.{audio_stream.subtype}"
+            return audio_file
+
+        # Otherwise transcode it to mp3 on the fly
+        return AudioService.transcode(request.stream(audio_stream.url), video_id)
+
+    @staticmethod
+    def transcode(chunks, video_id: str) -> BytesIO:
+        """
+        Transcode audio to mp3 with a single ffmpeg pipe, without intermediate files
+
+        Parameters
+        ----------
+        chunks : Iterable[bytes]
+            Chunks of the source audio
+        video_id : str
+            Video id of the YouTube video, used to name the audio file
+
+        Returns
+        -------
+        BytesIO
+            mp3 audio file
+        """
+
+        # Read the source from stdin and write the mp3 to stdout, in one of the transcode slots
+        with AdmissionService.slot("transcode"):
+            output, _ = AudioService._run_ffmpeg(["-i", "pipe:0", "-vn", "-ac", "1", "-c:a", "libmp3lame", "-b:a", AudioService.TRANSCODE_BITRATE, "-f", "mp3", "pipe:1"], chunks)
+
+        audio_file = BytesIO(output)
+        audio_file.name = f"{video_id}.mp3"
+        return audio_file
+
+    @staticmethod
+    def transcode_with_silences(chunks, video_id: str, noise: str = "-35dB", min_silence: float = 0.4):
+        """
+        Transcode audio to mp3 and detect its silences in the same ffmpeg pass
+
+        Parameters
+        ----------
+        chunks : Iterable[bytes]
+            Chunks of the source audio
+        video_id : str
+            Video id of the YouTube video, used to name the audio file
+        noise : str
+            Level under which the audio is considered silent, by default "-35dB"
+        min_silence : float
+            Minimum duration of a silence in seconds, by default 0.4
+
+        Returns
+        -------
+        tuple[BytesIO, float, list[tuple[float, float]]]
+            mp3 audio file, its duration in seconds and the (start, end) of its silences
+        """
+
+        # silencedetect reports at the info level, the mp3 still goes to stdout
+        with AdmissionService.slot("transcode"):
+            output, log = AudioService._run_ffmpeg(["-i", "pipe:0", "-vn", "-ac", "1", "-af", f"silencedetect=noise={noise}:d={min_silence}", "-c:a", "libmp3lame", "-b:a", AudioService.TRANSCODE_BITRATE, "-f", "mp3", "pipe:1"], chunks, loglevel="info")
+
+        # Parse the silences and the duration of the output from the log
+        silences = [(float(start), float(end)) for start, end in zip(re.findall(r"silence_start: (-?[\d.]+)", log), re.findall(r"silence_end: ([\d.]+)", log))]
+        times = re.findall(r"time=(\d+):(\d+):([\d.]+)", log)
+        duration = 0.0
+        if times:
+            hours, minutes, seconds = times[-1]
+            duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+        audio_file = BytesIO(output)
+        audio_file.name = f"{video_id}.mp3"
+        return audio_file, duration, silences
+
+    @staticmethod
+    def plan_segments(duration: float, silences: list, max_seconds: float) -> list:
+        """
+        Split an audio timeline in segments no longer than max_seconds, cutting in silences when possible
+
+        Parameters
+        ----------
+        duration : float
+            Duration of the audio in seconds
+        silences : list[tuple[float, float]]
+            (start, end) of the silences of the audio
+        max_seconds : float
+            Maximum duration of a segment
+
+        Returns
+        -------
+        list[tuple[float, float]]
+            (start, end) of the segments, in order
+        """
+
+        segments = []
+        start = 0.0
+        while duration - start > max_seconds:
+            limit = start + max_seconds
+            # Cut in the middle of the last silence of the second half of the segment
+            candidates = [(silence_start + silence_end) / 2 for silence_start, silence_end in silences if start + max_seconds / 2 <= (silence_start + silence_end) / 2 <= limit]
+            cut = candidates[-1] if candidates else limit
+            segments.append((start, cut))
+            start = cut
+        # Merge a trailing sliver into the previous segment instead of sending a near empty request
+        if segments and duration - start < 1:
+            segments[-1] = (segments[-1][0], duration)
+        else:
+            segments.append((start, duration))
+        return segments
+
+    @staticmethod
+    def cut_segment(audio: bytes, start: float, end: float, name: str) -> BytesIO:
+        """
+        Cut a segment of an mp3 audio without re-encoding it
+
+        Parameters
+        ----------
+        audio : bytes
+            mp3 audio
+        start : float
+            Start of the segment in seconds
+        end : float
+            End of the segment in seconds
+        name : str
+            Name of the segment file
+
+        Returns
+        -------
+        BytesIO
+            mp3 audio file of the segment
+        """
+
+        output, _ = AudioService._run_ffmpeg(["-ss", f"{start:.3f}", "-i", "pipe:0", "-t", f"{end - start:.3f}", "-c", "copy", "-f", "mp3", "pipe:1"], [audio])
+
+        audio_file = BytesIO(output)
+        audio_file.name = name
+        return audio_file
+
+    @staticmethod
+    def _run_ffmpeg(args: list, chunks, loglevel: str = "error"):
+        """
+        Run ffmpeg feeding chunks to its stdin
+
+        Parameters
+        ----------
+        args : list[str]
+            ffmpeg arguments
+        chunks : Iterable[bytes]
+            Chunks written to the stdin of ffmpeg
+        loglevel : str
+            ffmpeg log level, by default "error"
+
+        Returns
+        -------
+        tuple[bytes, str]
+            stdout and stderr of ffmpeg
+        """
+
+        import imageio_ffmpeg
+
+        command = [imageio_ffmpeg.get_ffmpeg_exe(), "-nostdin", "-hide_banner", "-loglevel", loglevel, *args]
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        # error of the source, ffmpeg exits 0 on a truncated input so the error is raised after it
+        failures = []
+
+        def feed():
+            # Feed the source from a separate thread so that ffmpeg's stdout never fills up
+            try:
+                for chunk in chunks:
+                    process.stdin.write(chunk)
+            except BrokenPipeError:
+                # ffmpeg exited early, its exit code reports why
+                pass
+            except Exception as e:
+                failures.append(e)
+            finally:
+                process.stdin.close()
+
+        # stderr is drained in its own thread as well, silencedetect can log a lot
+        errors = []
+        drain = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        drain.start()
+        output = process.stdout.read()
+        drain.join()
+        log = errors[0].decode("utf-8", "replace") if errors else ""
+        returncode = process.wait()
+        feeder.join()
+
+        # The download failed midway, the output is the audio of the part received
+        if failures:
+            raise failures[0]
+        if returncode != 0:
+            raise Exception(f"Audio transcoding failed: {log.strip()}")
+
+        return output, log
@@ -1,7 +1,9 @@
 # services/auth.py
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import UserModel
 from fastapi import HTTPException
+from services.password import PasswordService
 
 class AuthService:
     """
@@ -9,7 +11,7 @@ class AuthService:
     """
 
     @staticmethod
-    def authenticate_user(email: str, password: str, db: Session) -> UserModel:
+    async def authenticate_user(email: str, password: str, db: AsyncSession) -> UserModel:
         """
         Authenticate a user
 
@@ -19,7 +21,7 @@ class AuthService:
             Email of the user
         password : str
             Password of the user
-        db : Session
+        db : AsyncSession
             Database session
 
         Returns
@@ -29,9 +31,14 @@ class AuthService:
         """
         
         # Query the database for the user with the provided email
-        user = db.query(UserModel).filter(UserModel.email == email).first()
+        user = (await db.execute(select(UserModel).filter(UserModel.email == email))).scalars().first()
         # If the user is not found, raise an HTTPException
-        if not user or not user.verify_password(password):
+        if not user or not await PasswordService.verify_password(password, user.password_hash):
             raise HTTPException(status_code=404, detail="Incorrect email or password.")
+        # Rehash the password when the configured bcrypt cost changed, the password is only known at login,
+        # the password version and so the tokens of the user are kept
+        if PasswordService.needs_rehash(user.password_hash):
+            user.password_hash = await PasswordService.hash_password(password)
+            await db.commit()
         # Return the user
         return user
\ No newline at end of file
@@ -0,0 +1,148 @@
+# services/chat_entry.py
+from schemas.chat_entry import ChatEntryCreate, ChatEntryGet
+from schemas.transcript import Transcript, TranscriptSegment
+from models.chat_entry import ChatEntryModel
+from models.summarization import SummarizationModel
+from models.youtube_video_resource import YoutubeVideoResourceModel
+from services.summarization import SummarizationService
+from services.vector_index import VectorIndexService
+from services.google_storage import GoogleStorageService
+from services.openai import OpenAIService
+from services.admission import AdmissionService
+from services.resilience import CircuitOpenError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from fastapi import HTTPException
+import asyncio
+
+class ChatEntryService:
+    """
+    Service class for the questions asked about a summarized video
+    """
+
+    @staticmethod
+    async def create_chat_entry(summarization_id: int, chat_entry: ChatEntryCreate, user_id: int, db: AsyncSession) -> ChatEntryGet:
+        """
+        Answer a question about the video of a summarization and store the exchange
+
+        Only the chunks of the transcript most relevant to the question are sent to the model.
+
+        Parameters
+        ----------
+        summarization_id : int
+            Id of the summarization
+        chat_entry : ChatEntryCreate
+            Chat entry create model
+        user_id : int
+            Id of the user
+        db : AsyncSession
+            Database session
+
+        Returns
+        -------
+        ChatEntryGet
+            Chat entry get model with the transcript chunks used to answer
+        """
+
+        # Query the video of the summarization, scoped to the user
+        row = (await db.execute(
+            select(YoutubeVideoResourceModel.youtube_video_id, YoutubeVideoResourceModel.transcription_url)
+            .join(SummarizationModel, SummarizationModel.youtube_video_resource_id == YoutubeVideoResourceModel.id)
+            .filter(SummarizationModel.id == summarization_id, SummarizationModel.user_id == user_id, SummarizationModel.status == 1)
+        )).first()
+        # If the summarization is not found, raise an HTTPException
+        if row is None:
+            raise HTTPException(status_code=404, detail="Summarization not found")
+
+        # Retrieval and completion block, run them off the event loop
+        try:
+            answer, sources = await asyncio.to_thread(ChatEntryService.answer_question, row.youtube_video_id, row.transcription_url, chat_entry.question)
+        except CircuitOpenError as e:
+            # OpenAI kept failing, answer at once until its breaker lets calls through again
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+
+        # Store the exchange
+        created = ChatEntryModel(summarization_id=summarization_id, input_text=chat_entry.question, output_text=answer)
+        db.add(created)
+        await db.commit()
+
+        return ChatEntryGet(id=created.id, input_text=created.input_text, output_text=created.output_text, created_at=created.created_at, sources=sources)
+
+    @staticmethod
+    def answer_question(video_id: str, transcription_blob: str, question: str) -> tuple[str, list[TranscriptSegment]]:
+        """
+        Answer a question from the chunks of the transcript of a video most relevant to it
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        transcription_blob : str
+            Blob name of the transcription, read only if the video has no index yet
+        question : str
+            Question of the user
+
+        Returns
+        -------
+        tuple[str, list[TranscriptSegment]]
+            Answer and the chunks it was generated from
+        """
+
+        # The embedding of the question and the completion share an API slot, the request gives up when none is freed soon
+        with AdmissionService.slot("api", AdmissionService.REQUEST_SLOT_WAIT_SECONDS):
+            sources = VectorIndexService.search(video_id, question, lambda: ChatEntryService.load_transcript(video_id, transcription_blob))
+            return OpenAIService.answer(question, [source.text for source in sources]), sources
+
+    @staticmethod
+    def load_transcript(video_id: str, transcription_blob: str) -> Transcript:
+        """
+        Load the transcript of a video, timestamped when it is still cached
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        transcription_blob : str
+            Blob name of the transcription
+
+        Returns
+        -------
+        Transcript
+        """
+
+        transcript = SummarizationService.get_cached_transcript(video_id)
+        if transcript is None:
+            # Videos summarized before the transcripts were cached only have the plain text
+            content = GoogleStorageService.download_content(GoogleStorageService.resolve_blob_name(transcription_blob))
+            if content is None:
+                raise HTTPException(status_code=404, detail="Transcription not found")
+            transcript = Transcript(text=content.decode("utf-8"))
+        return transcript
+
+    @staticmethod
+    async def get_chat_entries(summarization_id: int, user_id: int, db: AsyncSession) -> list[ChatEntryModel]:
+        """
+        Get the questions asked about a summarization, oldest first
+
+        Parameters
+        ----------
+        summarization_id : int
+            Id of the summarization
+        user_id : int
+            Id of the user
+        db : AsyncSession
+            Database session
+
+        Returns
+        -------
+        list[ChatEntryModel]
+            Chat entry models
+        """
+
+        # Query the chat entries of the summarization, scoped to the user
+        return (await db.execute(
+            select(ChatEntryModel)
+            .join(SummarizationModel, ChatEntryModel.summarization_id == SummarizationModel.id)
+            .filter(ChatEntryModel.summarization_id == summarization_id, SummarizationModel.user_id == user_id, ChatEntryModel.status == 1)
+            .order_by(ChatEntryModel.id)
+        )).scalars().all()
@@ -0,0 +1,116 @@
+# services/embedding.py
+from services.openai import OpenAIService
+from services.admission import AdmissionService
+from dotenv import load_dotenv
+import numpy as np
+import hashlib
+import os
+import re
+
+# load environment variables for the embeddings
+load_dotenv()
+
+class HashingEmbeddingClient:
+    """
+    Embedding client that answers locally, used to run the chat without OpenAI
+
+    Words are hashed into a fixed number of dimensions, so texts sharing words get similar
+    embeddings and the same text always gets the same embedding.
+    """
+
+    # number of dimensions of the embeddings
+    DIMENSIONS = int(os.getenv("HASHING_EMBEDDING_DIMENSIONS", "512"))
+
+    @staticmethod
+    def embed(texts: list[str]) -> list[list[float]]:
+        """
+        Embed texts by hashing their words
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed
+
+        Returns
+        -------
+        list[list[float]]
+            Embedding of every text, in the same order
+        """
+
+        embeddings = np.zeros((len(texts), HashingEmbeddingClient.DIMENSIONS), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+                # the lowest bits pick the dimension and the highest one the sign, so collisions cancel out on average
+                embeddings[row, digest % HashingEmbeddingClient.DIMENSIONS] += 1.0 if digest >> 63 else -1.0
+        return embeddings.tolist()
+
+class EmbeddingService:
+    """
+    Service class for embedding texts with the configured backend
+    """
+
+    # embedding clients by backend name, a client is a function from a list of texts to their embeddings
+    CLIENTS = {
+        "openai": OpenAIService.embed,
+        "hashing": HashingEmbeddingClient.embed,
+    }
+    # backend used to embed the texts
+    BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+    # maximum number of texts sent in a single embedding request
+    BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+
+    @staticmethod
+    def get_client():
+        """
+        Get the embedding client of the configured backend
+
+        Returns
+        -------
+        callable
+        """
+
+        return EmbeddingService.CLIENTS[EmbeddingService.BACKEND]
+
+    @staticmethod
+    def get_model() -> str:
+        """
+        Get a name identifying the embeddings of the configured backend, embeddings of different models cannot be compared
+
+        Returns
+        -------
+        str
+        """
+
+        if EmbeddingService.BACKEND == "openai":
+            return f"openai:{OpenAIService.EMBEDDING_MODEL}"
+        if EmbeddingService.BACKEND == "hashing":
+            return f"hashing:{HashingEmbeddingClient.DIMENSIONS}"
+        return EmbeddingService.BACKEND
+
+    @staticmethod
+    def embed(texts: list[str]) -> np.ndarray:
+        """
+        Embed texts in batches, normalized so that their dot product is their cosine similarity
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed
+
+        Returns
+        -------
+        np.ndarray
+            float32 matrix with one row per text
+        """
+
+        client = EmbeddingService.get_client()
+        rows = []
+        for i in range(0, len(texts), EmbeddingService.BATCH_SIZE):
+            # Every request takes one of the API slots
+            with AdmissionService.slot("api"):
+                rows.extend(client(texts[i:i + EmbeddingService.BATCH_SIZE]))
+        embeddings = np.asarray(rows, dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        # texts without any word keep a zero embedding instead of dividing by zero
+        return embeddings / np.where(norms == 0, 1, norms)
@@ -1,77 +1,290 @@
-from google.cloud import storage
+from services.resilience import ResilienceService
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from typing import Optional, Union
+from pathlib import Path
+from urllib.parse import urlparse, unquote
+from cachetools import TTLCache
 import os
+import time
+import threading
 from datetime import timedelta
 
 # load environment variables for Google Cloud Storage
 load_dotenv()
 
+class GoogleCloudStorageBackend:
+    """
+    Storage backend that keeps the blobs in a Google Cloud Storage bucket through one shared client
+    """
+
+    def __init__(self, bucket_name: str, pool_size: int):
+        self.bucket_name = bucket_name
+        self.pool_size = pool_size
+        # the client is created on first use, credential discovery is slow
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    def get_bucket(self) -> "storage.Bucket":
+        """
+        Get the bucket of the shared client, creating the client on first use
+
+        Returns
+        -------
+        storage.Bucket
+        """
+
+        with self._lock:
+            if self._bucket is None:
+                # imported here so that the processes that do not touch the bucket do not load the client
+                import google.auth
+                from google.auth.transport.requests import AuthorizedSession
+                from google.cloud import storage
+                from requests.adapters import HTTPAdapter
+
+                credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+                # size the connection pool of the authorized session for concurrent uploads, the client is given the session
+                session = AuthorizedSession(credentials)
+                session.mount("https://", HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size))
+                client = storage.Client(project=project, credentials=credentials, _http=session)
+                self._bucket = client.bucket(self.bucket_name)
+            return self._bucket
+
+    @ResilienceService.resilient("gcs")
+    def upload(self, content: bytes, blob_name: str, content_type: str):
+        """
+        Upload content to a blob, retried on transient failures
+        """
+
+        self.get_bucket().blob(blob_name).upload_from_string(content, content_type=content_type)
+
+    @ResilienceService.resilient("gcs")
+    def download(self, blob_name: str) -> Optional[bytes]:
+        """
+        Download the content of a blob, None when it does not exist, retried on transient failures
+        """
+
+        from google.api_core.exceptions import NotFound
+
+        try:
+            return self.get_bucket().blob(blob_name).download_as_bytes()
+        except NotFound:
+            return None
+
+    def sign(self, blob_name: str, expiration: timedelta) -> str:
+        """
+        Create a V4 signed URL to read a blob
+        """
+
+        return self.get_bucket().blob(blob_name).generate_signed_url(
+            version="v4",
+            expiration=expiration,
+            # Allow GET requests using this URL.
+            method="GET")
+
+class LocalStorageBackend:
+    """
+    Storage backend that keeps the blobs as local files, used to run and benchmark the app offline
+    """
+
+    def __init__(self, path: str, latency: float = 0.0):
+        self.path = Path(path)
+        # seconds added to every upload and download to stand in for the round trip to a bucket
+        self.latency = latency
+
+    def upload(self, content: bytes, blob_name: str, content_type: str):
+        """
+        Write content to a file
+        """
+
+        time.sleep(self.latency)
+        file_path = self.path / blob_name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(content)
+
+    def download(self, blob_name: str) -> Optional[bytes]:
+        """
+        Read the content of a file, None when it does not exist
+        """
+
+        time.sleep(self.latency)
+        file_path = self.path / blob_name
+        return file_path.read_bytes() if file_path.exists() else None
+
+    def sign(self, blob_name: str, expiration: timedelta) -> str:
+        """
+        Local files do not expire, return their URL
+        """
+
+        return (self.path / blob_name).resolve().as_uri()
+
 class GoogleStorageService:
     """
     Service class for Google Cloud Storage related operations
     """
 
+    # gcs or local
+    BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+    # directory of the local backend and latency it adds to every request, to benchmark it like a bucket
+    LOCAL_PATH = os.getenv("LOCAL_STORAGE_PATH", "storage")
+    LOCAL_LATENCY = float(os.getenv("LOCAL_STORAGE_LATENCY_SECONDS", "0"))
+    # size of the HTTP connection pool shared by the uploads
+    POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "10"))
+    # signed URLs expire in 7 days
+    SIGNED_URL_EXPIRATION = timedelta(hours=168)
+    # signed URLs are reused until one day before they expire
+    SIGNED_URL_CACHE_TTL = timedelta(hours=int(os.getenv("SIGNED_URL_CACHE_TTL_HOURS", "144")))
+    _signed_urls = TTLCache(maxsize=int(os.getenv("SIGNED_URL_CACHE_SIZE", "10000")), ttl=SIGNED_URL_CACHE_TTL.total_seconds())
+    # the URLs are signed in the threads of asyncio.to_thread, TTLCache is not thread-safe
+    _signed_urls_lock = threading.Lock()
+
+    # backend and upload pool are created on first use
+    _backend = None
+    _executor = None
+    _lock = threading.Lock()
 
     @staticmethod
-    def upload_blob(source_file_name, destination_blob_name) -> str:
+    def get_backend():
         """
-        Uploads a file to the bucket.
-        
+        Get the configured storage backend
+
+        Returns
+        -------
+        GoogleCloudStorageBackend | LocalStorageBackend
+        """
+
+        with GoogleStorageService._lock:
+            if GoogleStorageService._backend is None:
+                if GoogleStorageService.BACKEND == "local":
+                    GoogleStorageService._backend = LocalStorageBackend(GoogleStorageService.LOCAL_PATH, GoogleStorageService.LOCAL_LATENCY)
+                else:
+                    GoogleStorageService._backend = GoogleCloudStorageBackend(os.getenv("GOOGLE_CLOUD_BUCKET"), GoogleStorageService.POOL_SIZE)
+            return GoogleStorageService._backend
+
+    @staticmethod
+    def set_backend(backend):
+        """
+        Replace the storage backend
+
         Parameters
         ----------
-        source_file_name : str
-            Path to the file to upload
+        backend : object
+            Object with upload, download and sign methods
+        """
+
+        GoogleStorageService._backend = backend
+
+    @staticmethod
+    def upload_content(content: Union[str, bytes], destination_blob_name: str) -> str:
+        """
+        Upload content from memory to the bucket.
+
+        Parameters
+        ----------
+        content : str | bytes
+            Content of the file
         destination_blob_name : str
             Destination blob name
 
         Returns
         -------
         str
+            Blob name, URLs are signed when the blob is read
         """
-        
-        # get the bucket name from the environment variables 
-        bucket_name = os.getenv("GOOGLE_CLOUD_BUCKET")
-        # create a storage client
-        storage_client = storage.Client()
-        # get the bucket
-        bucket = storage_client.bucket(bucket_name)
-        # create a blob
-        blob = bucket.blob(destination_blob_name)
-
-        # upload the file
-        blob.upload_from_filename(source_file_name)
-
-        # get the public url
-        public_url = blob.generate_signed_url(
-            version="v4",
-            # This URL will expire in 7 days.
-            expiration=timedelta(hours=168),
-            # Allow GET requests using this URL.
-            method="GET")
 
-        # return the public url
-        return public_url
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        # upload the content
+        GoogleStorageService.get_backend().upload(content, destination_blob_name, "text/plain; charset=utf-8")
+        return destination_blob_name
 
     @staticmethod
-    def create_and_upload_file(file_name, content, destination_blob) -> str:
+    def upload_contents(uploads: list) -> list[str]:
         """
-        Create a file and upload it to the bucket.
-        
+        Upload several contents from memory concurrently.
+
         Parameters
         ----------
-        destination_blob_name : str
-            Destination blob name
-        content : str
-            Content of the file
+        uploads : list[tuple[str | bytes, str]]
+            (content, destination blob name) pairs
+
+        Returns
+        -------
+        list[str]
+            Blob names, in the order of the uploads
+        """
+
+        with GoogleStorageService._lock:
+            if GoogleStorageService._executor is None:
+                GoogleStorageService._executor = ThreadPoolExecutor(max_workers=GoogleStorageService.POOL_SIZE, thread_name_prefix="storage-upload")
+        futures = [GoogleStorageService._executor.submit(GoogleStorageService.upload_content, content, blob_name) for content, blob_name in uploads]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def download_content(blob_name: str) -> Optional[bytes]:
+        """
+        Download the content of a blob.
+
+        Parameters
+        ----------
+        blob_name : str
+            Blob name
+
+        Returns
+        -------
+        Optional[bytes]
+            Content of the blob, None when it does not exist
+        """
+
+        return GoogleStorageService.get_backend().download(blob_name)
+
+    @staticmethod
+    def get_signed_url(blob_name: str) -> str:
+        """
+        Get a signed URL to read a blob, reusing a cached one while it is still valid for long enough
+
+        Parameters
+        ----------
+        blob_name : str
+            Blob name, or a signed URL stored by older versions of the app
 
         Returns
         -------
         str
+            Signed URL of the blob
+        """
+
+        blob_name = GoogleStorageService.resolve_blob_name(blob_name)
+        with GoogleStorageService._signed_urls_lock:
+            url = GoogleStorageService._signed_urls.get(blob_name)
+        if url is not None:
+            return url
+        # sign the URL outside the lock, it outlives its cache entry so a cached URL is never stale
+        url = GoogleStorageService.get_backend().sign(blob_name, GoogleStorageService.SIGNED_URL_EXPIRATION)
+        with GoogleStorageService._signed_urls_lock:
+            GoogleStorageService._signed_urls[blob_name] = url
+        return url
+
+    @staticmethod
+    def resolve_blob_name(value: str) -> str:
+        """
+        Get the blob name of a stored value, older rows store the URL signed at upload time
 
+        Parameters
+        ----------
+        value : str
+            Blob name or URL
+
+        Returns
+        -------
+        str
+            Blob name
         """
 
-        with open(file_name, 'w') as f:
-            f.write(content)
-        url = GoogleStorageService.upload_blob(file_name, destination_blob)
-        os.remove(file_name)
-        return url
\ No newline at end of file
+        url = urlparse(value)
+        if url.scheme in {"http", "https"}:
+            # https://storage.googleapis.com/<bucket>/<blob>?X-Goog-Signature=...
+            return unquote(url.path.lstrip("/").split("/", 1)[-1])
+        if url.scheme == "file":
+            return Path(unquote(url.path)).name
+        return value
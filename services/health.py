@@ -0,0 +1,74 @@
+# services/health.py
+from db import async_engine
+from sqlalchemy import text
+from dotenv import load_dotenv
+from typing import Optional
+import asyncio
+import os
+
+# load environment variables for the health checks
+load_dotenv()
+
+class HealthService:
+    """
+    Service class for the liveness and readiness of a server process
+
+    A process is live while its event loop answers. It is ready while it is not draining and a
+    connection of its database pool answers, load balancers stop routing to it otherwise.
+    """
+
+    # seconds the database has to answer a readiness check
+    READY_TIMEOUT_SECONDS = float(os.getenv("HEALTH_READY_TIMEOUT_SECONDS", "2"))
+
+    # set when the process received SIGTERM and finishes its requests before exiting
+    _draining = False
+
+    @staticmethod
+    def start_draining():
+        """
+        Report the process as not ready, it keeps serving the requests that still reach it
+        """
+
+        HealthService._draining = True
+
+    @staticmethod
+    def is_draining() -> bool:
+        return HealthService._draining
+
+    @staticmethod
+    def get_pool_status() -> dict:
+        """
+        Get the connections of the pool of the request handlers
+
+        Returns
+        -------
+        dict
+            size, checked_out and overflow of the pool, for the pools that report them
+        """
+
+        pool = async_engine.sync_engine.pool
+        # pools without connection reuse (SQLite's NullPool) do not report these
+        return {name: getattr(pool, method)() for name, method in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow")) if hasattr(pool, method)}
+
+    @staticmethod
+    async def check_database() -> Optional[str]:
+        """
+        Check that a connection of the pool answers within READY_TIMEOUT_SECONDS
+
+        Returns
+        -------
+        Optional[str]
+            None when the database answered, otherwise the reason it did not
+        """
+
+        async def ping():
+            async with async_engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+        try:
+            await asyncio.wait_for(ping(), HealthService.READY_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return "database timed out"
+        except Exception as e:
+            return f"database unavailable: {type(e).__name__}"
+        return None
@@ -0,0 +1,117 @@
+# services/http_cache.py
+from services.google_storage import GoogleStorageService
+from fastapi import Request, Response, status
+from typing import Optional
+import hashlib
+import time
+
+class HttpCacheService:
+    """
+    Service class for the conditional GETs of the read endpoints
+
+    Responses carry a weak ETag derived from what they depend on, so that a client sending it back
+    in If-None-Match gets a 304 without the response being queried or serialized again. Responses
+    are private to the user and revalidated on every use.
+    """
+
+    # per user responses, never stored by shared caches and revalidated before every use
+    CACHE_CONTROL = "private, no-cache"
+
+    @staticmethod
+    def make_etag(*parts) -> str:
+        """
+        Build a weak ETag from the values a response depends on
+
+        Parameters
+        ----------
+        *parts
+            Values identifying the content of the response
+
+        Returns
+        -------
+        str
+        """
+
+        digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+        return f'W/"{digest}"'
+
+    @staticmethod
+    def get_signed_url_epoch() -> int:
+        """
+        Get the period of the signed URLs, part of the ETags of responses holding signed URLs
+
+        A signed URL is handed out while its cache entry lives and is valid for SIGNED_URL_EXPIRATION,
+        changing the ETags every SIGNED_URL_EXPIRATION - SIGNED_URL_CACHE_TTL keeps a revalidated
+        response from holding an expired URL.
+
+        Returns
+        -------
+        int
+        """
+
+        period = max((GoogleStorageService.SIGNED_URL_EXPIRATION - GoogleStorageService.SIGNED_URL_CACHE_TTL).total_seconds(), 60)
+        return int(time.time() // period)
+
+    @staticmethod
+    def is_not_modified(request: Request, etag: str) -> bool:
+        """
+        Check whether the If-None-Match header of a request matches an ETag, with the weak comparison of RFC 9110
+
+        Parameters
+        ----------
+        request : Request
+            Request
+        etag : str
+            Current ETag of the response
+
+        Returns
+        -------
+        bool
+        """
+
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        if header.strip() == "*":
+            return True
+        opaque = etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+    @staticmethod
+    def set_headers(response: Response, etag: str, cache_control: Optional[str] = None):
+        """
+        Set the validator and the caching policy of a response
+
+        Parameters
+        ----------
+        response : Response
+            Response
+        etag : str
+            ETag of the response
+        cache_control : Optional[str]
+            Cache-Control of the response, CACHE_CONTROL by default
+        """
+
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = cache_control or HttpCacheService.CACHE_CONTROL
+        # The content depends on the user of the token
+        response.headers["Vary"] = "Authorization"
+
+    @staticmethod
+    def not_modified(etag: str) -> Response:
+        """
+        Build the 304 answering a matching conditional GET
+
+        Parameters
+        ----------
+        etag : str
+            ETag of the response
+
+        Returns
+        -------
+        Response
+        """
+
+        response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+        HttpCacheService.set_headers(response, etag)
+        return response
@@ -0,0 +1,182 @@
+# services/job_events.py
+from dotenv import load_dotenv
+from typing import Optional
+import threading
+import asyncio
+import json
+import os
+
+# load environment variables for the job events
+load_dotenv()
+
+class JobEventChannel:
+    """
+    Events of a running pipeline, published by a worker thread and consumed by the event loop
+
+    Events are kept for the lifetime of the channel so that subscribers arriving late receive
+    the stages and tokens they missed.
+    """
+
+    def __init__(self):
+        # (event, data) tuples published so far
+        self.events = []
+        self.closed = False
+        # (loop, queue) of the subscribers
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def publish(self, event: str, data: dict):
+        """
+        Send an event to every subscriber
+
+        Parameters
+        ----------
+        event : str
+            Name of the event
+        data : dict
+            Payload of the event
+        """
+
+        with self._lock:
+            if self.closed:
+                return
+            self.events.append((event, data))
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            JobEventChannel._put(loop, queue, (event, data))
+
+    def close(self):
+        """
+        End the channel, subscribers receive None once they consumed the events
+        """
+
+        with self._lock:
+            self.closed = True
+            subscribers, self._subscribers = self._subscribers, []
+        for loop, queue in subscribers:
+            JobEventChannel._put(loop, queue, None)
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Subscribe the running event loop to the channel
+
+        Returns
+        -------
+        asyncio.Queue
+            Queue of the past and future events, terminated by None
+        """
+
+        queue = asyncio.Queue()
+        with self._lock:
+            for item in self.events:
+                queue.put_nowait(item)
+            if self.closed:
+                queue.put_nowait(None)
+            else:
+                self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """
+        Stop sending events to a queue returned by subscribe
+        """
+
+        with self._lock:
+            self._subscribers = [(loop, subscribed) for loop, subscribed in self._subscribers if subscribed is not queue]
+
+    @staticmethod
+    def _put(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, item):
+        try:
+            # queues are not thread safe, hand the item to the loop of the subscriber
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # the loop of the subscriber is closed
+            pass
+
+class JobEventService:
+    """
+    Service class for the channels of the pipelines running in this process, by video id
+    """
+
+    # interval at which streams read the state of jobs that do not run in this process
+    POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "0.5"))
+    # interval of the comments sent to keep idle streams open through proxies
+    KEEPALIVE_SECONDS = float(os.getenv("JOB_EVENTS_KEEPALIVE_SECONDS", "15"))
+
+    # open channels by video id
+    _channels = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def open_channel(video_id: str) -> JobEventChannel:
+        """
+        Open the channel of the pipeline of a video
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+
+        Returns
+        -------
+        JobEventChannel
+        """
+
+        with JobEventService._lock:
+            channel = JobEventService._channels[video_id] = JobEventChannel()
+        return channel
+
+    @staticmethod
+    def close_channel(video_id: str, channel: JobEventChannel):
+        """
+        Close the channel of the pipeline of a video once it finished
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        channel : JobEventChannel
+            Channel returned by open_channel
+        """
+
+        with JobEventService._lock:
+            if JobEventService._channels.get(video_id) is channel:
+                del JobEventService._channels[video_id]
+        channel.close()
+
+    @staticmethod
+    def get_channel(video_id: str) -> Optional[JobEventChannel]:
+        """
+        Get the channel of the pipeline of a video, None when no pipeline of the video runs in this process
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+
+        Returns
+        -------
+        Optional[JobEventChannel]
+        """
+
+        with JobEventService._lock:
+            return JobEventService._channels.get(video_id)
+
+    @staticmethod
+    def format_event(event: str, data: dict) -> str:
+        """
+        Format an event as a Server-Sent Event
+
+        Parameters
+        ----------
+        event : str
+            Name of the event
+        data : dict
+            Payload of the event, sent as JSON
+
+        Returns
+        -------
+        str
+        """
+
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,203 @@
+# services/job_queue.py
+from concurrent.futures import ThreadPoolExecutor, Future
+from dotenv import load_dotenv
+from typing import Callable, Optional
+import threading
+import socket
+import os
+
+# load environment variables for the job queue
+load_dotenv()
+
+class JobQueueService:
+    """
+    Service class for the in-process background job queue
+
+    Jobs are persisted in the database by their callers, so the queue itself only
+    needs to hand the work to a bounded pool of worker threads.
+    """
+
+    # number of pipelines that are allowed to run at the same time
+    MAX_WORKERS = int(os.getenv("SUMMARIZATION_WORKERS", "2"))
+    # whether the jobs run in this process, the processes of the api profile leave them in the database for the pipeline workers
+    RUNS_JOBS = True
+    # whether the startup of the app queues again the jobs interrupted by the previous shutdown, a single process of a deployment does it
+    RECOVERS_JOBS = True
+    # ids of the workers that died, see get_worker_id, whose jobs the startup of their replacement queues again without waiting for their lease
+    DEAD_WORKERS = ()
+    # interval at which the pipeline workers look for queued jobs
+    POLL_SECONDS = float(os.getenv("JOB_QUEUE_POLL_SECONDS", "1"))
+
+    # the executor is created lazily so that importing the module stays cheap
+    _executor = None
+    _lock = threading.Lock()
+    # calls submitted and not finished yet
+    _running = 0
+    # event stopping the thread polling for queued jobs
+    _stop_polling = None
+
+    @staticmethod
+    def get_executor() -> ThreadPoolExecutor:
+        """
+        Get the shared worker pool, creating it on first use
+
+        Returns
+        -------
+        ThreadPoolExecutor
+        """
+
+        with JobQueueService._lock:
+            if JobQueueService._executor is None:
+                JobQueueService._executor = ThreadPoolExecutor(max_workers=JobQueueService.MAX_WORKERS, thread_name_prefix="summarization-worker")
+            return JobQueueService._executor
+
+    @staticmethod
+    def get_worker_id(pid: Optional[int] = None) -> str:
+        """
+        Get the id recorded on the jobs claimed by a process
+
+        Parameters
+        ----------
+        pid : Optional[int]
+            Pid of a process of this host, this process by default
+
+        Returns
+        -------
+        str
+            Host name and pid of the process
+        """
+
+        return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+    @staticmethod
+    def submit(fn, *args, **kwargs) -> Future:
+        """
+        Schedule a callable on the worker pool
+
+        Parameters
+        ----------
+        fn : callable
+            Function to run in a worker
+        *args, **kwargs
+            Arguments passed to the function
+
+        Returns
+        -------
+        Future
+        """
+
+        future = JobQueueService.get_executor().submit(fn, *args, **kwargs)
+        with JobQueueService._lock:
+            JobQueueService._running += 1
+        future.add_done_callback(JobQueueService._finished)
+        return future
+
+    @staticmethod
+    def _finished(future: Future):
+        with JobQueueService._lock:
+            JobQueueService._running -= 1
+
+    @staticmethod
+    def start_polling(claim: Callable[[int], list], fn: Callable, interval: Optional[float] = None):
+        """
+        Run the jobs queued in the database, claiming as many as there are idle workers every interval
+
+        Parameters
+        ----------
+        claim : callable
+            Function from a number of jobs to the ids of at most that many queued jobs, marked as taken by this process
+        fn : callable
+            Function running a job from its id
+        interval : Optional[float]
+            Seconds between two claims, POLL_SECONDS by default
+        """
+
+        stop = JobQueueService._stop_polling = threading.Event()
+
+        def poll():
+            while not stop.wait(interval or JobQueueService.POLL_SECONDS):
+                with JobQueueService._lock:
+                    idle = JobQueueService.MAX_WORKERS - JobQueueService._running
+                if idle <= 0:
+                    continue
+                try:
+                    job_ids = claim(idle)
+                except Exception:
+                    # the database is unreachable, try again on the next poll
+                    continue
+                for job_id in job_ids:
+                    JobQueueService.submit(fn, job_id)
+
+        threading.Thread(target=poll, name="summarization-poller", daemon=True).start()
+
+    @staticmethod
+    def submit_bounded(fn, items: list, limit: int) -> list[Future]:
+        """
+        Schedule fn(item) for every item, with at most limit of them waiting in the pool or running at the same time
+
+        The next item is submitted when one finishes, so a large batch does not hold all the
+        workers and leaves room in the pool for the jobs submitted after it.
+
+        Parameters
+        ----------
+        fn : callable
+            Function to run in a worker
+        items : list
+            Argument of every call
+        limit : int
+            Maximum number of calls submitted at the same time
+
+        Returns
+        -------
+        list[Future]
+            Future of every call, in the order of the items
+        """
+
+        futures = [Future() for _ in items]
+        pending = iter(range(len(items)))
+        lock = threading.Lock()
+
+        def submit_next():
+            with lock:
+                index = next(pending, None)
+            if index is None:
+                return
+
+            def done(inner: Future):
+                # Forward the outcome of the call, then start the next one
+                if inner.cancelled():
+                    futures[index].cancel()
+                elif inner.exception() is not None:
+                    futures[index].set_exception(inner.exception())
+                else:
+                    futures[index].set_result(inner.result())
+                submit_next()
+
+            try:
+                JobQueueService.submit(fn, items[index]).add_done_callback(done)
+            except RuntimeError as e:
+                # The pool is shut down, the remaining calls are not run
+                futures[index].set_exception(e)
+                submit_next()
+
+        for _ in range(min(limit, len(items))):
+            submit_next()
+        return futures
+
+    @staticmethod
+    def shutdown(wait: bool = True):
+        """
+        Stop the worker pool
+
+        Parameters
+        ----------
+        wait : bool
+            Wait for the running jobs to finish, by default True
+        """
+
+        if JobQueueService._stop_polling is not None:
+            JobQueueService._stop_polling.set()
+        with JobQueueService._lock:
+            if JobQueueService._executor is not None:
+                JobQueueService._executor.shutdown(wait=wait)
+                JobQueueService._executor = None
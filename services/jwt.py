@@ -4,8 +4,13 @@ from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from models.user import UserModel
+from schemas.user import CurrentUser
+from services.password import PasswordService
 from db import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cachetools import TTLCache
+import threading
 import os
 from dotenv import load_dotenv
 
@@ -24,16 +29,24 @@ class JwtService:
     ALGORITHM = "HS256"
     # access token expire minutes is the number of minutes the access token is valid for
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+    # how the user of a token is resolved:
+    # database queries the user on every request,
+    # cached keeps the users in a short lived cache and checks the token version against it,
+    # stateless trusts the claims of the token and only rejects versions recently revoked by this process
+    AUTH_MODE = os.getenv("JWT_AUTH_MODE", "cached")
+    # cache of the users by id, bounded in size and time so that other processes' changes are picked up
+    _users = TTLCache(maxsize=int(os.getenv("JWT_USER_CACHE_SIZE", "10000")), ttl=int(os.getenv("JWT_USER_CACHE_TTL_SECONDS", "60")))
+    _users_lock = threading.Lock()
 
     @staticmethod
-    def create_access_token(*, user_id: int) -> str:
+    def create_access_token(*, user: UserModel) -> str:
         """
         Create an access token for a user
 
         Parameters
         ----------
-        user_id : int
-            Id of the user
+        user : UserModel
+            User model
 
         Returns
         -------
@@ -41,17 +54,17 @@ class JwtService:
             Access token
         """
 
-        # Create the expire time for the access token 
+        # Create the expire time for the access token
         expire = datetime.utcnow() + timedelta(minutes=JwtService.ACCESS_TOKEN_EXPIRE_MINUTES)
-        # Create the payload for the access token
-        to_encode = dict({"id": user_id, "exp": expire})
+        # Create the payload for the access token, the email and the token version let requests skip the database
+        to_encode = dict({"id": user.id, "email": user.email, "ver": PasswordService.get_token_version(user.password_version), "exp": expire})
         # Encode the payload with the secret key and algorithm
         encoded_jwt = jwt.encode(to_encode, JwtService.SECRET_KEY, algorithm=JwtService.ALGORITHM)
         # Return the encoded JWT
         return encoded_jwt
 
     @staticmethod
-    def get_current_user(token: str = Depends(OAuth2PasswordBearer(tokenUrl="/auth/token")), db: Session = Depends(get_db)) -> UserModel:
+    async def get_current_user(token: str = Depends(OAuth2PasswordBearer(tokenUrl="/auth/token")), db: AsyncSession = Depends(get_db)) -> CurrentUser:
         """
         Get the current user from the access token
 
@@ -59,13 +72,13 @@ class JwtService:
         ----------
         token : str
             Access token, by default Depends(OAuth2PasswordBearer(tokenUrl="/auth/token"))
-        db : Session
-            Database session, by default Depends(get_db)
+        db : AsyncSession
+            Database session, by default Depends(get_db), only used when the user is not cached
 
         Returns
         -------
-        UserModel
-            User model of the current user
+        CurrentUser
+            Current user
 
         """
         try:
@@ -83,11 +96,69 @@ class JwtService:
         except jwt.PyJWTError:
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
+        token_version = payload.get("ver")
+        # Tokens issued before the version claim existed always go to the database
+        if token_version is None:
+            return await JwtService.load_user(user_id, db)
+
+        if JwtService.AUTH_MODE == "database":
+            user = None
+        else:
+            with JwtService._users_lock:
+                user = JwtService._users.get(user_id)
+
+        if user is None:
+            # Trust the signed claims without looking the user up
+            if JwtService.AUTH_MODE == "stateless":
+                return CurrentUser(id=user_id, email=payload.get("email"), token_version=token_version)
+            user = await JwtService.load_user(user_id, db)
+
+        # The password changed since the token was issued
+        if user.token_version != token_version:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+
+        return user
+
+    @staticmethod
+    async def load_user(user_id: int, db: AsyncSession) -> CurrentUser:
+        """
+        Query the database for a user and cache it
+
+        Parameters
+        ----------
+        user_id : int
+            Id of the user
+        db : AsyncSession
+            Database session
+
+        Returns
+        -------
+        CurrentUser
+            Current user
+        """
+
         # Query the database for the user with the provided user id
-        user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        db_user = (await db.execute(select(UserModel).filter(UserModel.id == user_id))).scalars().first()
 
         # If the user is not found, raise an HTTPException
-        if user is None:
+        if db_user is None:
             raise HTTPException(status_code=401, detail="Invalid credentials")
-            
+
+        user = CurrentUser(id=db_user.id, email=db_user.email, token_version=PasswordService.get_token_version(db_user.password_version))
+        with JwtService._users_lock:
+            JwtService._users[user_id] = user
         return user
+
+    @staticmethod
+    def invalidate_user(user: UserModel):
+        """
+        Replace the cached user after its credentials changed, revoking the tokens with the previous version
+
+        Parameters
+        ----------
+        user : UserModel
+            User model with the new credentials
+        """
+
+        with JwtService._users_lock:
+            JwtService._users[user.id] = CurrentUser(id=user.id, email=user.email, token_version=PasswordService.get_token_version(user.password_version))
@@ -0,0 +1,221 @@
+# services/llm.py
+from services.admission import AdmissionService
+from services.resilience import ResilienceService
+from dotenv import load_dotenv
+from typing import Iterator
+import time
+import os
+
+# load environment variables for the language models
+load_dotenv()
+
+class OpenAILLMClient:
+    """
+    LLM client backed by OpenAI's completion API
+    """
+
+    @staticmethod
+    def stream(prompt: str, model: str, max_tokens: int) -> Iterator[str]:
+        """
+        Generate a completion, yielding its tokens as they are generated
+
+        Parameters
+        ----------
+        prompt : str
+            Prompt to complete
+        model : str
+            Completion model
+        max_tokens : int
+            Maximum number of tokens to generate
+
+        Returns
+        -------
+        Iterator[str]
+        """
+
+        # imported here, langchain takes a second to import and only the pipeline and the questions need it
+        from langchain import OpenAI
+
+        # set the temperature to 0 to get deterministic results
+        llm = OpenAI(temperature=0, model_name=model, max_tokens=max_tokens)
+        # the request is retried until the first token arrives
+        for response in ResilienceService.call_stream("openai", lambda: llm.stream(prompt)):
+            yield response["choices"][0]["text"]
+
+    @staticmethod
+    def context_size(model: str) -> int:
+        """
+        Get the number of tokens of the context of a model, prompt and completion included
+        """
+
+        from langchain import OpenAI
+
+        return OpenAI(model_name=model).modelname_to_contextsize(model)
+
+    @staticmethod
+    def get_encoding(model: str) -> "tiktoken.Encoding":
+        """
+        Get the tokenizer of a model, downloaded by tiktoken on first use
+        """
+
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # unknown models use the tokenizer of the current generation
+            return tiktoken.get_encoding("cl100k_base")
+
+class WhitespaceEncoding:
+    """
+    Tokenizer of the fake model, a token is a word
+    """
+
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+    def decode(self, tokens: list[str]) -> str:
+        return " ".join(tokens)
+
+class FakeLLMClient:
+    """
+    LLM client that answers locally, used to run the pipeline and the streams without OpenAI
+    """
+
+    # context of the fake model
+    CONTEXT_SIZE = int(os.getenv("FAKE_LLM_CONTEXT_SIZE", "4097"))
+    # seconds before the first token and between two tokens, to benchmark the fake model like a remote one
+    FIRST_TOKEN_SECONDS = float(os.getenv("FAKE_LLM_FIRST_TOKEN_SECONDS", "0"))
+    TOKEN_SECONDS = float(os.getenv("FAKE_LLM_TOKEN_SECONDS", "0"))
+
+    @staticmethod
+    def stream(prompt: str, model: str, max_tokens: int) -> Iterator[str]:
+        """
+        Yield the first words of the prompt as a deterministic completion
+        """
+
+        time.sleep(FakeLLMClient.FIRST_TOKEN_SECONDS)
+        for index, word in enumerate(prompt.split()[:max_tokens]):
+            if index:
+                time.sleep(FakeLLMClient.TOKEN_SECONDS)
+            yield word if index == 0 else " " + word
+
+    @staticmethod
+    def context_size(model: str) -> int:
+        """
+        Get the number of tokens of the context of the fake model
+        """
+
+        return FakeLLMClient.CONTEXT_SIZE
+
+    @staticmethod
+    def get_encoding(model: str) -> WhitespaceEncoding:
+        """
+        Get the tokenizer of the fake model, available offline
+        """
+
+        return WhitespaceEncoding()
+
+class LLMService:
+    """
+    Service class for generating completions with the configured backend
+    """
+
+    # LLM clients by backend name, a client has the stream, context_size and get_encoding methods
+    CLIENTS = {
+        "openai": OpenAILLMClient,
+        "fake": FakeLLMClient,
+    }
+    # backend used to generate the completions
+    BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+    @staticmethod
+    def get_client():
+        """
+        Get the LLM client of the configured backend
+
+        Returns
+        -------
+        OpenAILLMClient or FakeLLMClient
+        """
+
+        return LLMService.CLIENTS[LLMService.BACKEND]
+
+    @staticmethod
+    def stream(prompt: str, model: str, max_tokens: int) -> Iterator[str]:
+        """
+        Generate a completion, yielding its tokens as they are generated
+
+        Parameters
+        ----------
+        prompt : str
+            Prompt to complete
+        model : str
+            Completion model
+        max_tokens : int
+            Maximum number of tokens to generate
+
+        Returns
+        -------
+        Iterator[str]
+        """
+
+        # The API slot is held until the completion is consumed
+        with AdmissionService.slot("api"):
+            yield from LLMService.get_client().stream(prompt, model, max_tokens)
+
+    @staticmethod
+    def complete(prompt: str, model: str, max_tokens: int) -> str:
+        """
+        Generate a whole completion
+
+        Parameters
+        ----------
+        prompt : str
+            Prompt to complete
+        model : str
+            Completion model
+        max_tokens : int
+            Maximum number of tokens to generate
+
+        Returns
+        -------
+        str
+        """
+
+        return "".join(LLMService.stream(prompt, model, max_tokens)).strip()
+
+    @staticmethod
+    def context_size(model: str) -> int:
+        """
+        Get the number of tokens of the context of a model, prompt and completion included
+
+        Parameters
+        ----------
+        model : str
+            Completion model
+
+        Returns
+        -------
+        int
+        """
+
+        return LLMService.get_client().context_size(model)
+
+    @staticmethod
+    def get_encoding(model: str):
+        """
+        Get the tokenizer of a model
+
+        Parameters
+        ----------
+        model : str
+            Completion model
+
+        Returns
+        -------
+        tiktoken.Encoding or WhitespaceEncoding
+            Object with encode and decode methods
+        """
+
+        return LLMService.get_client().get_encoding(model)
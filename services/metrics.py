@@ -0,0 +1,129 @@
+# services/metrics.py
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import time
+import os
+
+class DatabasePoolCollector:
+    """
+    Prometheus collector reporting the connection pools of the database engines when they are scraped
+    """
+
+    def __init__(self, engines: dict):
+        # engines by label, sync engines or async engines
+        self.engines = engines
+
+    def collect(self):
+        gauges = {
+            "size": GaugeMetricFamily("wiser_db_pool_size", "Connections kept open by the pool", labels=["engine"]),
+            "checkedout": GaugeMetricFamily("wiser_db_pool_checked_out", "Connections in use", labels=["engine"]),
+            "checkedin": GaugeMetricFamily("wiser_db_pool_checked_in", "Idle connections in the pool", labels=["engine"]),
+            "overflow": GaugeMetricFamily("wiser_db_pool_overflow", "Connections open above the size of the pool", labels=["engine"]),
+        }
+        for name, engine in self.engines.items():
+            pool = getattr(engine, "sync_engine", engine).pool
+            for method, gauge in gauges.items():
+                # pools without connection reuse (SQLite's NullPool) do not report these
+                if hasattr(pool, method):
+                    gauge.add_metric([name], getattr(pool, method)())
+        return list(gauges.values())
+
+class MetricsService:
+    """
+    Service class for the Prometheus metrics of the API and the summarization pipeline
+    """
+
+    # duration of the pipeline stages, from seconds for the metadata to tens of minutes for the transcription of long videos
+    STAGE_SECONDS = Histogram("wiser_pipeline_stage_seconds", "Duration of the summarization pipeline stages", ["stage"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+    STAGE_FAILURES = Counter("wiser_pipeline_stage_failures_total", "Summarization pipeline stages that raised an exception", ["stage"])
+    CACHE_LOOKUPS = Counter("wiser_artifact_cache_lookups_total", "Artifact cache lookups of the pipeline stages", ["stage", "result"])
+    JOBS = Counter("wiser_summarization_jobs_total", "Summarization jobs finished", ["state"])
+    ADMISSION_REJECTIONS = Counter("wiser_admission_rejections_total", "Requests answered with a 429 by the admission control", ["limit"])
+    ADMISSION_WAIT_SECONDS = Histogram("wiser_admission_slot_wait_seconds", "Time spent waiting for a transcode or API slot", ["slot"], buckets=(0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900))
+    DEPENDENCY_RETRIES = Counter("wiser_dependency_retries_total", "Calls to OpenAI, YouTube and Google Cloud Storage retried after a transient failure", ["dependency"])
+    CIRCUIT_OPENED = Counter("wiser_circuit_breaker_opened_total", "Times the circuit breaker of a dependency opened", ["dependency"])
+    REQUEST_SECONDS = Histogram("wiser_http_request_duration_seconds", "Duration of the HTTP requests until the response starts", ["method", "route", "status"])
+
+    # collector of the pools, registered once, apps built again in the same process share it
+    _pool_collector = None
+
+    @staticmethod
+    def register_database_pools(engines: dict):
+        """
+        Report the connection pools of database engines
+
+        Parameters
+        ----------
+        engines : dict
+            Engines by label
+        """
+
+        if MetricsService._pool_collector is not None:
+            return
+        MetricsService._pool_collector = DatabasePoolCollector(engines)
+        REGISTRY.register(MetricsService._pool_collector)
+
+    @staticmethod
+    def render() -> bytes:
+        """
+        Render the metrics in the Prometheus text format
+
+        With several server processes (PROMETHEUS_MULTIPROC_DIR set before prometheus_client is imported)
+        the counters and histograms of every process are aggregated from their files, the pools are those
+        of the process answering the scrape.
+
+        Returns
+        -------
+        bytes
+        """
+
+        if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+            return generate_latest()
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        if MetricsService._pool_collector is not None:
+            registry.register(MetricsService._pool_collector)
+        return generate_latest(registry)
+
+    @staticmethod
+    @contextmanager
+    def stage(name: str, timings: Optional[dict] = None) -> Iterator[None]:
+        """
+        Time a pipeline stage, counting it as failed if it raises
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+        timings : Optional[dict]
+            Timings of the job, the duration of the stage in seconds is added to it
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            MetricsService.STAGE_FAILURES.labels(name).inc()
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            MetricsService.STAGE_SECONDS.labels(name).observe(duration)
+            if timings is not None:
+                timings[name] = round(timings.get(name, 0) + duration, 3)
+
+    @staticmethod
+    def count_cache_lookup(stage: str, hit: bool):
+        """
+        Count an artifact cache lookup of a pipeline stage
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage
+        hit : bool
+            Whether the artifact was cached
+        """
+
+        MetricsService.CACHE_LOOKUPS.labels(stage, "hit" if hit else "miss").inc()
@@ -1,10 +1,10 @@
-from langchain.document_loaders import YoutubeLoader
-from langchain import OpenAI
-from langchain.chains.summarize import load_summarize_chain
-from langchain.text_splitter import CharacterTextSplitter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain.docstore.document import Document
-import openai
+import os
+from typing import BinaryIO, Callable, Optional
+from schemas.transcript import Transcript, TranscriptSegment
+from services.llm import LLMService
+from services.resilience import ResilienceService
 
 # load environment variables for OpenAI
 load_dotenv()
@@ -14,54 +14,237 @@ class OpenAIService:
     Service class for OpenAI related operations
     """
 
+    # completion model used to summarize
+    SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "text-davinci-003")
+    # maximum number of tokens generated by each summary
+    SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "256"))
+    # speech to text model
+    TRANSCRIPTION_MODEL = "whisper-1"
+    # number of completion requests sent at the same time
+    SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+    # embedding model of the transcript chunks and the questions
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    # completion model and maximum number of tokens of the answers to the questions on a video
+    CHAT_MODEL = os.getenv("CHAT_MODEL", SUMMARY_MODEL)
+    CHAT_MAX_TOKENS = int(os.getenv("CHAT_MAX_TOKENS", "256"))
+    # prompt of the answers, the context holds the transcript chunks retrieved for the question
+    CHAT_PROMPT = (
+        "Answer the question about a video using only the following excerpts of its transcript. "
+        "If the excerpts do not contain the answer, say that you don't know.\n\n"
+        "Excerpts:\n{context}\n\nQuestion: {question}\nAnswer:"
+    )
+
+    # tokens of transcript per prompt by model, computed on the first summary
+    _chunk_tokens = {}
+
+    @staticmethod
+    def get_chunk_tokens() -> int:
+        """
+        Get the number of tokens of text that fit in a summary prompt of SUMMARY_MODEL
+
+        It is computed and checked when a process that runs the pipelines starts, the tokenizer and
+        the prompt of the model are only loaded by these processes.
+
+        Returns
+        -------
+        int
+
+        Raises
+        ------
+        ValueError
+            When the prompt and SUMMARY_MAX_TOKENS leave no room for two summaries in the context of the model,
+            a reduce prompt holds at least two
+        """
+
+        model = OpenAIService.SUMMARY_MODEL
+        if model not in OpenAIService._chunk_tokens:
+            # imported here, langchain takes a second to import and only the pipeline needs it
+            from langchain.chains.summarize.map_reduce_prompt import PROMPT
+
+            context_size = LLMService.context_size(model)
+            prompt_tokens = len(LLMService.get_encoding(model).encode(PROMPT.format(text="")))
+            # room left for the text once the prompt and the completion are accounted for
+            chunk_tokens = context_size - OpenAIService.SUMMARY_MAX_TOKENS - prompt_tokens
+            # group_tokens puts at least two summaries, and their separators, in every reduce prompt
+            if chunk_tokens < 2 * (OpenAIService.SUMMARY_MAX_TOKENS + 1):
+                raise ValueError(
+                    f"SUMMARY_MAX_TOKENS={OpenAIService.SUMMARY_MAX_TOKENS} leaves no room for two summaries in a reduce prompt: "
+                    f"the context of {model} holds {context_size} tokens and the prompt takes {prompt_tokens}, "
+                    f"set SUMMARY_MAX_TOKENS to at most {(context_size - prompt_tokens - 2) // 3}"
+                )
+            OpenAIService._chunk_tokens[model] = chunk_tokens
+        return OpenAIService._chunk_tokens[model]
+
     @staticmethod
-    def summarize(transcript) -> str:
+    def summarize(transcript, on_token: Optional[Callable[[str], None]] = None) -> str:
         """
-        Summarize a transcript using OpenAI's API
+        Summarize a whole transcript with the configured language model
+
+        The transcript is split in chunks that fit the context of the model, the chunks are
+        summarized concurrently (map) and the summaries are combined (reduce). When the summaries
+        do not fit in a single prompt they are combined by groups, level by level.
 
         Parameters
         ----------
         transcript : str
             Transcript to summarize
+        on_token : Optional[Callable[[str], None]]
+            Called with every token of the final summary as it is generated
 
         Returns
         -------
         str
         """
-        
-        # create an OpenAI instance, set the temperature to 0 to get deterministic results
-        llm = OpenAI(temperature=0)
-        # create a text splitter to split the transcript into chunks of 1000 characters with 0 character overlap
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-        # split the transcript into chunks of 1000 characters with 0 character overlap
-        texts = text_splitter.split_text(transcript)
-        # create a list of documents from the chunks of text
-        docs = [Document(page_content=t) for t in texts[:3]]
-        # create a summarize chain
-        chain = load_summarize_chain(llm, chain_type="map_reduce")
-        # run the chain on the documents and return the result
-        return chain.run(docs)
-    
+
+        # imported here, langchain takes a second to import and only the pipeline needs it
+        from langchain.chains.summarize.map_reduce_prompt import PROMPT
+
+        encoding = LLMService.get_encoding(OpenAIService.SUMMARY_MODEL)
+        chunk_tokens = OpenAIService.get_chunk_tokens()
+
+        def complete(text: str) -> str:
+            return LLMService.complete(PROMPT.format(text=text), OpenAIService.SUMMARY_MODEL, OpenAIService.SUMMARY_MAX_TOKENS)
+
+        def complete_final(text: str) -> str:
+            # the last completion produces the summary, stream it to the listeners
+            if on_token is None:
+                return complete(text)
+            tokens = []
+            for token in LLMService.stream(PROMPT.format(text=text), OpenAIService.SUMMARY_MODEL, OpenAIService.SUMMARY_MAX_TOKENS):
+                tokens.append(token)
+                on_token(token)
+            return "".join(tokens).strip()
+
+        with ThreadPoolExecutor(max_workers=OpenAIService.SUMMARY_CONCURRENCY) as executor:
+            # map: summarize every chunk of the transcript
+            chunks = OpenAIService.split_tokens(transcript, chunk_tokens, encoding)
+            summaries = [complete_final(chunks[0])] if len(chunks) == 1 else list(executor.map(complete, chunks))
+            # reduce: combine the summaries until a single one is left
+            while len(summaries) > 1:
+                groups = ["\n".join(group) for group in OpenAIService.group_tokens(summaries, chunk_tokens, encoding)]
+                summaries = [complete_final(groups[0])] if len(groups) == 1 else list(executor.map(complete, groups))
+
+        return summaries[0] if summaries else ""
+
+    @staticmethod
+    def split_tokens(text: str, chunk_tokens: int, encoding) -> list[str]:
+        """
+        Split a text in chunks of at most chunk_tokens tokens
+
+        Parameters
+        ----------
+        text : str
+            Text to split
+        chunk_tokens : int
+            Maximum number of tokens of a chunk
+        encoding : tiktoken.Encoding
+            Tokenizer of the model, from LLMService.get_encoding
+
+        Returns
+        -------
+        list[str]
+        """
+
+        tokens = encoding.encode(text)
+        return [encoding.decode(tokens[i:i + chunk_tokens]) for i in range(0, len(tokens), chunk_tokens)]
+
     @staticmethod
-    def transcribe(audio_path: str) -> str:
+    def group_tokens(texts: list[str], max_tokens: int, encoding) -> list[list[str]]:
         """
-        Transcribe an audio file using OpenAI's API
+        Group consecutive texts so that each group fits in max_tokens tokens
+
+        Every group holds at least two texts so that each reduce level makes progress.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to group
+        max_tokens : int
+            Maximum number of tokens of a group
+        encoding : tiktoken.Encoding
+            Tokenizer of the model, from LLMService.get_encoding
+
+        Returns
+        -------
+        list[list[str]]
+        """
+
+        groups = [[]]
+        size = 0
+        for text in texts:
+            tokens = len(encoding.encode(text)) + 1
+            if len(groups[-1]) >= 2 and size + tokens > max_tokens:
+                groups.append([])
+                size = 0
+            groups[-1].append(text)
+            size += tokens
+        return groups
+
+    @staticmethod
+    def answer(question: str, context: list[str]) -> str:
+        """
+        Answer a question about a video from excerpts of its transcript with the configured language model
 
         Parameters
         ----------
-        audio_path : str
-            Path to the audio file
-        
+        question : str
+            Question of the user
+        context : list[str]
+            Transcript chunks relevant to the question
+
         Returns
         -------
         str
+        """
+
+        return LLMService.complete(OpenAIService.CHAT_PROMPT.format(context="\n\n".join(context), question=question), OpenAIService.CHAT_MODEL, OpenAIService.CHAT_MAX_TOKENS)
+
+    @staticmethod
+    @ResilienceService.resilient("openai")
+    def embed(texts: list[str]) -> list[list[float]]:
+        """
+        Embed texts using OpenAI's API
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed
+
+        Returns
+        -------
+        list[list[float]]
+            Embedding of every text, in the same order
+        """
+
+        import openai
+
+        response = openai.Embedding.create(model=OpenAIService.EMBEDDING_MODEL, input=texts)
+        # the embeddings are not guaranteed to come back in the order of the input
+        return [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+
+    @staticmethod
+    @ResilienceService.resilient("openai")
+    def transcribe(audio_file: BinaryIO) -> Transcript:
+        """
+        Transcribe an audio file using OpenAI's API
+
+        Parameters
+        ----------
+        audio_file : BinaryIO
+            Audio file, its name must carry the extension of the audio container
+
+        Returns
+        -------
+        Transcript
 
         """
 
-        # load environment variables for OpenAI
-        with open(audio_path, "rb") as audio_file:
-            # transcribe the audio file using whisper-1
-            transcript = openai.Audio.transcribe("whisper-1", audio_file)
-            
+        # send the file from its beginning, a retried attempt follows one that read it
+        audio_file.seek(0)
+        import openai
+
+        # transcribe the audio file using whisper-1, verbose_json adds the timestamped segments
+        response = openai.Audio.transcribe(OpenAIService.TRANSCRIPTION_MODEL, audio_file, response_format="verbose_json")
+
         # return the transcript
-        return transcript
\ No newline at end of file
+        return Transcript(text=response["text"], segments=[TranscriptSegment(start=segment["start"], end=segment["end"], text=segment["text"]) for segment in response.get("segments", [])])
@@ -0,0 +1,172 @@
+# services/password.py
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+import multiprocessing
+import threading
+import asyncio
+import bcrypt
+import os
+
+# load environment variables for password hashing
+load_dotenv()
+
+class PasswordService:
+    """
+    Service class for hashing and verifying passwords in a dedicated process pool
+
+    bcrypt is CPU bound, running it in worker processes keeps it off the event loop and
+    lets logins scale with the number of cores. This module is imported by the workers,
+    keep its imports light.
+    """
+
+    # bcrypt cost factor of new hashes, existing hashes with another cost are rehashed on login
+    ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # number of worker processes
+    WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+    # the pool is created on first use
+    _executor = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_executor() -> ProcessPoolExecutor:
+        """
+        Get the shared process pool, creating it on first use
+
+        Returns
+        -------
+        ProcessPoolExecutor
+        """
+
+        with PasswordService._lock:
+            if PasswordService._executor is None:
+                # spawn instead of fork, the server process runs threads
+                PasswordService._executor = ProcessPoolExecutor(max_workers=PasswordService.WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            return PasswordService._executor
+
+    @staticmethod
+    def shutdown():
+        """
+        Stop the process pool
+        """
+
+        with PasswordService._lock:
+            if PasswordService._executor is not None:
+                PasswordService._executor.shutdown(wait=False, cancel_futures=True)
+                PasswordService._executor = None
+
+    @staticmethod
+    def hash_password_sync(password: str, rounds: int) -> str:
+        """
+        Hash a password with bcrypt in the current process
+
+        Parameters
+        ----------
+        password : str
+            Password to hash
+        rounds : int
+            bcrypt cost factor
+
+        Returns
+        -------
+        str
+            Password hash
+        """
+
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+    @staticmethod
+    def verify_password_sync(password: str, password_hash: str) -> bool:
+        """
+        Verify a password against a bcrypt hash in the current process
+
+        Parameters
+        ----------
+        password : str
+            Password to verify
+        password_hash : str
+            Password hash
+
+        Returns
+        -------
+        bool
+        """
+
+        return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+    @staticmethod
+    async def hash_password(password: str) -> str:
+        """
+        Hash a password in the process pool
+
+        Parameters
+        ----------
+        password : str
+            Password to hash
+
+        Returns
+        -------
+        str
+            Password hash
+        """
+
+        return await asyncio.get_running_loop().run_in_executor(PasswordService.get_executor(), PasswordService.hash_password_sync, password, PasswordService.ROUNDS)
+
+    @staticmethod
+    async def verify_password(password: str, password_hash: str) -> bool:
+        """
+        Verify a password against a bcrypt hash in the process pool
+
+        Parameters
+        ----------
+        password : str
+            Password to verify
+        password_hash : str
+            Password hash
+
+        Returns
+        -------
+        bool
+        """
+
+        return await asyncio.get_running_loop().run_in_executor(PasswordService.get_executor(), PasswordService.verify_password_sync, password, password_hash)
+
+    @staticmethod
+    def needs_rehash(password_hash: str) -> bool:
+        """
+        Check if a hash was created with another cost factor than the configured one
+
+        Parameters
+        ----------
+        password_hash : str
+            bcrypt hash, formatted as $2b$<cost>$<salt and hash>
+
+        Returns
+        -------
+        bool
+        """
+
+        try:
+            return int(password_hash.split("$")[2]) != PasswordService.ROUNDS
+        except (IndexError, ValueError):
+            return True
+
+    @staticmethod
+    def get_token_version(password_version: int) -> str:
+        """
+        Get the version of the credentials of a user, embedded in the access tokens
+
+        It is the password version, so changing the password revokes the tokens issued before while
+        rehashing the same password at login keeps the sessions of the user.
+
+        Parameters
+        ----------
+        password_version : int
+            password_version of the user
+
+        Returns
+        -------
+        str
+        """
+
+        return str(password_version or 0)
@@ -0,0 +1,287 @@
+# services/resilience.py
+from services.metrics import MetricsService
+from tenacity import Retrying, stop_after_attempt, wait_random_exponential, retry_if_exception
+from urllib.error import HTTPError, URLError
+from dotenv import load_dotenv
+from typing import Callable, Iterator, Optional
+import http.client
+import functools
+import threading
+import time
+import os
+
+# load environment variables for the retries and the circuit breakers
+load_dotenv()
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a dependency whose circuit breaker is open
+    """
+
+    def __init__(self, dependency: str, retry_after: float):
+        super().__init__(f"{dependency} is unavailable, retry in {int(retry_after) + 1} seconds")
+        self.dependency = dependency
+        # seconds until the breaker lets a call through again
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a dependency
+
+    The breaker opens after failure_threshold consecutive transient failures and rejects the calls
+    for reset_seconds, then lets a single trial call through: the breaker closes if it succeeds
+    and opens again if it fails.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Check that a call may go through
+
+        Raises
+        ------
+        CircuitOpenError
+            When the breaker is open, or half open with its trial call in flight
+        """
+
+        with self._lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == CircuitBreaker.OPEN and remaining <= 0:
+                # Let this call through as the trial, the next ones are rejected until it ends
+                self.state = CircuitBreaker.HALF_OPEN
+                return
+            raise CircuitOpenError(self.name, max(remaining, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CircuitBreaker.OPEN:
+                    MetricsService.CIRCUIT_OPENED.labels(self.name).inc()
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = time.monotonic()
+
+def is_transient_openai_error(e: Exception) -> bool:
+    """
+    Rate limits, timeouts, connection errors and server errors of OpenAI are transient,
+    invalid requests and authentication errors are not
+    """
+
+    # the clients are imported when a call fails, they are loaded by then
+    from openai import error as openai_errors
+
+    if isinstance(e, (openai_errors.RateLimitError, openai_errors.Timeout, openai_errors.TryAgain, openai_errors.APIConnectionError, openai_errors.ServiceUnavailableError)):
+        return True
+    return isinstance(e, openai_errors.APIError) and (e.http_status is None or e.http_status >= 500)
+
+def is_transient_youtube_error(e: Exception) -> bool:
+    """
+    Rate limits, server errors and dropped connections of YouTube are transient,
+    pytube errors (invalid URL, unavailable, private or age restricted video) are not
+    """
+
+    if isinstance(e, HTTPError):
+        return e.code == 429 or e.code >= 500
+    return isinstance(e, (URLError, http.client.HTTPException, ConnectionError, TimeoutError))
+
+def is_transient_gcs_error(e: Exception) -> bool:
+    """
+    Rate limits, server errors and dropped connections of Google Cloud Storage are transient
+    """
+
+    from google.api_core import exceptions as google_exceptions
+    from google.auth.exceptions import TransportError
+    import requests
+
+    return isinstance(e, (google_exceptions.TooManyRequests, google_exceptions.ServerError, TransportError, requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError, ConnectionError, TimeoutError))
+
+class ResilienceService:
+    """
+    Service class for calling the external dependencies with retries and circuit breakers
+
+    Transient failures are retried with jittered exponential backoff, so a rate limit in the
+    middle of a pipeline only repeats the failed call instead of the stages before it. Other
+    failures are raised at once and do not count against the breaker, the dependency answered.
+    """
+
+    # attempts of a call, the first one included
+    MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+    # base and maximum of the random exponential backoff between the attempts, in seconds
+    BACKOFF_SECONDS = float(os.getenv("RETRY_BACKOFF_SECONDS", "1"))
+    MAX_BACKOFF_SECONDS = float(os.getenv("RETRY_MAX_BACKOFF_SECONDS", "30"))
+    # consecutive transient failures that open the breaker of a dependency and seconds it stays open
+    BREAKER_FAILURES = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+    BREAKER_RESET_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+
+    # classifier of the transient failures by dependency
+    CLASSIFIERS = {
+        "openai": is_transient_openai_error,
+        "youtube": is_transient_youtube_error,
+        "gcs": is_transient_gcs_error,
+    }
+    # breakers by dependency, shared by the threads of the process
+    _breakers = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_breaker(dependency: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker of a dependency, creating it on first use
+        """
+
+        with ResilienceService._lock:
+            if dependency not in ResilienceService._breakers:
+                ResilienceService._breakers[dependency] = CircuitBreaker(dependency, ResilienceService.BREAKER_FAILURES, ResilienceService.BREAKER_RESET_SECONDS)
+            return ResilienceService._breakers[dependency]
+
+    @staticmethod
+    def get_retry_after(e: Exception) -> Optional[float]:
+        """
+        Get the delay requested by the Retry-After header of a failed response, if any
+        """
+
+        headers = getattr(e, "headers", None)
+        try:
+            return float(headers.get("retry-after") or headers.get("Retry-After"))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def retrying(dependency: str) -> Retrying:
+        """
+        Build the retry loop of a call to a dependency
+
+        Parameters
+        ----------
+        dependency : str
+            Name of the dependency
+
+        Returns
+        -------
+        Retrying
+        """
+
+        backoff = wait_random_exponential(multiplier=ResilienceService.BACKOFF_SECONDS, max=ResilienceService.MAX_BACKOFF_SECONDS)
+
+        def wait(retry_state) -> float:
+            # Wait at least as long as the dependency asked to
+            retry_after = ResilienceService.get_retry_after(retry_state.outcome.exception())
+            return max(backoff(retry_state), min(retry_after or 0, ResilienceService.MAX_BACKOFF_SECONDS))
+
+        return Retrying(
+            stop=stop_after_attempt(ResilienceService.MAX_ATTEMPTS),
+            wait=wait,
+            retry=retry_if_exception(ResilienceService.CLASSIFIERS[dependency]),
+            before_sleep=lambda retry_state: MetricsService.DEPENDENCY_RETRIES.labels(dependency).inc(),
+            reraise=True,
+        )
+
+    @staticmethod
+    def attempt(dependency: str, fn: Callable, *args, **kwargs):
+        """
+        Make a single attempt of a call through the breaker of a dependency
+        """
+
+        breaker = ResilienceService.get_breaker(dependency)
+        breaker.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if ResilienceService.CLASSIFIERS[dependency](e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+    @staticmethod
+    def call(dependency: str, fn: Callable, *args, **kwargs):
+        """
+        Call a dependency, retrying the transient failures
+
+        Parameters
+        ----------
+        dependency : str
+            Name of the dependency, openai, youtube or gcs
+        fn : callable
+            Function calling the dependency
+        *args, **kwargs
+            Arguments passed to the function
+
+        Raises
+        ------
+        CircuitOpenError
+            When the breaker of the dependency is open
+        """
+
+        for attempt in ResilienceService.retrying(dependency):
+            with attempt:
+                return ResilienceService.attempt(dependency, fn, *args, **kwargs)
+
+    @staticmethod
+    def call_stream(dependency: str, fn: Callable[[], Iterator]) -> Iterator:
+        """
+        Call a dependency answering with a stream, retrying the transient failures until the first item arrives
+
+        Items already handed to the caller cannot be taken back, so a failure later in the stream is raised.
+
+        Parameters
+        ----------
+        dependency : str
+            Name of the dependency
+        fn : callable
+            Function without arguments opening the stream
+
+        Returns
+        -------
+        Iterator
+        """
+
+        def open_stream():
+            iterator = iter(fn())
+            return iterator, next(iterator, StopIteration)
+
+        iterator, first = ResilienceService.call(dependency, open_stream)
+        if first is StopIteration:
+            return
+        yield first
+        yield from iterator
+
+    @staticmethod
+    def resilient(dependency: str):
+        """
+        Decorator retrying the transient failures of a function calling a dependency
+
+        Parameters
+        ----------
+        dependency : str
+            Name of the dependency
+        """
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return ResilienceService.call(dependency, fn, *args, **kwargs)
+            return wrapper
+
+        return decorator
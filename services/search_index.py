@@ -0,0 +1,215 @@
+# services/search_index.py
+from schemas.transcript import Transcript
+from dotenv import load_dotenv
+from typing import Optional
+import sqlite3
+import tempfile
+import threading
+import json
+import re
+import os
+
+# load environment variables for the search index
+load_dotenv()
+
+class SearchIndexService:
+    """
+    Service class for the full-text index of the transcripts and summaries
+
+    The index is a SQLite FTS5 table on local disk holding the passages of every video, with the
+    time of the segment they come from, so that a hit points to a position in the video. Videos are
+    shared by the summarizations of every user, searches are scoped by the videos of the caller. The
+    passages of a video have consecutive rowids, so reindexing a video deletes its range of rowids.
+    """
+
+    # file of the index
+    PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(tempfile.gettempdir(), "wiser-search.sqlite3"))
+    # maximum number of words of an indexed passage, longer segments are split
+    PASSAGE_WORDS = int(os.getenv("SEARCH_INDEX_PASSAGE_WORDS", "60"))
+    # number of words around the matches in a snippet
+    SNIPPET_WORDS = int(os.getenv("SEARCH_SNIPPET_WORDS", "16"))
+
+    TRANSCRIPT = "transcript"
+    SUMMARY = "summary"
+
+    # one connection per thread, SQLite connections are not shared between threads
+    _connections = threading.local()
+
+    @staticmethod
+    def get_connection() -> sqlite3.Connection:
+        """
+        Get the connection of the current thread, creating the index on first use
+
+        Returns
+        -------
+        sqlite3.Connection
+        """
+
+        connection = getattr(SearchIndexService._connections, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(SearchIndexService.PATH)), exist_ok=True)
+            connection = sqlite3.connect(SearchIndexService.PATH, timeout=30)
+            # readers are not blocked by the pipeline writing a video
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+                    text, video_id UNINDEXED, kind UNINDEXED, start UNINDEXED, "end" UNINDEXED,
+                    tokenize = 'porter unicode61 remove_diacritics 2'
+                );
+                CREATE TABLE IF NOT EXISTS video_passages (video_id TEXT PRIMARY KEY, first_rowid INTEGER NOT NULL, last_rowid INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS ix_video_passages_last_rowid ON video_passages (last_rowid);
+            """)
+            SearchIndexService._connections.connection = connection
+        return connection
+
+    @staticmethod
+    def split_passages(transcript: Transcript) -> list[tuple[Optional[float], Optional[float], str]]:
+        """
+        Split a transcript in passages of at most PASSAGE_WORDS words, timed by their segment
+
+        Parameters
+        ----------
+        transcript : Transcript
+            Transcript to split, a transcript without segments gives untimed passages
+
+        Returns
+        -------
+        list[tuple[Optional[float], Optional[float], str]]
+            (start, end, text) of every passage
+        """
+
+        segments = [(segment.start, segment.end, segment.text) for segment in transcript.segments] or [(None, None, transcript.text)]
+        passages = []
+        for start, end, text in segments:
+            words = text.split()
+            for i in range(0, len(words), SearchIndexService.PASSAGE_WORDS):
+                passages.append((start, end, " ".join(words[i:i + SearchIndexService.PASSAGE_WORDS])))
+        return passages
+
+    @staticmethod
+    def index_video(video_id: str, transcript: Transcript, summary: str):
+        """
+        Index the transcript and the summary of a video, replacing a previous index of the video
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        transcript : Transcript
+            Transcript of the video
+        summary : str
+            Summary of the video
+        """
+
+        rows = [(text, video_id, SearchIndexService.TRANSCRIPT, start, end) for start, end, text in SearchIndexService.split_passages(transcript)]
+        rows.append((summary, video_id, SearchIndexService.SUMMARY, None, None))
+        connection = SearchIndexService.get_connection()
+        # The passages of a video are replaced in a single transaction, searches see the old or the new ones
+        with connection:
+            # Take the write lock before reading the last rowid, so the ranges of two writers never overlap
+            connection.execute("BEGIN IMMEDIATE")
+            previous = connection.execute("SELECT first_rowid, last_rowid FROM video_passages WHERE video_id = ?", (video_id,)).fetchone()
+            if previous:
+                connection.execute("DELETE FROM passages WHERE rowid BETWEEN ? AND ?", previous)
+            first_rowid = connection.execute("SELECT COALESCE(MAX(last_rowid), 0) + 1 FROM video_passages").fetchone()[0]
+            connection.executemany('INSERT INTO passages (rowid, text, video_id, kind, start, "end") VALUES (?, ?, ?, ?, ?, ?)', [(first_rowid + i, *row) for i, row in enumerate(rows)])
+            connection.execute("INSERT OR REPLACE INTO video_passages (video_id, first_rowid, last_rowid) VALUES (?, ?, ?)", (video_id, first_rowid, first_rowid + len(rows) - 1))
+
+    @staticmethod
+    def get_missing_video_ids(video_ids: list[str]) -> list[str]:
+        """
+        Get the videos that are not indexed yet
+
+        Parameters
+        ----------
+        video_ids : list[str]
+            Video ids of YouTube videos
+
+        Returns
+        -------
+        list[str]
+        """
+
+        ranges = SearchIndexService.get_rowid_ranges(video_ids)
+        return [video_id for video_id in video_ids if video_id not in ranges]
+
+    @staticmethod
+    def get_rowid_ranges(video_ids: list[str]) -> dict[str, tuple[int, int]]:
+        """
+        Get the rowids of the passages of the indexed videos
+
+        Parameters
+        ----------
+        video_ids : list[str]
+            Video ids of YouTube videos
+
+        Returns
+        -------
+        dict[str, tuple[int, int]]
+            First and last rowid of the passages by video id, for the videos that are indexed
+        """
+
+        cursor = SearchIndexService.get_connection().execute("SELECT video_id, first_rowid, last_rowid FROM video_passages WHERE video_id IN (SELECT value FROM json_each(?))", (json.dumps(video_ids),))
+        return {video_id: (first_rowid, last_rowid) for video_id, first_rowid, last_rowid in cursor}
+
+    @staticmethod
+    def build_query(text: str) -> Optional[str]:
+        """
+        Build the FTS5 query of a search, the words of the text must all match, in any of their forms
+
+        Parameters
+        ----------
+        text : str
+            Text of the search
+
+        Returns
+        -------
+        Optional[str]
+            None when the text has no word
+        """
+
+        # Quoting the words keeps the operators of the FTS5 syntax out of the user's text
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            return None
+        return " ".join(f'"{word}"' for word in words)
+
+    @staticmethod
+    def search(text: str, video_ids: list[str], limit: int, offset: int = 0) -> list[dict]:
+        """
+        Search the passages of some videos, best matches first
+
+        Parameters
+        ----------
+        text : str
+            Text of the search
+        video_ids : list[str]
+            Video ids of the YouTube videos to search
+        limit : int
+            Maximum number of hits
+        offset : int
+            Number of hits to skip
+
+        Returns
+        -------
+        list[dict]
+            Hits with the video_id, kind, start, end, snippet and score of the passage, the matches of the snippet are between **
+        """
+
+        query = SearchIndexService.build_query(text)
+        if query is None or not video_ids:
+            return []
+        # A single ranked query, FTS5 only reads the passages holding every word, then keeps the ones of the caller's videos
+        cursor = SearchIndexService.get_connection().execute(
+            """
+            SELECT video_id, kind, start, "end", snippet(passages, 0, '**', '**', '...', ?), rank
+            FROM passages
+            WHERE passages MATCH ? AND video_id IN (SELECT value FROM json_each(?))
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+            """,
+            (SearchIndexService.SNIPPET_WORDS, query, json.dumps(video_ids), limit, offset),
+        )
+        # rank is the bm25 of the passage, lower for better matches, the score is reported the other way around
+        return [{"video_id": video_id, "kind": kind, "start": start, "end": end, "snippet": snippet, "score": -score} for video_id, kind, start, end, snippet, score in cursor]
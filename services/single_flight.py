@@ -0,0 +1,64 @@
+# services/single_flight.py
+from concurrent.futures import Future
+import threading
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls that share the same key
+
+    The first caller of a key runs the function, every caller that arrives while it
+    is running waits for the same result (or exception) instead of running it again.
+    """
+
+    def __init__(self):
+        # futures of the calls that are currently running, by key
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Run fn once for all the concurrent callers of key
+
+        Parameters
+        ----------
+        key : hashable
+            Key that identifies the call
+        fn : callable
+            Function without arguments to run
+
+        Returns
+        -------
+        Any
+            Result of fn
+        """
+
+        with self._lock:
+            future = self._calls.get(key)
+            # Another caller is already running this key, wait for its result
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def _finish(self, key, future: Future, result=None, error: BaseException = None):
+        """
+        Forget the call so that the next caller runs fn again, then wake up the waiters
+        """
+
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
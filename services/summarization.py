@@ -1,22 +1,70 @@
-from schemas.summarization import SummarizationCreate, SummarizationGet
+from schemas.summarization import SummarizationCreate, SummarizationBatchCreate, SummarizationBatchItem, SummarizationGet, SummarizationJobGet, SummarizationSearchHit
 from models.youtube_video_resource import YoutubeVideoResourceModel
+from models.summarization_job import SummarizationJobModel
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, or_, and_
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+import asyncio
+import threading
+import logging
+import base64
+import json
 from fastapi import HTTPException
 from models.summarization import SummarizationModel
+from models.user import UserModel
 from services.youtube_video_resource import YoutubeVideoResourceService
 from services.google_storage import GoogleStorageService
 from services.openai import OpenAIService
-import tempfile
-from pytube import YouTube
+from services.youtube import YoutubeService, VideoUnavailableError
+from services.transcription import TranscriptionService
+from services.artifact_cache import ArtifactCacheService
+from services.vector_index import VectorIndexService
+from services.search_index import SearchIndexService
+from schemas.transcript import Transcript
+from services.job_queue import JobQueueService
+from services.single_flight import SingleFlight
+from services.job_events import JobEventService
+from services.metrics import MetricsService
+from sqlalchemy.exc import IntegrityError
+from db import SessionLocal, AsyncSessionLocal
 import os
-from moviepy.editor import *
+from dotenv import load_dotenv
+
+# load environment variables for the summarization pipeline
+load_dotenv()
+
+logger = logging.getLogger(__name__)
 
 class SummarizationService:
 
+    # Concurrent jobs for the same video share a single pipeline run
+    _pipeline_flight = SingleFlight()
+    # longest video accepted, long audio is transcribed in parallel segments
+    MAX_VIDEO_LENGTH = int(os.getenv("MAX_VIDEO_LENGTH", "14400"))
+    # maximum number of videos of a batch and number of its pipelines running at the same time
+    BATCH_MAX_VIDEOS = int(os.getenv("SUMMARIZATION_BATCH_MAX_VIDEOS", "200"))
+    BATCH_CONCURRENCY = int(os.getenv("SUMMARIZATION_BATCH_CONCURRENCY", "2"))
+    # videos summarized before the search index existed that a search schedules for indexing in the background
+    SEARCH_BACKFILL_LIMIT = int(os.getenv("SEARCH_BACKFILL_LIMIT", "10"))
+    # videos being indexed by the backfill and its single thread, created on first use
+    _backfilling = set()
+    _backfill_lock = threading.Lock()
+    _backfill_executor = None
+    # seconds a claimed job stays with its worker without a renewal of the lease, the job is queued again after
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+    # jobs running in this process
+    _running_jobs = set()
+    _running_jobs_lock = threading.Lock()
+
     @staticmethod
-    def generate_video_summarization(summarization: SummarizationCreate, user_id: int, db: Session):
+    async def enqueue_video_summarization(summarization: SummarizationCreate, user_id: int, db: AsyncSession) -> SummarizationJobModel:
         """
-        Create a summarization for a user
+        Create a summarization job for a user and schedule it on the worker pool
 
         Parameters
         ----------
@@ -24,73 +72,871 @@ class SummarizationService:
             Summarization create model
         user_id : int
             Id of the user
-        db : Session
+        db : AsyncSession
             Database session
+
+        Returns
+        -------
+        SummarizationJobModel
+            Summarization job model
         """
 
         try:
             # Parse the youtube video id from the youtube video url
             video_id = YoutubeVideoResourceService.parse_video_id(summarization.youtube_video_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-            # Verify that the video id is not already in the database
-            youtube_video_resource = YoutubeVideoResourceService.get_by_video_id(video_id, db)
-            
-            # If the video id is in the database then check if the summarization already exists for the user
+        # Verify that the video id is not already in the database
+        youtube_video_resource = (await db.execute(select(YoutubeVideoResourceModel).filter(YoutubeVideoResourceModel.youtube_video_id == video_id))).scalars().first()
+
+        # If the video id is in the database then check if the summarization already exists for the user
+        if youtube_video_resource:
+            # Query the database for the summarization
+            existing = (await db.execute(select(SummarizationModel).filter(SummarizationModel.user_id == user_id, SummarizationModel.youtube_video_resource_id == youtube_video_resource.id))).scalars().first()
+            # If the summarization already exists for the user then raise an HTTPException
+            if existing:
+                raise HTTPException(status_code=400, detail="Summarization for this video & user already exists")
+        else:
+            # Videos already found unavailable or too long are rejected without a job
+            rejection = SummarizationService.get_known_rejection(video_id)
+            if rejection is not None:
+                raise HTTPException(status_code=400, detail=rejection)
+
+        # Create the job record
+        job = SummarizationJobModel(user_id=user_id, youtube_video_url=summarization.youtube_video_url, youtube_video_id=video_id, state=SummarizationJobModel.QUEUED)
+        db.add(job)
+
+        try:
+            # A known video does not need the pipeline, the summarization can be created right away
             if youtube_video_resource:
-                # Query the database for the summarization
-                summarization = db.query(SummarizationModel).filter(SummarizationModel.user_id == user_id, SummarizationModel.youtube_video_resource_id == youtube_video_resource.id).first()
-                # If the summarization already exists for the user then raise an HTTPException
-                if summarization:
-                    raise Exception("Summarization for this video & user already exists")
+                created = SummarizationModel(user_id=user_id, youtube_video_resource_id=youtube_video_resource.id)
+                db.add(created)
+                await db.flush()
+                job.summarization_id = created.id
+                job.state = SummarizationJobModel.DONE
+                await db.execute(SummarizationService.library_version_update(user_id))
+
+            # Commit the job (and the summarization if it was created)
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request of the user stored this video between the check and the insert
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Summarization for this video & user already exists")
+        await db.refresh(job)
+
+        # Hand the pipeline to a background worker, the pipeline workers claim it from the database when this process does not run jobs
+        if job.state == SummarizationJobModel.QUEUED and JobQueueService.RUNS_JOBS:
+            JobQueueService.submit(SummarizationService.run_summarization_job, job.id)
+
+        return job
+
+    @staticmethod
+    async def enqueue_batch_summarization(batch: SummarizationBatchCreate, user_id: int, db: AsyncSession) -> tuple[list[SummarizationBatchItem], list[tuple[SummarizationBatchItem, Future]]]:
+        """
+        Create the summarizations of a batch of videos for a user
+
+        Video ids are deduplicated, known videos are resolved with a single query and their
+        summarizations are inserted in bulk, only unknown videos go through the pipeline, at most
+        BATCH_CONCURRENCY of them at the same time. Videos the user already summarized are
+        returned as done so that a playlist can be submitted again.
+
+        Parameters
+        ----------
+        batch : SummarizationBatchCreate
+            Summarization batch create model
+        user_id : int
+            Id of the user
+        db : AsyncSession
+            Database session
+
+        Returns
+        -------
+        tuple[list[SummarizationBatchItem], list[tuple[SummarizationBatchItem, Future]]]
+            Results of the videos that are already complete, and the queued results of the
+            videos scheduled on the pipeline with the future of their job, None when the job
+            is left to the pipeline workers
+        """
+
+        urls = list(batch.youtube_video_urls)
+        if batch.playlist_url:
+            try:
+                # Reading one more URL than the limit tells whether the playlist is too long
+                urls += await asyncio.to_thread(YoutubeVideoResourceService.get_playlist_video_urls, batch.playlist_url, SummarizationService.BATCH_MAX_VIDEOS + 1)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e) if isinstance(e, ValueError) else "Invalid YouTube playlist URL")
+
+        # Parse the video ids, keeping the first URL of every video
+        results = []
+        items = {}
+        for url in urls:
+            try:
+                video_id = YoutubeVideoResourceService.parse_video_id(url)
+            except ValueError as e:
+                results.append(SummarizationBatchItem(youtube_video_url=url, state=SummarizationJobModel.FAILED, error=str(e)))
+                continue
+            items.setdefault(video_id, SummarizationBatchItem(youtube_video_url=url, youtube_video_id=video_id, state=SummarizationJobModel.QUEUED))
+        if len(items) > SummarizationService.BATCH_MAX_VIDEOS:
+            raise HTTPException(status_code=400, detail=f"A batch holds at most {SummarizationService.BATCH_MAX_VIDEOS} videos")
+
+        # Resolve the known videos and the summarizations the user already has of them
+        resource_ids = dict((await db.execute(select(YoutubeVideoResourceModel.youtube_video_id, YoutubeVideoResourceModel.id).filter(YoutubeVideoResourceModel.youtube_video_id.in_(items)))).all()) if items else {}
+        summarization_ids = await SummarizationService.get_summarization_ids(user_id, list(resource_ids.values()), db)
+
+        # Bulk insert the summarizations of the known videos the user does not have yet
+        missing = [resource_id for resource_id in resource_ids.values() if resource_id not in summarization_ids]
+        if missing:
+            try:
+                await db.execute(insert(SummarizationModel), [{"user_id": user_id, "youtube_video_resource_id": resource_id} for resource_id in missing])
+            except IntegrityError:
+                # A concurrent request of the user created some of them first
+                await db.rollback()
+                raise HTTPException(status_code=409, detail="Summarizations of this batch are being created by another request")
+            await db.execute(SummarizationService.library_version_update(user_id))
+            summarization_ids.update(await SummarizationService.get_summarization_ids(user_id, missing, db))
+
+        # Create the jobs of the unknown videos
+        jobs = []
+        for video_id, item in items.items():
+            # Videos already found unavailable or too long fail without a job
+            rejection = None if video_id in resource_ids else SummarizationService.get_known_rejection(video_id)
+            if video_id in resource_ids:
+                item.state = SummarizationJobModel.DONE
+                item.summarization_id = summarization_ids[resource_ids[video_id]]
+                results.append(item)
+            elif rejection is not None:
+                item.state = SummarizationJobModel.FAILED
+                item.error = rejection
+                results.append(item)
+            else:
+                jobs.append((item, SummarizationJobModel(user_id=user_id, youtube_video_url=item.youtube_video_url, youtube_video_id=video_id, state=SummarizationJobModel.QUEUED)))
+        db.add_all([job for _, job in jobs])
+        # Commit the summarizations and the jobs
+        await db.commit()
+
+        # Hand the pipelines to the background workers
+        for item, job in jobs:
+            item.job_id = job.id
+        if not JobQueueService.RUNS_JOBS:
+            return results, [(item, None) for item, _ in jobs]
+        futures = JobQueueService.submit_bounded(SummarizationService.run_summarization_job, [job.id for _, job in jobs], SummarizationService.BATCH_CONCURRENCY)
+        return results, [(item, future) for (item, _), future in zip(jobs, futures)]
+
+    @staticmethod
+    def get_known_rejection(video_id: str) -> Optional[str]:
+        """
+        Get the reason a video would fail the pipeline, from its cached metadata
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+
+        Returns
+        -------
+        Optional[str]
+            None when the video is not cached or can be summarized
+        """
+
+        metadata = YoutubeService.get_cached_metadata(video_id)
+        if metadata is None:
+            return None
+        if metadata.error is not None:
+            return metadata.error
+        if metadata.length > SummarizationService.MAX_VIDEO_LENGTH:
+            return "Video is too long"
+        return None
+
+    @staticmethod
+    async def get_summarization_ids(user_id: int, youtube_video_resource_ids: list[int], db: AsyncSession) -> dict[int, int]:
+        """
+        Get the ids of the summarizations of a user of some videos
+
+        Parameters
+        ----------
+        user_id : int
+            Id of the user
+        youtube_video_resource_ids : list[int]
+            Ids of the youtube video resources
+        db : AsyncSession
+            Database session
+
+        Returns
+        -------
+        dict[int, int]
+            Ids of the summarizations by youtube video resource id
+        """
+
+        if not youtube_video_resource_ids:
+            return {}
+        query = select(SummarizationModel.youtube_video_resource_id, SummarizationModel.id).filter(SummarizationModel.user_id == user_id, SummarizationModel.youtube_video_resource_id.in_(youtube_video_resource_ids))
+        return dict((await db.execute(query)).all())
+
+    @staticmethod
+    def library_version_update(user_id: int):
+        """
+        Build the statement bumping the library version of a user, run in the transaction that creates or deletes summarizations of the user
+
+        Parameters
+        ----------
+        user_id : int
+            Id of the user
+
+        Returns
+        -------
+        Update
+        """
+
+        return update(UserModel).where(UserModel.id == user_id).values(library_version=UserModel.library_version + 1)
+
+    @staticmethod
+    async def get_library_version(user_id: int, db: AsyncSession) -> int:
+        """
+        Get the library version of a user, a primary key lookup cheaper than any page of the library
+
+        Parameters
+        ----------
+        user_id : int
+            Id of the user
+        db : AsyncSession
+            Database session
+
+        Returns
+        -------
+        int
+        """
+
+        return (await db.execute(select(UserModel.library_version).filter(UserModel.id == user_id))).scalar() or 0
+
+    @staticmethod
+    async def stream_batch_results(results: list[SummarizationBatchItem], scheduled: list[tuple[SummarizationBatchItem, Optional[Future]]]) -> AsyncIterator[str]:
+        """
+        Stream the results of a batch as lines of JSON
+
+        The complete results and the queued videos come first, with the id of their job so that
+        clients can follow them elsewhere, then a final line per queued video as its job finishes.
+
+        Parameters
+        ----------
+        results : list[SummarizationBatchItem]
+            Results of the videos that are already complete
+        scheduled : list[tuple[SummarizationBatchItem, Optional[Future]]]
+            Queued results of the scheduled videos with the future of their job, jobs without a future are polled in the database
+
+        Returns
+        -------
+        AsyncIterator[str]
+        """
+
+        for item in results + [item for item, _ in scheduled]:
+            yield item.json() + "\n"
+
+        # Report the jobs in the order they finish
+        pending = {asyncio.wrap_future(future) if future is not None else asyncio.ensure_future(SummarizationService.wait_for_job(item.job_id)): item for item, future in scheduled}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    async with AsyncSessionLocal() as db:
+                        job = await db.get(SummarizationJobModel, item.job_id)
+                    yield SummarizationBatchItem(youtube_video_url=item.youtube_video_url, youtube_video_id=item.youtube_video_id, state=job.state, job_id=job.id, summarization_id=job.summarization_id, error=job.error).json() + "\n"
+        finally:
+            # Stop polling the jobs of a client that went away, the jobs themselves keep running
+            for future in pending:
+                future.cancel()
+
+    @staticmethod
+    async def wait_for_job(job_id: int):
+        """
+        Wait for a job run by another process to finish, polling its state in the database
+
+        Parameters
+        ----------
+        job_id : int
+            Id of the job
+        """
+
+        while True:
+            async with AsyncSessionLocal() as db:
+                state = (await db.execute(select(SummarizationJobModel.state).filter(SummarizationJobModel.id == job_id))).scalar()
+            if state in (SummarizationJobModel.DONE, SummarizationJobModel.FAILED):
+                return
+            await asyncio.sleep(JobEventService.POLL_SECONDS)
+
+    @staticmethod
+    async def get_job(job_id: int, user_id: int, db: AsyncSession) -> SummarizationJobModel:
+        """
+        Get a summarization job of a user
+
+        Parameters
+        ----------
+        job_id : int
+            Id of the job
+        user_id : int
+            Id of the user
+        db : AsyncSession
+            Database session
+
+        Returns
+        -------
+        SummarizationJobModel
+            Summarization job model
+        """
+
+        # Query the database for the job, scoped to the user
+        job = (await db.execute(select(SummarizationJobModel).filter(SummarizationJobModel.id == job_id, SummarizationJobModel.user_id == user_id))).scalars().first()
+        # If the job is not found, raise an HTTPException
+        if job is None:
+            raise HTTPException(status_code=404, detail="Summarization job not found")
+        return job
+
+    @staticmethod
+    async def stream_job_events(job_id: int) -> AsyncIterator[str]:
+        """
+        Stream the progress of a summarization job as Server-Sent Events
+
+        A state event is sent on every stage transition and the tokens of the summary are sent
+        as token events while it is generated, then the stream ends with a done event holding
+        the job or a failed event holding the error. Tokens are only streamed by the process that
+        runs the pipeline, the other processes report the state transitions read from the database.
+
+        Parameters
+        ----------
+        job_id : int
+            Id of the job, the caller checks that it belongs to the user
+
+        Returns
+        -------
+        AsyncIterator[str]
+            Formatted events
+        """
+
+        last_state = None
+        # channel already streamed, a closed channel replays its events until it is removed
+        streamed_channel = None
+        idle = 0.0
+        while True:
+            # Read the current state of the job, the request session cannot be held for the whole stream
+            async with AsyncSessionLocal() as db:
+                job = await db.get(SummarizationJobModel, job_id)
+            # The job was deleted after the stream started, its response is already sent
+            if job is None:
+                yield JobEventService.format_event("failed", {"error": "Summarization job not found"})
+                return
+            # Jobs waiting for the pipeline of another job stay queued in the database, only report progress
+            if SummarizationService.is_progress(last_state, job.state):
+                last_state = job.state
+                idle = 0.0
+                yield JobEventService.format_event("state", {"state": job.state})
+            if job.state == SummarizationJobModel.DONE:
+                yield JobEventService.format_event("done", json.loads(SummarizationJobGet.from_orm(job).json()))
+                return
+            if job.state == SummarizationJobModel.FAILED:
+                yield JobEventService.format_event("failed", {"error": job.error})
+                return
+
+            channel = JobEventService.get_channel(job.youtube_video_id)
+            if channel is not None and channel is not streamed_channel:
+                # The pipeline of the video runs in this process, relay its events until it finishes
+                streamed_channel = channel
+                queue = channel.subscribe()
+                try:
+                    while True:
+                        try:
+                            item = await asyncio.wait_for(queue.get(), JobEventService.KEEPALIVE_SECONDS)
+                        except asyncio.TimeoutError:
+                            yield ": keepalive\n\n"
+                            continue
+                        if item is None:
+                            break
+                        event, data = item
+                        # The states of the pipeline are those of the job that runs it, the channel replays the ones already reported
+                        if event == "state":
+                            if not SummarizationService.is_progress(last_state, data["state"]):
+                                continue
+                            last_state = data["state"]
+                        yield JobEventService.format_event(event, data)
+                finally:
+                    channel.unsubscribe(queue)
+            else:
+                await asyncio.sleep(JobEventService.POLL_SECONDS)
+                idle += JobEventService.POLL_SECONDS
+                if idle >= JobEventService.KEEPALIVE_SECONDS:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
+
+    @staticmethod
+    def is_progress(last_state: Optional[str], state: str) -> bool:
+        """
+        Check if a state of a job is new to a stream that reported last_state, pending states never go back
+
+        Parameters
+        ----------
+        last_state : Optional[str]
+            Last state reported, None at the start of the stream
+        state : str
+            State read from the database or from the channel of the pipeline
+
+        Returns
+        -------
+        bool
+        """
+
+        pending = SummarizationJobModel.PENDING_STATES
+        if state == last_state:
+            return False
+        return not (last_state in pending and state in pending and pending.index(state) < pending.index(last_state))
+
+    @staticmethod
+    def run_summarization_job(job_id: int):
+        """
+        Run the summarization pipeline of a job, this is executed by a background worker
+
+        Parameters
+        ----------
+        job_id : int
+            Id of the job
+        """
+
+        # A job submitted twice to this process, e.g. by the recovery and by the request that created it, runs once
+        with SummarizationService._running_jobs_lock:
+            if job_id in SummarizationService._running_jobs:
+                return
+            SummarizationService._running_jobs.add(job_id)
+        # Workers do not share the request session, open a dedicated one
+        db = SessionLocal()
+        try:
+            # The job may have been removed, already handled or be running in a live worker
+            if not SummarizationService.claim_job(job_id, db):
+                return
+            job = db.query(SummarizationJobModel).filter(SummarizationJobModel.id == job_id).first()
+
+            # Duration of the stages run for this job in seconds, starting with the wait for a worker
+            timings = {"queued": round((datetime.utcnow() - job.created_at).total_seconds(), 3)}
+
+            def set_state(state: str):
+                # Persist every stage transition so that pollers can follow the progress
+                job.state = state
+                if state in (SummarizationJobModel.DONE, SummarizationJobModel.FAILED):
+                    job.timings = dict(timings)
+                    MetricsService.JOBS.labels(state).inc()
+                db.commit()
+
+            try:
+                with SummarizationService.hold_lease(job_id):
+                    SummarizationService.run_pipeline(job, set_state, timings, db)
+
+            except IntegrityError:
+                # Another job of the same user stored this video first
+                db.rollback()
+                # A previous run of this job, whose lease expired, may have finished it meanwhile
+                if job.state not in SummarizationJobModel.PENDING_STATES:
+                    return
+                job.error = "Summarization for this video & user already exists"
+                set_state(SummarizationJobModel.FAILED)
+
+            except Exception as e:
+                db.rollback()
+                if job.state not in SummarizationJobModel.PENDING_STATES:
+                    return
+                job.error = str(e)[:1000]
+                set_state(SummarizationJobModel.FAILED)
+        finally:
+            db.close()
+            with SummarizationService._running_jobs_lock:
+                SummarizationService._running_jobs.discard(job_id)
+
+    @staticmethod
+    def run_pipeline(job: SummarizationJobModel, set_state, timings: dict, db: Session):
+        """
+        Create the summarization of a claimed job, running the pipeline of its video unless it already ran
+
+        Parameters
+        ----------
+        job : SummarizationJobModel
+            Job to run
+        set_state : callable
+            Function persisting a state of the job
+        timings : dict
+            Duration of the stages run for the job
+        db : Session
+            Database session of the job
+        """
+
+        # Reuse the video resource if another job created it in the meantime
+        youtube_video_resource = YoutubeVideoResourceService.get_by_video_id(job.youtube_video_id, db)
+        if youtube_video_resource is None:
+            # Only one job per video runs the pipeline, the others wait for its resource
+            with MetricsService.stage("pipeline", timings):
+                youtube_video_resource_id = SummarizationService._pipeline_flight.do(job.youtube_video_id, lambda: SummarizationService.get_or_create_youtube_video_resource(job.youtube_video_id, set_state, db, timings).id)
+            # End the current read transaction so the resource committed by the leader is visible
+            db.commit()
+            youtube_video_resource = db.get(YoutubeVideoResourceModel, youtube_video_resource_id)
+        # Create a summarization
+        with MetricsService.stage("create_summarization", timings):
+            summarization = SummarizationService.create_summarization(job.user_id, youtube_video_resource.id, db)
+        job.summarization_id = summarization.id
+        set_state(SummarizationJobModel.DONE)
+
+    @staticmethod
+    def get_expired_lease_filter():
+        """
+        Get the filter of the pending jobs claimed by a worker that stopped renewing their lease
+
+        Returns
+        -------
+        ColumnElement
+            Filter on the summarization_job table
+        """
+
+        expired_before = datetime.utcnow() - timedelta(seconds=SummarizationService.JOB_LEASE_SECONDS)
+        return and_(
+            SummarizationJobModel.state.in_(SummarizationJobModel.PENDING_STATES),
+            SummarizationJobModel.claimed_by.isnot(None),
+            or_(SummarizationJobModel.heartbeat_at.is_(None), SummarizationJobModel.heartbeat_at < expired_before),
+        )
+
+    @staticmethod
+    def claim_job(job_id: int, db: Session) -> bool:
+        """
+        Take the lease of a pending job for this process
+
+        The lease is taken with a conditional update, unless the job is claimed by another worker
+        that renewed it within JOB_LEASE_SECONDS.
+
+        Parameters
+        ----------
+        job_id : int
+            Id of the job
+        db : Session
+            Database session, the claim is committed
+
+        Returns
+        -------
+        bool
+            Whether this process holds the lease of the job
+        """
+
+        worker_id = JobQueueService.get_worker_id()
+        result = db.execute(
+            update(SummarizationJobModel)
+            .where(
+                SummarizationJobModel.id == job_id,
+                SummarizationJobModel.state.in_(SummarizationJobModel.PENDING_STATES),
+                or_(SummarizationJobModel.claimed_by.is_(None), SummarizationJobModel.claimed_by == worker_id, SummarizationService.get_expired_lease_filter()),
+            )
+            .values(claimed_by=worker_id, heartbeat_at=datetime.utcnow())
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    @contextmanager
+    def hold_lease(job_id: int):
+        """
+        Renew the lease of a job claimed by this process every third of JOB_LEASE_SECONDS while the block runs
+
+        Parameters
+        ----------
+        job_id : int
+            Id of the job
+        """
+
+        stop = threading.Event()
+        worker_id = JobQueueService.get_worker_id()
+
+        def renew():
+            while not stop.wait(SummarizationService.JOB_LEASE_SECONDS / 3):
+                db = SessionLocal()
+                try:
+                    db.execute(update(SummarizationJobModel).where(SummarizationJobModel.id == job_id, SummarizationJobModel.claimed_by == worker_id).values(heartbeat_at=datetime.utcnow()))
+                    db.commit()
+                except Exception:
+                    # the database is unreachable, the lease is renewed on the next beat if it did not expire
+                    db.rollback()
+                finally:
+                    db.close()
+
+        thread = threading.Thread(target=renew, name=f"summarization-lease-{job_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+
+    @staticmethod
+    def recover_pending_jobs(submit: bool = True, workers: Optional[tuple] = None):
+        """
+        Schedule again the jobs that were interrupted by a restart of the application
+
+        Jobs left queued without a worker and jobs whose lease expired are queued again, the jobs
+        still running in a live worker are left to it.
+
+        Parameters
+        ----------
+        submit : bool
+            Whether to run the jobs in this process, otherwise they are only queued again for the pipeline workers to claim
+        workers : Optional[tuple]
+            Ids of dead workers, only their jobs are queued again, whether their lease expired or not
+        """
 
+        db = SessionLocal()
+        try:
+            if workers:
+                recoverable = and_(SummarizationJobModel.state.in_(SummarizationJobModel.PENDING_STATES), SummarizationJobModel.claimed_by.in_(workers))
             else:
-                # If the video id is not in the database then create a new youtube video resource and store it in the database
-                # Download the video, store it in a temporary directory, and transcribe it
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    # Find the video
-                    yt = YouTube("https://www.youtube.com/watch?v=" + video_id)
-                    # Get length of video
-                    length = yt.length
-                    # Get the title of the video
-                    title = yt.title
-                    
-                    # Check if video is too long (30 minutes)
-                    if length > 1800:
-                        # If video is too long, raise an exception
-                        raise Exception("Video is too long")
-
-                    # Get the audio stream of the video (mp3)
-                    audio_stream = yt.streams.filter(only_audio=True).first()
-                    # Download the audio stream and store it in the temporary directory
-                    audio_stream.download(output_path=temp_dir)
-                    # Get the path of the audio stream
-                    audio_path = os.path.join(temp_dir, audio_stream.default_filename)
-                    # Convert the audio stream to mp3
-                    audio_clip = AudioFileClip(audio_path)
-                    # Write the audio clip to a file
-                    audio_clip.write_audiofile(os.path.join(temp_dir, f"{video_id}.mp3"))
-                    # Form the temporary path of the audio clip
-                    audio_path = f"{temp_dir}/{video_id}.mp3"
-                    # Transcribe the audio
-                    transcript = OpenAIService.transcribe(audio_path)
-                    # Upload the transcription to Google Cloud Storage
-                    transcription_url = GoogleStorageService.create_and_upload_file(os.path.join(temp_dir, f"transcription-{video_id}.txt"), transcript.text, f"transcription-{video_id}.txt")
-                    # Summarize the transcription
-                    summary = OpenAIService.summarize(transcript.text)
-                    # Upload the summarization to Google Cloud Storage
-                    summarization_url = GoogleStorageService.create_and_upload_file(os.path.join(temp_dir, f"summarization-{video_id}.txt"), summary, f"summarization-{video_id}.txt")
-                    # Create a youtube video resource
-                    youtube_video_resource = YoutubeVideoResourceService.create(video_id, transcription_url, summarization_url,title, db)
-            # Create a summarization
-            summarization = SummarizationService.create_summarization(user_id, youtube_video_resource.id, db)
-            # Return the summarization
-            return SummarizationGet(id=summarization.id, title=youtube_video_resource.title, youtube_video_id=youtube_video_resource.youtube_video_id)
-
-        except Exception as e:
+                recoverable = or_(
+                    and_(SummarizationJobModel.state.in_(SummarizationJobModel.PENDING_STATES), SummarizationJobModel.claimed_by.is_(None)),
+                    SummarizationService.get_expired_lease_filter(),
+                )
+            job_ids = db.execute(select(SummarizationJobModel.id).filter(recoverable).order_by(SummarizationJobModel.id)).scalars().all()
+            recovered = []
+            for job_id in job_ids:
+                # Restart the pipeline from the beginning, unless a worker renewed the lease in the meantime
+                result = db.execute(update(SummarizationJobModel).where(SummarizationJobModel.id == job_id, recoverable).values(state=SummarizationJobModel.QUEUED, claimed_by=None, heartbeat_at=None))
+                if result.rowcount == 1:
+                    recovered.append(job_id)
+            db.commit()
+            if submit:
+                for job_id in recovered:
+                    JobQueueService.submit(SummarizationService.run_summarization_job, job_id)
+        finally:
+            db.close()
+
+    @staticmethod
+    def claim_queued_jobs(limit: int) -> list[int]:
+        """
+        Claim the oldest queued jobs and the jobs whose lease expired for this process
+
+        A job is claimed by taking its lease with a conditional update, so that a job is run by a
+        single one of the pipeline workers polling the same database.
+
+        Parameters
+        ----------
+        limit : int
+            Maximum number of jobs to claim
+
+        Returns
+        -------
+        list[int]
+            Ids of the claimed jobs
+        """
+
+        claimable = or_(
+            and_(SummarizationJobModel.state == SummarizationJobModel.QUEUED, SummarizationJobModel.claimed_by.is_(None)),
+            SummarizationService.get_expired_lease_filter(),
+        )
+        return SummarizationService.claim_jobs(claimable, limit)
+
+    @staticmethod
+    def claim_expired_jobs(limit: int) -> list[int]:
+        """
+        Claim the jobs whose lease expired for this process, the processes running the jobs they create poll for them
+
+        Parameters
+        ----------
+        limit : int
+            Maximum number of jobs to claim
+
+        Returns
+        -------
+        list[int]
+            Ids of the claimed jobs
+        """
+
+        return SummarizationService.claim_jobs(SummarizationService.get_expired_lease_filter(), limit)
+
+    @staticmethod
+    def claim_jobs(claimable, limit: int) -> list[int]:
+        """
+        Take the lease of at most limit jobs matching a filter, oldest first
+
+        Parameters
+        ----------
+        claimable : ColumnElement
+            Filter of the jobs that can be claimed
+        limit : int
+            Maximum number of jobs to claim
+
+        Returns
+        -------
+        list[int]
+            Ids of the claimed jobs
+        """
+
+        worker_id = JobQueueService.get_worker_id()
+        db = SessionLocal()
+        try:
+            job_ids = db.execute(select(SummarizationJobModel.id).filter(claimable).order_by(SummarizationJobModel.id).limit(limit)).scalars().all()
+            claimed = []
+            for job_id in job_ids:
+                result = db.execute(update(SummarizationJobModel).where(SummarizationJobModel.id == job_id, claimable).values(claimed_by=worker_id, heartbeat_at=datetime.utcnow()))
+                # Another worker claimed the job between the select and the update
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_or_create_youtube_video_resource(video_id: str, set_state, db: Session, timings: Optional[dict] = None) -> YoutubeVideoResourceModel:
+        """
+        Get the youtube video resource of a video, running the pipeline only if it does not exist yet
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        set_state : callable
+            Callback used to report the current pipeline stage
+        db : Session
+            Database session
+        timings : Optional[dict]
+            Timings of the job, the duration of every stage in seconds is added to it
+
+        Returns
+        -------
+        YoutubeVideoResourceModel
+            YouTube video resource model
+        """
+
+        # A previous flight for the same video may have finished since the last lookup
+        youtube_video_resource = YoutubeVideoResourceService.get_by_video_id(video_id, db)
+        if youtube_video_resource:
+            return youtube_video_resource
+
+        # Publish the stages and the tokens of the summary to the streams of the jobs of the video
+        channel = JobEventService.open_channel(video_id)
+
+        def report_state(state: str):
+            set_state(state)
+            channel.publish("state", {"state": state})
+
+        try:
+            return SummarizationService.create_youtube_video_resource(video_id, report_state, db, lambda token: channel.publish("token", {"text": token}), timings)
+        except IntegrityError:
+            # Another process stored the same video first, use its resource
             db.rollback()
-            if "regex_search" in str(e):
-                raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-            raise HTTPException(status_code=400, detail=str(e))
+            youtube_video_resource = YoutubeVideoResourceService.get_by_video_id(video_id, db)
+            if youtube_video_resource is None:
+                raise
+            return youtube_video_resource
+        finally:
+            JobEventService.close_channel(video_id, channel)
+
+    @staticmethod
+    def create_youtube_video_resource(video_id: str, set_state, db: Session, on_token: Optional[Callable[[str], None]] = None, timings: Optional[dict] = None) -> YoutubeVideoResourceModel:
+        """
+        Download, transcribe and summarize a video and store it as a youtube video resource
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        set_state : callable
+            Callback used to report the current pipeline stage
+        db : Session
+            Database session
+        on_token : Optional[Callable[[str], None]]
+            Called with the tokens of the summary as they are generated
+        timings : Optional[dict]
+            Timings of the job, the duration of every stage in seconds is added to it
+
+        Returns
+        -------
+        YoutubeVideoResourceModel
+            YouTube video resource model
+        """
+
+        set_state(SummarizationJobModel.DOWNLOADING)
+        with MetricsService.stage("metadata", timings):
+            # Find the video, known videos and known failures are answered from the metadata cache
+            metadata = YoutubeService.get_metadata(video_id)
+            # Get length of video
+            length = metadata.length
+            # Get the title of the video
+            title = metadata.title
+
+        # Check if video is too long
+        if length > SummarizationService.MAX_VIDEO_LENGTH:
+            # If video is too long, raise an exception
+            raise Exception("Video is too long")
+
+        # Every stage resumes from its cached artifact when a previous attempt got past it
+        transcription_params = SummarizationService.get_transcription_params()
+        transcript = SummarizationService.get_cached_transcript(video_id)
+        MetricsService.count_cache_lookup("transcribe", transcript is not None)
+        if transcript is None:
+            # Load the audio in memory
+            audio_file = YoutubeService.load_audio(video_id, timings)
+
+            set_state(SummarizationJobModel.TRANSCRIBING)
+            # Transcribe the audio
+            with MetricsService.stage("transcribe", timings):
+                transcript = TranscriptionService.transcribe(audio_file, length, video_id, timings)
+            ArtifactCacheService.put(video_id, "transcript", TranscriptionService.BACKEND, transcription_params, transcript.json())
+
+        set_state(SummarizationJobModel.SUMMARIZING)
+        # The summary depends on the transcript, so its parameters include the transcription ones
+        summary_params = {"max_tokens": OpenAIService.SUMMARY_MAX_TOKENS, "transcription": [TranscriptionService.BACKEND, transcription_params]}
+        summary = ArtifactCacheService.get(video_id, "summary", OpenAIService.SUMMARY_MODEL, summary_params)
+        MetricsService.count_cache_lookup("summarize", summary is not None)
+        if summary is None:
+            # Summarize the transcription
+            with MetricsService.stage("summarize", timings):
+                summary = OpenAIService.summarize(transcript.text, on_token)
+            ArtifactCacheService.put(video_id, "summary", OpenAIService.SUMMARY_MODEL, summary_params, summary)
+        elif on_token is not None:
+            # A cached summary is sent at once
+            on_token(summary)
+
+        # Index the transcript for the questions on the video
+        with MetricsService.stage("index", timings):
+            VectorIndexService.get_or_build(video_id, lambda: transcript)
+        # Index the transcript and the summary for the searches of the library
+        with MetricsService.stage("search_index", timings):
+            SearchIndexService.index_video(video_id, transcript, summary)
+
+        # Upload the transcription and the summarization to Google Cloud Storage at the same time
+        with MetricsService.stage("upload", timings):
+            transcription_blob, summarization_blob = GoogleStorageService.upload_contents([(transcript.text, f"transcription-{video_id}.txt"), (summary, f"summarization-{video_id}.txt")])
+
+        # Create a youtube video resource
+        with MetricsService.stage("db_commit", timings):
+            return YoutubeVideoResourceService.create(video_id, transcription_blob, summarization_blob, title, db)
+
+    @staticmethod
+    def get_transcription_params() -> dict:
+        """
+        Get the parameters of the transcription stage, part of the keys of the cached transcripts
+
+        Returns
+        -------
+        dict
+        """
+
+        return {"model": OpenAIService.TRANSCRIPTION_MODEL, "segment_seconds": TranscriptionService.SEGMENT_SECONDS}
+
+    @staticmethod
+    def get_cached_transcript(video_id: str) -> Optional[Transcript]:
+        """
+        Get the timestamped transcript of a video from the artifact cache
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+
+        Returns
+        -------
+        Optional[Transcript]
+            None when the transcript is not cached
+        """
+
+        cached_transcript = ArtifactCacheService.get(video_id, "transcript", TranscriptionService.BACKEND, SummarizationService.get_transcription_params())
+        return Transcript.parse_raw(cached_transcript) if cached_transcript is not None else None
 
     @staticmethod
     def create_summarization(user_id: int, youtube_video_resource_id: int, db: Session) -> SummarizationModel:
@@ -116,6 +962,8 @@ class SummarizationService:
         summarization = SummarizationModel(user_id=user_id, youtube_video_resource_id=youtube_video_resource_id)
         # Add the summarization to the database
         db.add(summarization)
+        # Bump the library version of the user in the same transaction
+        db.execute(SummarizationService.library_version_update(user_id))
         # Commit the changes to the database
         db.commit()
         # Refresh the summarization
@@ -124,25 +972,270 @@ class SummarizationService:
         return summarization
 
     @staticmethod
-    def get_summarizations_by_user(user_id: int, db: Session) -> list[SummarizationGet]:
+    def select_summarization_rows():
+        """
+        Build the query of the columns needed to return summarizations, joined to their video in a single query
+
+        Deleted summarizations and videos (status 0) are left out.
+
+        Returns
+        -------
+        Select
+        """
+
+        return (
+            select(
+                SummarizationModel.id,
+                SummarizationModel.created_at,
+                YoutubeVideoResourceModel.title,
+                YoutubeVideoResourceModel.youtube_video_id,
+                YoutubeVideoResourceModel.transcription_url,
+                YoutubeVideoResourceModel.summarization_url,
+            )
+            .join(YoutubeVideoResourceModel, SummarizationModel.youtube_video_resource_id == YoutubeVideoResourceModel.id)
+            .filter(SummarizationModel.status == 1, YoutubeVideoResourceModel.status == 1)
+        )
+
+    @staticmethod
+    async def get_summarizations_by_user(user_id: int, db: AsyncSession, limit: int = 20, cursor: Optional[str] = None) -> tuple[list[SummarizationGet], Optional[str]]:
         """
-        Get all summarizations for a user
+        Get a page of the summarizations of a user, newest first
+
+        Pages are read with keyset pagination on (created_at, id), so reading a page costs the
+        same wherever it is in the list.
 
         Parameters
         ----------
         user_id : int
             Id of the user
-        db : Session
+        db : AsyncSession
             Database session
+        limit : int
+            Maximum number of summarizations of the page, by default 20
+        cursor : Optional[str]
+            Cursor returned with the previous page, None for the first page
+
+        Returns
+        -------
+        tuple[list[SummarizationGet], Optional[str]]
+            Summarization get models of the page and the cursor of the next page, None on the last page
+        """
+
+        # Query the summarizations of the user with their youtube video resource
+        query = SummarizationService.select_summarization_rows().filter(SummarizationModel.user_id == user_id)
+        # Continue after the last summarization of the previous page
+        if cursor:
+            created_at, summarization_id = SummarizationService.decode_cursor(cursor)
+            query = query.filter(or_(SummarizationModel.created_at < created_at, and_(SummarizationModel.created_at == created_at, SummarizationModel.id < summarization_id)))
+        # Read one more row than the limit to know whether there is a next page
+        query = query.order_by(SummarizationModel.created_at.desc(), SummarizationModel.id.desc()).limit(limit + 1)
+        rows = (await db.execute(query)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = SummarizationService.encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        # Map the rows to summarization get models, the URLs are signed in a thread since a signature blocks on a cache miss
+        return await asyncio.to_thread(lambda: [SummarizationService.to_summarization_get(row) for row in rows]), next_cursor
+
+    @staticmethod
+    async def search_summarizations(text: str, user_id: int, db: AsyncSession, limit: int = 20, offset: int = 0) -> list[SummarizationSearchHit]:
+        """
+        Search the transcripts and summaries of the summarizations of a user
+
+        Parameters
+        ----------
+        text : str
+            Text of the search
+        user_id : int
+            Id of the user
+        db : AsyncSession
+            Database session
+        limit : int
+            Maximum number of hits, by default 20
+        offset : int
+            Number of hits to skip, by default 0
+
+        Returns
+        -------
+        list[SummarizationSearchHit]
+            Passages matching the search, best matches first
+        """
+
+        # Query the video ids of the summarizations of the user, the other columns are only read for the hits
+        query = SummarizationService.select_summarization_rows().filter(SummarizationModel.user_id == user_id)
+        video_ids = (await db.execute(query.with_only_columns(YoutubeVideoResourceModel.youtube_video_id))).scalars().all()
+        # The index is local, query it off the event loop
+        missing = await asyncio.to_thread(SearchIndexService.get_missing_video_ids, video_ids)
+        if missing:
+            # The videos summarized before the index existed are indexed in the background, the next searches find them
+            rows = (await db.execute(query.filter(YoutubeVideoResourceModel.youtube_video_id.in_(missing[:SummarizationService.SEARCH_BACKFILL_LIMIT])))).all()
+            SummarizationService.schedule_search_backfill(rows)
+        hits = await asyncio.to_thread(SearchIndexService.search, text, video_ids, limit, offset)
+        if not hits:
+            return []
+        videos = {row.youtube_video_id: row for row in (await db.execute(query.filter(YoutubeVideoResourceModel.youtube_video_id.in_({hit["video_id"] for hit in hits})))).all()}
+        return [
+            SummarizationSearchHit(
+                summarization_id=videos[hit["video_id"]].id,
+                title=videos[hit["video_id"]].title,
+                url=f"https://www.youtube.com/watch?v={hit['video_id']}" + (f"&t={int(hit['start'])}s" if hit["start"] is not None else ""),
+                youtube_video_id=hit["video_id"],
+                kind=hit["kind"],
+                start=hit["start"],
+                end=hit["end"],
+                snippet=hit["snippet"],
+                score=hit["score"],
+            )
+            for hit in hits
+        ]
+
+    @staticmethod
+    def schedule_search_backfill(rows: list):
+        """
+        Index up to SEARCH_BACKFILL_LIMIT videos in the background, skipping the ones already being indexed
+
+        Parameters
+        ----------
+        rows : list
+            Rows of select_summarization_rows of the videos to index
+        """
+
+        with SummarizationService._backfill_lock:
+            rows = [row for row in rows if row.youtube_video_id not in SummarizationService._backfilling][:SummarizationService.SEARCH_BACKFILL_LIMIT]
+            if not rows:
+                return
+            SummarizationService._backfilling.update(row.youtube_video_id for row in rows)
+            if SummarizationService._backfill_executor is None:
+                SummarizationService._backfill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-backfill")
+        for row in rows:
+            SummarizationService._backfill_executor.submit(SummarizationService.backfill_search_index, row)
+
+    @staticmethod
+    def backfill_search_index(row):
+        """
+        Index a video summarized before the index existed, from its files in the storage bucket
+
+        A video whose files cannot be downloaded is not indexed, a later search tries again.
+
+        Parameters
+        ----------
+        row : Row
+            Row of select_summarization_rows of the video
+        """
+
+        video_id = row.youtube_video_id
+        try:
+            transcript = SummarizationService.get_cached_transcript(video_id)
+            if transcript is None:
+                content = GoogleStorageService.download_content(GoogleStorageService.resolve_blob_name(row.transcription_url))
+                if content is None:
+                    return
+                transcript = Transcript(text=content.decode("utf-8"))
+            summary = GoogleStorageService.download_content(GoogleStorageService.resolve_blob_name(row.summarization_url))
+            if summary is None:
+                return
+            SearchIndexService.index_video(video_id, transcript, summary.decode("utf-8"))
+        except Exception:
+            # the storage or the index is unavailable, a later search tries again
+            logger.warning("Search index backfill of %s failed", video_id, exc_info=True)
+        finally:
+            with SummarizationService._backfill_lock:
+                SummarizationService._backfilling.discard(video_id)
+
+    @staticmethod
+    def encode_cursor(created_at: datetime, summarization_id: int) -> str:
+        """
+        Encode the position of a summarization as an opaque cursor
+
+        Parameters
+        ----------
+        created_at : datetime
+            Creation date of the summarization
+        summarization_id : int
+            Id of the summarization
+
+        Returns
+        -------
+        str
+        """
+
+        return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{summarization_id}".encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime, int]:
+        """
+        Decode a cursor created by encode_cursor
+
+        Parameters
+        ----------
+        cursor : str
+            Cursor
+
+        Returns
+        -------
+        tuple[datetime, int]
+            Creation date and id of the summarization
+        """
+
+        try:
+            created_at, summarization_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+            return datetime.fromisoformat(created_at), int(summarization_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    @staticmethod
+    async def get_summarization(summarization_id: int, user_id: int, db: AsyncSession) -> SummarizationGet:
+        """
+        Get a summarization of a user
+
+        Parameters
+        ----------
+        summarization_id : int
+            Id of the summarization
+        user_id : int
+            Id of the user
+        db : AsyncSession
+            Database session
+
+        Returns
+        -------
+        SummarizationGet
+            Summarization get model
+        """
+
+        # Query the database for the summarization, scoped to the user
+        row = (await db.execute(SummarizationService.select_summarization_rows().filter(SummarizationModel.id == summarization_id, SummarizationModel.user_id == user_id))).first()
+        # If the summarization is not found, raise an HTTPException
+        if row is None:
+            raise HTTPException(status_code=404, detail="Summarization not found")
+        # Sign the URLs in a thread, off the event loop
+        return await asyncio.to_thread(SummarizationService.to_summarization_get, row)
+
+    @staticmethod
+    def to_summarization_get(row) -> SummarizationGet:
+        """
+        Map a row of select_summarization_rows to a summarization get model, signing the URLs of its files
+
+        Signing blocks on a cache miss, async callers run it in a thread.
+
+        Parameters
+        ----------
+        row : Row
+            Row of select_summarization_rows
 
         Returns
         -------
-        list[SummarizationGet]
-            List of summarization get models
+        SummarizationGet
+            Summarization get model
         """
 
-        # Query the database for all summarizations for the user and join the youtube video resource
-        summarizations = db.query(SummarizationModel).join(YoutubeVideoResourceModel).filter(SummarizationModel.user_id == user_id).all()
-        
-        # Map the summarizations to summarization get models and return them
-        return [SummarizationGet(id=summarization.id, transcription_url=summarization.youtube_video_resource.transcription_url, summarization_url=summarization.youtube_video_resource.summarization_url, title=summarization.youtube_video_resource.title, youtube_video_id=summarization.youtube_video_resource.youtube_video_id) for summarization in summarizations]
\ No newline at end of file
+        return SummarizationGet(
+            id=row.id,
+            title=row.title,
+            youtube_video_id=row.youtube_video_id,
+            # signed URLs are cached, so only the first read of a blob pays for the signature
+            transcription_url=GoogleStorageService.get_signed_url(row.transcription_url),
+            summarization_url=GoogleStorageService.get_signed_url(row.summarization_url),
+        )
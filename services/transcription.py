@@ -0,0 +1,146 @@
+# services/transcription.py
+from concurrent.futures import ThreadPoolExecutor
+from schemas.transcript import Transcript, TranscriptSegment
+from services.audio import AudioService
+from services.openai import OpenAIService
+from services.metrics import MetricsService
+from services.admission import AdmissionService
+from dotenv import load_dotenv
+from typing import BinaryIO, Optional
+import time
+import os
+
+# load environment variables for the transcription
+load_dotenv()
+
+class StubTranscriptionClient:
+    """
+    Transcription client that answers locally, used to run the pipeline without OpenAI
+    """
+
+    # seconds taken by every request, to benchmark the stub like the API
+    SECONDS = float(os.getenv("STUB_TRANSCRIPTION_SECONDS", "0"))
+    # number of words added to the transcript, so that the stages after the transcription get realistic input
+    WORDS = int(os.getenv("STUB_TRANSCRIPTION_WORDS", "0"))
+
+    @staticmethod
+    def transcribe(audio_file: BinaryIO) -> Transcript:
+        """
+        Return a deterministic transcript describing the audio file
+
+        Parameters
+        ----------
+        audio_file : BinaryIO
+            Audio file
+
+        Returns
+        -------
+        Transcript
+        """
+
+        time.sleep(StubTranscriptionClient.SECONDS)
+        size = len(audio_file.read())
+        text = f"Transcript of {audio_file.name} ({size} bytes)."
+        if StubTranscriptionClient.WORDS:
+            text += " " + " ".join(f"word{i % 1000}" for i in range(StubTranscriptionClient.WORDS))
+        return Transcript(text=text, segments=[TranscriptSegment(start=0.0, end=0.0, text=text)])
+
+class TranscriptionService:
+    """
+    Service class for transcribing long audio in parallel segments
+    """
+
+    # transcription clients by backend name, a client is a function from an audio file to a Transcript
+    CLIENTS = {
+        "whisper": OpenAIService.transcribe,
+        "stub": StubTranscriptionClient.transcribe,
+    }
+    # backend used to transcribe the segments
+    BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "whisper")
+    # maximum duration of a segment sent in a single transcription request
+    SEGMENT_SECONDS = float(os.getenv("TRANSCRIPTION_SEGMENT_SECONDS", "600"))
+    # number of segments transcribed at the same time
+    WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+
+    @staticmethod
+    def get_client():
+        """
+        Get the transcription client of the configured backend
+
+        Returns
+        -------
+        callable
+        """
+
+        return TranscriptionService.CLIENTS[TranscriptionService.BACKEND]
+
+    @staticmethod
+    def transcribe(audio_file: BinaryIO, duration: float, video_id: str, timings: Optional[dict] = None) -> Transcript:
+        """
+        Transcribe an audio file, splitting it at silences and transcribing the segments concurrently when it is long
+
+        Parameters
+        ----------
+        audio_file : BinaryIO
+            Audio file, its name must carry the extension of the audio container
+        duration : float
+            Duration of the audio in seconds, as reported by YouTube
+        video_id : str
+            Video id of the YouTube video
+        timings : Optional[dict]
+            Timings of the job, the duration of the transcoding in seconds is added to it
+
+        Returns
+        -------
+        Transcript
+            Transcript with the timestamps relative to the beginning of the audio
+        """
+
+        client = TranscriptionService.get_client()
+
+        # Short audio is sent as it is in a single request
+        if duration <= TranscriptionService.SEGMENT_SECONDS:
+            with AdmissionService.slot("api"):
+                return client(audio_file)
+
+        # Transcode to mp3 once, mp3 frames can then be cut without re-encoding, and find the silences
+        with MetricsService.stage("transcode", timings):
+            mp3_file, measured_duration, silences = AudioService.transcode_with_silences([audio_file.read()], video_id)
+        audio = mp3_file.getvalue()
+        segments = AudioService.plan_segments(measured_duration or duration, silences, TranscriptionService.SEGMENT_SECONDS)
+
+        def transcribe_segment(index: int):
+            start, end = segments[index]
+            segment_file = AudioService.cut_segment(audio, start, end, f"{video_id}-{index}.mp3")
+            # Segments are timed one by one, the transcribe stage of the job covers them all
+            with AdmissionService.slot("api"), MetricsService.stage("transcribe_segment"):
+                return client(segment_file)
+
+        # Transcribe the segments concurrently, map keeps them in order
+        with ThreadPoolExecutor(max_workers=TranscriptionService.WORKERS) as executor:
+            transcripts = list(executor.map(transcribe_segment, range(len(segments))))
+
+        return TranscriptionService.stitch(transcripts, [start for start, _ in segments])
+
+    @staticmethod
+    def stitch(transcripts: list, offsets: list) -> Transcript:
+        """
+        Join the transcripts of consecutive segments, shifting their timestamps by the start of each segment
+
+        Parameters
+        ----------
+        transcripts : list[Transcript]
+            Transcripts of the segments, in order
+        offsets : list[float]
+            Start of each segment in seconds
+
+        Returns
+        -------
+        Transcript
+        """
+
+        segments = []
+        for transcript, offset in zip(transcripts, offsets):
+            segments.extend(TranscriptSegment(start=segment.start + offset, end=segment.end + offset, text=segment.text) for segment in transcript.segments)
+        text = " ".join(transcript.text.strip() for transcript in transcripts if transcript.text.strip())
+        return Transcript(text=text, segments=segments)
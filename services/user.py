@@ -1,10 +1,13 @@
 # services/user.py
 from schemas.user import UserCreate, UserGet, UserUpdatePassword
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from models.user import UserModel
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
+from services.jwt import JwtService
+from services.password import PasswordService
 
 class UserService:
     """
@@ -12,7 +15,7 @@ class UserService:
     """
 
     @staticmethod
-    def create_user(user: UserCreate, db: Session) -> UserGet:
+    async def create_user(user: UserCreate, db: AsyncSession) -> UserGet:
         """
         Create a new user in the database
 
@@ -20,7 +23,7 @@ class UserService:
         ----------
         user : UserCreate
             Pydantic model for creating a user
-        db : Session
+        db : AsyncSession
             Database session
 
         Returns
@@ -31,29 +34,29 @@ class UserService:
 
         try:
             # Check if the email is already registered
-            db_user = db.query(UserModel).filter(UserModel.email == user.email).first()
+            db_user = (await db.execute(select(UserModel).filter(UserModel.email == user.email))).scalars().first()
             # If the email is already registered, raise an HTTPException
             if db_user:
                 raise HTTPException(status_code=400, detail="Email already registered")
             # If the email is not registered, create a new user
             new_user = UserModel(email=user.email)
-            # password setter in the User model will hash the password
-            new_user.password = user.password 
+            # hash the password in the process pool of the PasswordService
+            new_user.password_hash = await PasswordService.hash_password(user.password)
             # Add the new user to the database session and commit the changes
             db.add(new_user)
-            db.commit()
+            await db.commit()
             # Refresh the new user to get the updated id
-            db.refresh(new_user)
+            await db.refresh(new_user)
             # Return the new user
             return new_user
         except SQLAlchemyError as e:
             # Rollback the changes if there is an error
-            db.rollback()
+            await db.rollback()
             # Raise an HTTPException with the error message
             raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
     @staticmethod
-    def update_user_password(id: int, user: UserUpdatePassword, db: Session):
+    async def update_user_password(id: int, user: UserUpdatePassword, db: AsyncSession):
         """
         Update a user's password in the database
         
@@ -63,17 +66,17 @@ class UserService:
             Id of the user
         user : UserUpdatePassword
             Pydantic model for updating a user
-        db : Session
+        db : AsyncSession
             Database session
         """
         try:
             # Get the user from the database
-            db_user = db.query(UserModel).filter(UserModel.id == id).first()
+            db_user = (await db.execute(select(UserModel).filter(UserModel.id == id))).scalars().first()
             # If the user is not found, raise an HTTPException
             if not db_user:
                 raise HTTPException(status_code=404, detail="User not found")
             # If the user is found, verify the password
-            if not db_user.verify_password(user.old_password):
+            if not await PasswordService.verify_password(user.old_password, db_user.password_hash):
                 raise HTTPException(status_code=400, detail="Invalid password")
             if user.old_password == user.new_password:
                 raise HTTPException(status_code=400, detail="New password cannot be the same as old password")
@@ -82,10 +85,14 @@ class UserService:
                 setattr(db_user, key, value)
             # If the new password is provided, hash the new password
             if user.new_password:
-                db_user.password = user.new_password
+                db_user.password_hash = await PasswordService.hash_password(user.new_password)
+                # Revoke the tokens issued with the previous password
+                db_user.password_version = (db_user.password_version or 0) + 1
             # Commit the changes
-            db.commit()
-            
+            await db.commit()
+            # Revoke the tokens issued with the previous password
+            JwtService.invalidate_user(db_user)
+
         except SQLAlchemyError as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(status_code=500, detail=f"Database error: {e}")
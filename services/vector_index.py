@@ -0,0 +1,289 @@
+# services/vector_index.py
+from services.artifact_cache import ArtifactCacheService, LocalDiskArtifactBackend
+from services.embedding import EmbeddingService
+from services.single_flight import SingleFlight
+from schemas.transcript import Transcript, TranscriptSegment
+from cachetools import LRUCache
+from dotenv import load_dotenv
+from typing import Callable, Optional
+import numpy as np
+import tempfile
+import threading
+import json
+import io
+import os
+
+# load environment variables for the vector indexes
+load_dotenv()
+
+class VectorIndex:
+    """
+    Embeddings of the chunks of a transcript, searched by cosine similarity
+    """
+
+    def __init__(self, vectors: np.ndarray, chunks: list[TranscriptSegment]):
+        # normalized float32 matrix with one row per chunk, memory-mapped from disk
+        self.vectors = vectors
+        self.chunks = chunks
+
+    def search(self, query: np.ndarray, k: int) -> list[TranscriptSegment]:
+        """
+        Get the chunks most similar to a query
+
+        Parameters
+        ----------
+        query : np.ndarray
+            Normalized embedding of the query
+        k : int
+            Maximum number of chunks to return
+
+        Returns
+        -------
+        list[TranscriptSegment]
+            Chunks, most similar first
+        """
+
+        k = min(k, len(self.chunks))
+        if k == 0:
+            return []
+        scores = self.vectors @ query
+        # partial sort, only the top k scores are ordered
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [self.chunks[i] for i in top[np.argsort(-scores[top])]]
+
+class VectorIndexService:
+    """
+    Service class for building and searching the vector index of the transcript of a video
+
+    An index is built once per video and shared by every summarization of the video. It is stored
+    in the artifact cache and kept on local disk, where it is memory-mapped so that the processes
+    of the server share its pages instead of each loading a copy.
+    """
+
+    # directory and size limit of the local copies of the indexes
+    PATH = os.getenv("VECTOR_INDEX_PATH", os.path.join(tempfile.gettempdir(), "wiser-indexes"))
+    MAX_BYTES = int(os.getenv("VECTOR_INDEX_MAX_BYTES", str(1024 * 1024 * 1024)))
+    # number of words of a chunk and number of words shared by consecutive chunks
+    CHUNK_WORDS = int(os.getenv("VECTOR_INDEX_CHUNK_WORDS", "200"))
+    CHUNK_OVERLAP_WORDS = int(os.getenv("VECTOR_INDEX_CHUNK_OVERLAP_WORDS", "40"))
+    # number of chunks retrieved for a question
+    TOP_K = int(os.getenv("VECTOR_INDEX_TOP_K", "4"))
+    # number of indexes kept open
+    CACHE_SIZE = int(os.getenv("VECTOR_INDEX_CACHE_SIZE", "128"))
+
+    # open indexes by key
+    _indexes = LRUCache(maxsize=CACHE_SIZE)
+    _lock = threading.Lock()
+    # Concurrent questions on a video without index share a single build
+    _build_flight = SingleFlight()
+    # local copies are created on first use
+    _store = None
+
+    @staticmethod
+    def get_store() -> LocalDiskArtifactBackend:
+        """
+        Get the local store of the indexes
+
+        Returns
+        -------
+        LocalDiskArtifactBackend
+        """
+
+        with VectorIndexService._lock:
+            if VectorIndexService._store is None:
+                VectorIndexService._store = LocalDiskArtifactBackend(VectorIndexService.PATH, VectorIndexService.MAX_BYTES)
+            return VectorIndexService._store
+
+    @staticmethod
+    def key(video_id: str) -> str:
+        """
+        Build the key of the index of a video, indexes built with another embedding model or chunking are not reused
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+
+        Returns
+        -------
+        str
+        """
+
+        params = {"chunk_words": VectorIndexService.CHUNK_WORDS, "chunk_overlap_words": VectorIndexService.CHUNK_OVERLAP_WORDS}
+        return ArtifactCacheService.key(video_id, "index", EmbeddingService.get_model(), params)
+
+    @staticmethod
+    def get(video_id: str) -> Optional[VectorIndex]:
+        """
+        Get the index of a video if it was built
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+
+        Returns
+        -------
+        Optional[VectorIndex]
+        """
+
+        key = VectorIndexService.key(video_id)
+        with VectorIndexService._lock:
+            index = VectorIndexService._indexes.get(key)
+        if index is None:
+            index = VectorIndexService.load(key)
+            if index is not None:
+                with VectorIndexService._lock:
+                    VectorIndexService._indexes[key] = index
+        return index
+
+    @staticmethod
+    def get_or_build(video_id: str, load_transcript: Callable[[], Transcript]) -> VectorIndex:
+        """
+        Get the index of a video, building it if it does not exist yet
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        load_transcript : Callable[[], Transcript]
+            Function returning the transcript of the video, only called when the index is built
+
+        Returns
+        -------
+        VectorIndex
+        """
+
+        index = VectorIndexService.get(video_id)
+        if index is None:
+            index = VectorIndexService._build_flight.do(VectorIndexService.key(video_id), lambda: VectorIndexService.get(video_id) or VectorIndexService.build(video_id, load_transcript()))
+        return index
+
+    @staticmethod
+    def build(video_id: str, transcript: Transcript) -> VectorIndex:
+        """
+        Embed the chunks of a transcript and store them as the index of the video
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        transcript : Transcript
+            Transcript of the video
+
+        Returns
+        -------
+        VectorIndex
+        """
+
+        key = VectorIndexService.key(video_id)
+        chunks = VectorIndexService.split_chunks(transcript)
+        vectors = EmbeddingService.embed([chunk.text for chunk in chunks]) if chunks else np.zeros((0, 1), dtype=np.float32)
+
+        buffer = io.BytesIO()
+        np.save(buffer, vectors)
+        contents = {key + ".json": json.dumps([chunk.dict() for chunk in chunks]).encode("utf-8"), key + ".npy": buffer.getvalue()}
+        for name, content in contents.items():
+            # Share the index with the other instances and keep a local copy to map
+            ArtifactCacheService.put_bytes(name, content)
+            VectorIndexService.get_store().put(name, content)
+
+        index = VectorIndexService.load(key)
+        with VectorIndexService._lock:
+            VectorIndexService._indexes[key] = index
+        return index
+
+    @staticmethod
+    def load(key: str) -> Optional[VectorIndex]:
+        """
+        Open an index, copying it from the artifact cache to local disk if needed
+
+        Parameters
+        ----------
+        key : str
+            Key of the index
+
+        Returns
+        -------
+        Optional[VectorIndex]
+            None when the index was not built
+        """
+
+        store = VectorIndexService.get_store()
+        chunks_path, vectors_path = os.path.join(store.path, key + ".json"), os.path.join(store.path, key + ".npy")
+        if not (os.path.exists(chunks_path) and os.path.exists(vectors_path)):
+            contents = {name: ArtifactCacheService.get_bytes(name) for name in (key + ".json", key + ".npy")}
+            if None in contents.values():
+                return None
+            for name, content in contents.items():
+                store.put(name, content)
+
+        try:
+            with open(chunks_path, "rb") as f:
+                chunks = [TranscriptSegment(**chunk) for chunk in json.loads(f.read())]
+            # an empty array cannot be mapped
+            vectors = np.load(vectors_path, mmap_mode="r" if chunks else None)
+        except FileNotFoundError:
+            # Evicted in the meantime, the next call copies it again
+            return None
+        return VectorIndex(vectors, chunks)
+
+    @staticmethod
+    def search(video_id: str, question: str, load_transcript: Callable[[], Transcript], k: Optional[int] = None) -> list[TranscriptSegment]:
+        """
+        Get the chunks of the transcript of a video most relevant to a question
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        question : str
+            Question of the user
+        load_transcript : Callable[[], Transcript]
+            Function returning the transcript of the video, only called when the index is built
+        k : Optional[int]
+            Maximum number of chunks to return, TOP_K by default
+
+        Returns
+        -------
+        list[TranscriptSegment]
+            Chunks, most relevant first
+        """
+
+        index = VectorIndexService.get_or_build(video_id, load_transcript)
+        return index.search(EmbeddingService.embed([question])[0], k or VectorIndexService.TOP_K)
+
+    @staticmethod
+    def split_chunks(transcript: Transcript) -> list[TranscriptSegment]:
+        """
+        Split a transcript in overlapping chunks of CHUNK_WORDS words, timed by the segments they come from
+
+        Parameters
+        ----------
+        transcript : Transcript
+            Transcript to split, a transcript without segments is split as a single untimed segment
+
+        Returns
+        -------
+        list[TranscriptSegment]
+        """
+
+        size, overlap = VectorIndexService.CHUNK_WORDS, min(VectorIndexService.CHUNK_OVERLAP_WORDS, VectorIndexService.CHUNK_WORDS - 1)
+        segments = transcript.segments or [TranscriptSegment(start=0.0, end=0.0, text=transcript.text)]
+
+        def to_chunk(words: list) -> TranscriptSegment:
+            return TranscriptSegment(start=words[0][1], end=words[-1][2], text=" ".join(word for word, _, _ in words))
+
+        chunks = []
+        # words of the current chunk with the times of their segment
+        words = []
+        for segment in segments:
+            for word in segment.text.split():
+                words.append((word, segment.start, segment.end))
+                if len(words) == size:
+                    chunks.append(to_chunk(words))
+                    words = words[size - overlap:]
+        # the remaining words, unless they are all part of the last chunk already
+        if words and (not chunks or len(words) > overlap):
+            chunks.append(to_chunk(words))
+        return chunks
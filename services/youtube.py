@@ -0,0 +1,310 @@
+# services/youtube.py
+from services.audio import AudioService
+from services.metrics import MetricsService
+from services.resilience import ResilienceService
+from schemas.video_metadata import AudioStreamInfo, VideoMetadata
+from cachetools import TLRUCache
+from urllib.parse import urlparse, parse_qs
+from dotenv import load_dotenv
+from itertools import islice
+from typing import Optional
+from io import BytesIO
+import threading
+import time
+import os
+
+# load environment variables for YouTube
+load_dotenv()
+
+class VideoUnavailableError(Exception):
+    """
+    Raised for a video that cannot be summarized whatever the number of attempts: an invalid id,
+    a private, removed, members only, age restricted or live video
+    """
+
+class PytubeClient:
+    """
+    YouTube client backed by pytube
+    """
+
+    @staticmethod
+    def get_metadata(video_id: str) -> VideoMetadata:
+        """
+        Get the title, the length and the audio streams of a video
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+
+        Returns
+        -------
+        VideoMetadata
+
+        Raises
+        ------
+        VideoUnavailableError
+            When YouTube answered that the video cannot be read
+        """
+
+        # imported here so that the processes that do not run the pipeline do not load pytube
+        from pytube import YouTube, extract
+        from pytube import exceptions as pytube_errors
+
+        url = "https://www.youtube.com/watch?v=" + video_id
+        try:
+            extract.video_id(url)
+        except pytube_errors.RegexMatchError:
+            raise VideoUnavailableError("Invalid YouTube URL")
+
+        def fetch() -> VideoMetadata:
+            video = YouTube(url)
+            # pytube requests the metadata when it is first read, read it here so that the request is retried
+            audio_streams = [
+                AudioStreamInfo(itag=stream.itag, subtype=stream.subtype, abr=int("".join(filter(str.isdigit, stream.abr or "")) or 0), url=stream.url)
+                for stream in video.streams.filter(only_audio=True)
+            ]
+            return VideoMetadata(video_id=video_id, title=video.title, length=video.length, audio_streams=audio_streams)
+
+        try:
+            return ResilienceService.call("youtube", fetch)
+        # Errors of the video itself, as opposed to the failures of the requests and of the parsing of the pages, are known from the exception type
+        except pytube_errors.VideoPrivate:
+            raise VideoUnavailableError("Video is private")
+        except pytube_errors.MembersOnly:
+            raise VideoUnavailableError("Video is for members only")
+        except pytube_errors.AgeRestrictedError:
+            raise VideoUnavailableError("Video is age restricted")
+        except pytube_errors.LiveStreamError:
+            raise VideoUnavailableError("Video is a live stream")
+        except pytube_errors.VideoUnavailable:
+            raise VideoUnavailableError("Video is unavailable")
+
+    @staticmethod
+    def load_audio(metadata: VideoMetadata, video_id: str, timings: Optional[dict] = None) -> BytesIO:
+        """
+        Download the audio of a video in memory
+
+        Parameters
+        ----------
+        metadata : VideoMetadata
+            Metadata of the video with fresh stream URLs, see YoutubeService.get_metadata
+        video_id : str
+            Video id of the YouTube video
+        timings : Optional[dict]
+            Timings of the job, the duration of the download in seconds is added to it
+
+        Returns
+        -------
+        BytesIO
+            Audio file, its name carries the extension of the container
+        """
+
+        # Select the audio stream among the streams of the metadata
+        audio_stream = AudioService.select_audio_stream(metadata.audio_streams)
+        # Load the audio in memory, transcoding it only if its container is not supported, the transcoding runs while the stream downloads
+        with MetricsService.stage("download" if audio_stream.subtype in AudioService.SUPPORTED_SUBTYPES else "download_transcode", timings):
+            # A dropped download starts over, the metadata is not requested again
+            return ResilienceService.call("youtube", AudioService.load_audio, audio_stream, video_id)
+
+    @staticmethod
+    def get_playlist_video_urls(playlist_id: str, limit: int) -> list[str]:
+        """
+        Get the URLs of the videos of a playlist, fetched page by page as they are read
+        """
+
+        from pytube import Playlist
+
+        return ResilienceService.call("youtube", lambda: list(islice(Playlist("https://www.youtube.com/playlist?list=" + playlist_id).video_urls, limit)))
+
+class FakeYoutubeClient:
+    """
+    YouTube client that answers locally, used to run and benchmark the pipeline offline
+    """
+
+    # seconds taken to get the metadata and to download the audio of a video
+    METADATA_SECONDS = float(os.getenv("FAKE_YOUTUBE_METADATA_SECONDS", "0"))
+    DOWNLOAD_SECONDS = float(os.getenv("FAKE_YOUTUBE_DOWNLOAD_SECONDS", "0"))
+    # length in seconds of every video and number of videos of every playlist
+    VIDEO_LENGTH = int(os.getenv("FAKE_YOUTUBE_VIDEO_LENGTH", "300"))
+    PLAYLIST_LENGTH = int(os.getenv("FAKE_YOUTUBE_PLAYLIST_LENGTH", "10"))
+
+    @staticmethod
+    def get_metadata(video_id: str) -> VideoMetadata:
+        """
+        Get a video of VIDEO_LENGTH seconds, the ids starting with "unavailable" are unavailable videos
+        """
+
+        time.sleep(FakeYoutubeClient.METADATA_SECONDS)
+        if video_id.startswith("unavailable"):
+            raise VideoUnavailableError("Video is unavailable")
+        return VideoMetadata(video_id=video_id, title=f"Video {video_id}", length=FakeYoutubeClient.VIDEO_LENGTH, audio_streams=[AudioStreamInfo(itag=140, subtype="mp4", abr=128, url=f"fake://{video_id}")])
+
+    @staticmethod
+    def load_audio(metadata: VideoMetadata, video_id: str, timings: Optional[dict] = None) -> BytesIO:
+        """
+        Get a silent mp3 file, one byte per second of the video
+        """
+
+        with MetricsService.stage("download", timings):
+            time.sleep(FakeYoutubeClient.DOWNLOAD_SECONDS)
+            audio_file = BytesIO(b"\0" * metadata.length)
+            audio_file.name = f"{video_id}.mp3"
+            return audio_file
+
+    @staticmethod
+    def get_playlist_video_urls(playlist_id: str, limit: int) -> list[str]:
+        """
+        Get the URLs of PLAYLIST_LENGTH videos derived from the playlist id
+        """
+
+        return [f"https://www.youtube.com/watch?v={playlist_id}-{index}" for index in range(min(FakeYoutubeClient.PLAYLIST_LENGTH, limit))]
+
+class YoutubeService:
+    """
+    Service class for reading videos and playlists with the configured backend
+    """
+
+    # YouTube clients by backend name, a client has the get_metadata, load_audio and get_playlist_video_urls methods
+    CLIENTS = {
+        "pytube": PytubeClient,
+        "fake": FakeYoutubeClient,
+    }
+    # backend used to read YouTube
+    BACKEND = os.getenv("YOUTUBE_BACKEND", "pytube")
+
+    @staticmethod
+    def get_client():
+        """
+        Get the YouTube client of the configured backend
+
+        Returns
+        -------
+        PytubeClient or FakeYoutubeClient
+        """
+
+        return YoutubeService.CLIENTS[YoutubeService.BACKEND]
+
+    # seconds the metadata of a video is kept, titles and lengths do not change
+    METADATA_TTL_SECONDS = float(os.getenv("YOUTUBE_METADATA_TTL_SECONDS", "21600"))
+    # seconds a video that cannot be read is rejected without asking YouTube again, it may be made public later
+    FAILURE_TTL_SECONDS = float(os.getenv("YOUTUBE_METADATA_FAILURE_TTL_SECONDS", "3600"))
+    # seconds before the expiry of the stream URLs at which they are fetched again, a download must end before they expire
+    STREAM_URL_MARGIN_SECONDS = float(os.getenv("YOUTUBE_STREAM_URL_MARGIN_SECONDS", "1800"))
+    # lifetime of the stream URLs that do not tell their expiry
+    STREAM_URL_TTL_SECONDS = float(os.getenv("YOUTUBE_STREAM_URL_TTL_SECONDS", "3600"))
+
+    # metadata and failures by video id, each entry expires after its own TTL
+    _metadata = TLRUCache(
+        maxsize=int(os.getenv("YOUTUBE_METADATA_CACHE_SIZE", "10000")),
+        ttu=lambda video_id, metadata, now: now + (YoutubeService.FAILURE_TTL_SECONDS if metadata.error else YoutubeService.METADATA_TTL_SECONDS),
+        timer=time.time,
+    )
+    _metadata_lock = threading.Lock()
+
+    @staticmethod
+    def get_streams_expiry(audio_streams: list[AudioStreamInfo], now: float) -> float:
+        """
+        Get the time at which the stream URLs must be fetched again, from the expire parameter signed in them
+
+        Parameters
+        ----------
+        audio_streams : list[AudioStreamInfo]
+            Audio streams of a video
+        now : float
+            Time at which the URLs were fetched
+
+        Returns
+        -------
+        float
+        """
+
+        expiries = [float(parse_qs(urlparse(stream.url).query).get("expire", [now + YoutubeService.STREAM_URL_TTL_SECONDS])[0]) for stream in audio_streams]
+        return min(expiries, default=now + YoutubeService.STREAM_URL_TTL_SECONDS) - YoutubeService.STREAM_URL_MARGIN_SECONDS
+
+    @staticmethod
+    def get_cached_metadata(video_id: str) -> Optional[VideoMetadata]:
+        """
+        Get the cached metadata of a video without asking YouTube
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+
+        Returns
+        -------
+        Optional[VideoMetadata]
+            None when the video is not cached, the metadata has its error set for a video that cannot be read
+        """
+
+        with YoutubeService._metadata_lock:
+            return YoutubeService._metadata.get(video_id)
+
+    @staticmethod
+    def get_metadata(video_id: str, with_streams: bool = False) -> VideoMetadata:
+        """
+        Get the metadata of a video, from the cache while it is fresh
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        with_streams : bool
+            Whether the stream URLs are about to be downloaded, expired URLs are then fetched again
+
+        Returns
+        -------
+        VideoMetadata
+
+        Raises
+        ------
+        VideoUnavailableError
+            When the video cannot be read, cached for FAILURE_TTL_SECONDS
+        """
+
+        metadata = YoutubeService.get_cached_metadata(video_id)
+        if metadata is not None and with_streams and metadata.error is None and time.time() >= metadata.streams_expire_at:
+            metadata = None
+        MetricsService.count_cache_lookup("metadata", metadata is not None)
+
+        if metadata is None:
+            now = time.time()
+            try:
+                metadata = YoutubeService.get_client().get_metadata(video_id)
+                metadata.streams_expire_at = YoutubeService.get_streams_expiry(metadata.audio_streams, now)
+            except VideoUnavailableError as e:
+                # Remember the reason, the next submissions of the video are rejected without a request
+                metadata = VideoMetadata(video_id=video_id, error=str(e))
+            with YoutubeService._metadata_lock:
+                YoutubeService._metadata[video_id] = metadata
+
+        if metadata.error is not None:
+            raise VideoUnavailableError(metadata.error)
+        return metadata
+
+    @staticmethod
+    def load_audio(video_id: str, timings: Optional[dict] = None) -> BytesIO:
+        """
+        Download the audio of a video in memory with the streams of its cached metadata
+
+        Parameters
+        ----------
+        video_id : str
+            Video id of the YouTube video
+        timings : Optional[dict]
+            Timings of the job, the duration of the download in seconds is added to it
+
+        Returns
+        -------
+        BytesIO
+        """
+
+        metadata = YoutubeService.get_metadata(video_id, with_streams=True)
+        try:
+            return YoutubeService.get_client().load_audio(metadata, video_id, timings)
+        except Exception:
+            # The stream URLs may have been revoked, the next attempt fetches them again
+            with YoutubeService._metadata_lock:
+                YoutubeService._metadata.pop(video_id, None)
+            raise
@@ -1,6 +1,7 @@
 from urllib.parse import urlparse, parse_qs
 from models.youtube_video_resource import YoutubeVideoResourceModel
 from sqlalchemy.orm.session import Session
+from services.youtube import YoutubeService
 
 class YoutubeVideoResourceService:
 
@@ -46,6 +47,34 @@ class YoutubeVideoResourceService:
         # Return the video id
         return video_id
 
+    @staticmethod
+    def get_playlist_video_urls(playlist_url: str, limit: int) -> list[str]:
+        """
+        Get the URLs of the videos of a YouTube playlist, this requests YouTube
+
+        Parameters
+        ----------
+        playlist_url : str
+            YouTube playlist URL, or a video URL with a list query parameter
+        limit : int
+            Maximum number of URLs to return, the playlist is only paged through up to it
+
+        Returns
+        -------
+        list[str]
+            YouTube video URLs
+        """
+        # Parse the URL
+        url = urlparse(playlist_url)
+        # Get the playlist id from the list query parameter
+        playlist_id = parse_qs(url.query).get("list", [None])[0]
+        # If the URL is not a YouTube URL or has no playlist id, raise a ValueError
+        if url.netloc not in {"www.youtube.com", "youtu.be"} or not playlist_id:
+            raise ValueError("Invalid YouTube playlist URL")
+
+        # Get the video URLs from the configured backend
+        return YoutubeService.get_client().get_playlist_video_urls(playlist_id, limit)
+
     @staticmethod
     def get_by_video_id(video_id: str, db: Session) -> YoutubeVideoResourceModel:
         """
@@ -79,9 +108,9 @@ class YoutubeVideoResourceService:
         video_id : str
             Video id of the YouTube video
         transcription_url : str
-            Transcription URL of the YouTube video
+            Blob name of the transcription of the YouTube video
         summarization_url : str
-            Summarization URL of the YouTube video
+            Blob name of the summarization of the YouTube video
         db : Session
             Database session
 
@@ -0,0 +1,83 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORY = tempfile.mkdtemp(prefix="wiser-tests-")
+
+# The app reads its settings when it is imported, point it at the offline backends first
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(DIRECTORY, 'tests.db')}",
+    "APP_PROFILE": "full",
+    "YOUTUBE_BACKEND": "fake",
+    "TRANSCRIPTION_BACKEND": "stub",
+    "LLM_BACKEND": "fake",
+    "EMBEDDING_BACKEND": "hashing",
+    "STORAGE_BACKEND": "local",
+    "LOCAL_STORAGE_PATH": os.path.join(DIRECTORY, "storage"),
+    "ARTIFACT_CACHE_BACKENDS": "local",
+    "ARTIFACT_CACHE_PATH": os.path.join(DIRECTORY, "artifacts"),
+    "VECTOR_INDEX_PATH": os.path.join(DIRECTORY, "indexes"),
+    "SEARCH_INDEX_PATH": os.path.join(DIRECTORY, "search.sqlite3"),
+    "STUB_TRANSCRIPTION_WORDS": "50",
+    "SECRET_KEY": "tests",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    # Hashing passwords at the production cost would dominate the tests
+    "BCRYPT_ROUNDS": "4",
+    "JOB_QUEUE_POLL_SECONDS": "0.1",
+    "JOB_EVENTS_POLL_SECONDS": "0.05",
+})
+# The tests send their requests back to back
+for name in ("SUMMARIZATION", "BATCH", "CHAT"):
+    os.environ[f"RATE_LIMIT_{name}_PER_MINUTE"] = "0"
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """
+    Create the schema of the test database with the migrations
+    """
+
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+    command.upgrade(config, "head")
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def client():
+    """
+    Client of the app of the full profile, started and stopped around the test
+    """
+
+    import httpx
+    from main import app
+
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://tests", timeout=30) as client:
+            yield client
+    finally:
+        await app.router.shutdown()
+
+@pytest.fixture
+def signup(client):
+    """
+    Create a user and sign in, returns the headers of its requests
+    """
+
+    async def signup(email: str, password: str = "password1") -> dict:
+        await client.post("/user/", json={"email": email, "password": password, "password_confirmation": password})
+        response = await client.post("/auth/token", data={"username": email, "password": password})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return signup
@@ -0,0 +1,22 @@
+# tests/test_audio.py
+import pytest
+
+# Copy the input to the output as it is, ffmpeg succeeds on any input
+COPY = ["-f", "data", "-i", "pipe:0", "-map", "0", "-c", "copy", "-f", "data", "pipe:1"]
+
+def test_ffmpeg_reads_every_chunk():
+    from services.audio import AudioService
+
+    output, _ = AudioService._run_ffmpeg(COPY, [b"first ", b"second"])
+
+    assert output == b"first second"
+
+def test_failure_of_the_source_fails_ffmpeg_on_a_truncated_input():
+    from services.audio import AudioService
+
+    def download():
+        yield b"first part"
+        raise ConnectionResetError("connection reset by peer")
+
+    with pytest.raises(ConnectionResetError):
+        AudioService._run_ffmpeg(COPY, download())
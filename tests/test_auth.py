@@ -0,0 +1,88 @@
+# tests/test_auth.py
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def rounds():
+    """
+    Restore the cost of the password hashes after the test
+    """
+
+    from services.password import PasswordService
+
+    previous = PasswordService.ROUNDS
+    yield
+    PasswordService.ROUNDS = previous
+
+async def sign_in(client, email: str, password: str) -> dict:
+    response = await client.post("/auth/token", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def get_password_hash(email: str) -> str:
+    from sqlalchemy import select
+    from db import AsyncSessionLocal
+    from models.user import UserModel
+
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(UserModel).filter(UserModel.email == email))).scalars().first().password_hash
+
+async def test_rehash_at_login_keeps_the_tokens_valid(client, signup, rounds):
+    from services.password import PasswordService
+
+    email = "rehash@example.com"
+    before = await signup(email)
+    old_hash = await get_password_hash(email)
+
+    # The configured cost changed since the password was hashed
+    PasswordService.ROUNDS += 1
+    after = await sign_in(client, email, "password1")
+
+    assert await get_password_hash(email) != old_hash
+    assert not PasswordService.needs_rehash(await get_password_hash(email))
+    # The token of the login that rehashed and the tokens issued before both still work
+    assert (await client.get("/auth/me", headers=after)).status_code == 200
+    assert (await client.get("/auth/me", headers=before)).status_code == 200
+
+async def test_password_change_revokes_the_tokens(client, signup):
+    email = "change@example.com"
+    before = await signup(email)
+
+    response = await client.patch("/user/password", json={"old_password": "password1", "new_password": "password2", "new_password_confirmation": "password2"}, headers=before)
+    assert response.status_code == 200, response.text
+
+    assert (await client.get("/auth/me", headers=before)).status_code == 401
+    after = await sign_in(client, email, "password2")
+    assert (await client.get("/auth/me", headers=after)).status_code == 200
+
+@pytest.mark.parametrize("mode", ["database", "cached"])
+async def test_password_change_revokes_the_tokens_in_every_mode(client, signup, mode, monkeypatch):
+    from services.jwt import JwtService
+
+    monkeypatch.setattr(JwtService, "AUTH_MODE", mode)
+    email = f"{mode}mode@example.com"
+    before = await signup(email)
+    assert (await client.get("/auth/me", headers=before)).status_code == 200
+
+    await client.patch("/user/password", json={"old_password": "password1", "new_password": "password2", "new_password_confirmation": "password2"}, headers=before)
+
+    assert (await client.get("/auth/me", headers=before)).status_code == 401
+
+async def test_wrong_password_is_rejected(client, signup):
+    await signup("wrong@example.com")
+    response = await client.post("/auth/token", data={"username": "wrong@example.com", "password": "password2"})
+
+    assert response.status_code == 404
+
+async def test_token_without_a_version_is_checked_against_the_database(client, signup):
+    import jwt
+    from datetime import datetime, timedelta
+    from services.jwt import JwtService
+
+    email = "unversioned@example.com"
+    me = (await client.get("/auth/me", headers=await signup(email))).json()
+    # Tokens issued before the token versions have no ver claim
+    token = jwt.encode({"id": me["id"], "email": email, "exp": datetime.utcnow() + timedelta(minutes=5)}, JwtService.SECRET_KEY, algorithm=JwtService.ALGORITHM)
+
+    assert (await client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})).status_code == 200
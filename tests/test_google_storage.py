@@ -0,0 +1,47 @@
+# tests/test_google_storage.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from cachetools import TTLCache
+
+class CountingBackend:
+    """
+    Backend that counts the URLs it signs
+    """
+
+    def __init__(self):
+        self.signed = []
+
+    def sign(self, blob_name, expiration):
+        self.signed.append(blob_name)
+        return f"https://storage.googleapis.com/bucket/{blob_name}?X-Goog-Signature={len(self.signed)}"
+
+@pytest.fixture
+def backend(monkeypatch):
+    from services.google_storage import GoogleStorageService
+
+    backend = CountingBackend()
+    monkeypatch.setattr(GoogleStorageService, "_backend", backend)
+    monkeypatch.setattr(GoogleStorageService, "_signed_urls", TTLCache(maxsize=8, ttl=3600))
+    return backend
+
+def test_signed_urls_are_reused(backend):
+    from services.google_storage import GoogleStorageService
+
+    url = GoogleStorageService.get_signed_url("video-transcript.txt")
+
+    assert GoogleStorageService.get_signed_url("video-transcript.txt") == url
+    # Rows of older versions store the URL signed at upload time, it resolves to the same blob
+    assert GoogleStorageService.get_signed_url("https://storage.googleapis.com/bucket/video-transcript.txt?X-Goog-Signature=old") == url
+    assert backend.signed == ["video-transcript.txt"]
+
+def test_signed_urls_are_cached_from_concurrent_threads(backend):
+    from services.google_storage import GoogleStorageService
+
+    # More blobs than the cache holds, the threads evict each other's entries
+    blob_names = [f"blob-{i % 32}.txt" for i in range(2000)]
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        urls = list(executor.map(GoogleStorageService.get_signed_url, blob_names))
+
+    assert [GoogleStorageService.resolve_blob_name(url) for url in urls] == blob_names
+    assert len(GoogleStorageService._signed_urls) <= 8
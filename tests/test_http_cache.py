@@ -0,0 +1,63 @@
+# tests/test_http_cache.py
+import pytest
+
+from tests.test_summarization_jobs import run_job
+
+pytestmark = pytest.mark.anyio
+
+async def test_library_page_is_not_modified_until_the_library_changes(client, signup):
+    headers = await signup("etag@example.com")
+    await run_job(client, headers, "etagvideo01")
+
+    first = await client.get("/summarization/", headers=headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = await client.get("/summarization/", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    # A new summarization bumps the version of the library
+    await run_job(client, headers, "etagvideo02")
+    changed = await client.get("/summarization/", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) == 2
+
+async def test_pages_and_users_have_their_own_etags(client, signup):
+    headers = await signup("etagpages@example.com")
+    other = await signup("etagother@example.com")
+
+    page = await client.get("/summarization/", params={"limit": 20}, headers=headers)
+    smaller = await client.get("/summarization/", params={"limit": 10}, headers=headers)
+    of_other = await client.get("/summarization/", params={"limit": 20}, headers=other)
+
+    assert len({page.headers["ETag"], smaller.headers["ETag"], of_other.headers["ETag"]}) == 3
+    # The validator of a user does not answer the requests of another
+    assert (await client.get("/summarization/", params={"limit": 20}, headers={**other, "If-None-Match": page.headers["ETag"]})).status_code == 200
+
+async def test_current_user_is_not_modified_for_the_same_credentials(client, signup):
+    headers = await signup("etagme@example.com")
+
+    first = await client.get("/auth/me", headers=headers)
+    assert first.status_code == 200
+    assert (await client.get("/auth/me", headers={**headers, "If-None-Match": first.headers["ETag"]})).status_code == 304
+    assert (await client.get("/auth/me", headers={**headers, "If-None-Match": "*"})).status_code == 304
+    assert (await client.get("/auth/me", headers={**headers, "If-None-Match": 'W/"stale"'})).status_code == 200
+
+def test_weak_comparison_of_the_validators():
+    from starlette.requests import Request
+    from services.http_cache import HttpCacheService
+
+    etag = HttpCacheService.make_etag(1, 2, "page")
+
+    def request(value: str) -> Request:
+        return Request({"type": "http", "headers": [(b"if-none-match", value.encode())]})
+
+    assert HttpCacheService.is_not_modified(request(etag.removeprefix("W/")), etag)
+    assert HttpCacheService.is_not_modified(request(f'W/"other", {etag}'), etag)
+    assert not HttpCacheService.is_not_modified(request('W/"other"'), etag)
+    assert not HttpCacheService.is_not_modified(Request({"type": "http", "headers": []}), etag)
@@ -0,0 +1,82 @@
+# tests/test_migrations.py
+import os
+import sqlite3
+
+import pytest
+
+from tests.conftest import ROOT
+
+@pytest.fixture
+def migrate(tmp_path):
+    """
+    Run alembic commands against a database of its own, returns the path of the database
+    """
+
+    from alembic import command
+    from alembic.config import Config
+
+    path = str(tmp_path / "migrations.db")
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{path}")
+
+    def migrate(name: str, *args):
+        getattr(command, name)(config, *args)
+
+    migrate.path = path
+    return migrate
+
+def get_tables(path: str) -> set:
+    with sqlite3.connect(path) as connection:
+        return {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def create_earlier_database(migrate):
+    """
+    Database of an API without migrations, the tables of revision 0001 without the alembic version
+    """
+
+    migrate("upgrade", "0001")
+    with sqlite3.connect(migrate.path) as connection:
+        connection.execute("DROP TABLE alembic_version")
+        connection.execute("INSERT INTO user (email, password, status) VALUES ('earlier@example.com', 'hash', 1)")
+        connection.execute("INSERT INTO youtube_video_resource (title, youtube_video_id, transcription_url, summarization_url, status) VALUES ('title', 'earliervid1', 'transcript', 'summary', 1)")
+        # A race of the earlier API stored the video twice for the user
+        connection.executemany("INSERT INTO summarization (user_id, youtube_video_resource_id, status) VALUES (1, 1, 1)", [(), ()])
+        connection.execute("INSERT INTO chat_entry (summarization_id, input_text, output_text, status) VALUES (2, 'question', 'answer', 1)")
+
+def test_earlier_database_is_stamped_then_upgraded(migrate):
+    create_earlier_database(migrate)
+    assert "summarization_job" not in get_tables(migrate.path)
+
+    migrate("stamp", "0001")
+    migrate("upgrade", "head")
+
+    assert "summarization_job" in get_tables(migrate.path)
+    with sqlite3.connect(migrate.path) as connection:
+        # The duplicate is removed and its chat entry moved to the kept summarization
+        assert connection.execute("SELECT id FROM summarization").fetchall() == [(1,)]
+        assert connection.execute("SELECT summarization_id FROM chat_entry").fetchall() == [(1,)]
+
+def test_earlier_database_with_jobs_is_stamped_then_upgraded(migrate):
+    create_earlier_database(migrate)
+    # create_all of an API with jobs but without migrations
+    migrate("stamp", "0001")
+    migrate("upgrade", "0002")
+    with sqlite3.connect(migrate.path) as connection:
+        connection.execute("DROP TABLE alembic_version")
+
+    migrate("stamp", "0001")
+    migrate("upgrade", "head")
+
+    with sqlite3.connect(migrate.path) as connection:
+        assert connection.execute("SELECT name FROM sqlite_master WHERE name = 'ix_summarization_job_user_id'").fetchone()
+
+def test_migrations_round_trip(migrate):
+    migrate("upgrade", "head")
+    tables = get_tables(migrate.path)
+
+    migrate("downgrade", "base")
+    assert get_tables(migrate.path) == {"alembic_version"}
+
+    migrate("upgrade", "head")
+    assert get_tables(migrate.path) == tables
@@ -0,0 +1,45 @@
+# tests/test_openai.py
+import pytest
+
+@pytest.fixture
+def summary_max_tokens(monkeypatch):
+    """
+    Set SUMMARY_MAX_TOKENS for the test, the room of the text is computed again
+    """
+
+    from services.openai import OpenAIService
+
+    monkeypatch.setattr(OpenAIService, "_chunk_tokens", {})
+
+    def set_summary_max_tokens(value: int):
+        monkeypatch.setattr(OpenAIService, "SUMMARY_MAX_TOKENS", value)
+        OpenAIService._chunk_tokens.clear()
+
+    return set_summary_max_tokens
+
+def get_largest_summary_max_tokens() -> int:
+    from langchain.chains.summarize.map_reduce_prompt import PROMPT
+    from services.llm import LLMService
+    from services.openai import OpenAIService
+
+    model = OpenAIService.SUMMARY_MODEL
+    prompt_tokens = len(LLMService.get_encoding(model).encode(PROMPT.format(text="")))
+    return (LLMService.context_size(model) - prompt_tokens - 2) // 3
+
+def test_summary_max_tokens_leaves_room_for_two_summaries(summary_max_tokens):
+    from services.llm import LLMService
+    from services.openai import OpenAIService
+
+    largest = get_largest_summary_max_tokens()
+    summary_max_tokens(largest)
+    chunk_tokens = OpenAIService.get_chunk_tokens()
+    encoding = LLMService.get_encoding(OpenAIService.SUMMARY_MODEL)
+    summaries = [" ".join(["word"] * largest)] * 5
+
+    # Every reduce prompt of summaries of the largest size fits in the context
+    for group in OpenAIService.group_tokens(summaries, chunk_tokens, encoding):
+        assert len(encoding.encode("\n".join(group))) <= chunk_tokens
+
+    summary_max_tokens(largest + 1)
+    with pytest.raises(ValueError, match=f"set SUMMARY_MAX_TOKENS to at most {largest}"):
+        OpenAIService.get_chunk_tokens()
@@ -0,0 +1,153 @@
+# tests/test_search_index.py
+import threading
+import types
+
+import pytest
+
+from tests.test_summarization_jobs import run_job
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """
+    Search index of its own for the test
+    """
+
+    from services.search_index import SearchIndexService
+
+    monkeypatch.setattr(SearchIndexService, "PATH", str(tmp_path / "search.sqlite3"))
+    # The connections are opened per thread, the ones of the shared index are kept aside
+    monkeypatch.setattr(SearchIndexService, "_connections", threading.local())
+    yield SearchIndexService
+    connection = getattr(SearchIndexService._connections, "connection", None)
+    if connection is not None:
+        connection.close()
+
+def transcript(text: str, segments: list[tuple[float, float, str]] = ()):
+    from schemas.transcript import Transcript, TranscriptSegment
+
+    return Transcript(text=text, segments=[TranscriptSegment(start=start, end=end, text=segment) for start, end, segment in segments])
+
+def test_search_only_reads_the_given_videos(index):
+    index.index_video("videoalpha1", transcript("the quick brown fox"), "a fox story")
+    index.index_video("videobeta01", transcript("a lazy fox sleeps"), "another fox story")
+
+    hits = index.search("fox", ["videoalpha1"], limit=10)
+
+    assert {hit["video_id"] for hit in hits} == {"videoalpha1"}
+    assert {hit["kind"] for hit in hits} == {index.TRANSCRIPT, index.SUMMARY}
+    assert index.search("fox", [], limit=10) == []
+    assert index.search("fox", ["notindexed1"], limit=10) == []
+
+def test_hits_are_timed_by_their_segment_and_stemmed(index):
+    index.index_video("videotimed1", transcript("", [(0.0, 5.0, "an introduction"), (5.0, 12.5, "running the benchmarks")]), "summary")
+
+    [hit] = index.search("run benchmark", ["videotimed1"], limit=10)
+
+    assert (hit["kind"], hit["start"], hit["end"]) == (index.TRANSCRIPT, 5.0, 12.5)
+    assert "**running**" in hit["snippet"]
+    assert hit["score"] > 0
+
+def test_best_matches_of_every_video_come_first(index):
+    index.index_video("videofew001", transcript("a single match among many other words of the transcript"), "summary")
+    index.index_video("videomany01", transcript("match match match"), "summary")
+    index.index_video("videoboth01", transcript("match and match again"), "summary of the match")
+
+    hits = index.search("match", ["videofew001", "videomany01", "videoboth01"], limit=10)
+
+    assert [(hit["video_id"], hit["kind"]) for hit in hits][:2] == [("videomany01", index.TRANSCRIPT), ("videoboth01", index.TRANSCRIPT)]
+    assert hits[-1]["video_id"] == "videofew001"
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+
+def test_reindexing_a_video_replaces_its_passages(index):
+    index.index_video("videoredo01", transcript("an old transcript"), "old summary")
+    index.index_video("videoother1", transcript("an unrelated transcript"), "unrelated summary")
+    index.index_video("videoredo01", transcript("a new transcript"), "new summary")
+
+    assert index.search("old", ["videoredo01"], limit=10) == []
+    assert len(index.search("new", ["videoredo01"], limit=10)) == 2
+    # The passages of the other video keep their rowids
+    assert len(index.search("unrelated", ["videoother1"], limit=10)) == 2
+    ranges = index.get_rowid_ranges(["videoredo01", "videoother1"])
+    assert ranges["videoredo01"][0] > ranges["videoother1"][1]
+
+def test_hits_of_the_videos_are_merged_and_paged(index):
+    video_ids = [f"videopage{i:02d}" for i in range(3)]
+    for i, video_id in enumerate(video_ids):
+        index.index_video(video_id, transcript(" ".join(["match"] * (i + 1) + ["filler"] * 20)), "no hit here")
+
+    hits = index.search("match", video_ids, limit=10)
+    page = index.search("match", video_ids, limit=1, offset=1)
+
+    assert len(hits) == 3
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+    assert page == hits[1:2]
+
+def test_search_without_words_has_no_hits(index):
+    index.index_video("videowords1", transcript("some words"), "summary")
+
+    assert index.build_query("  -- !! ") is None
+    assert index.search("  -- !! ", ["videowords1"], limit=10) == []
+    # The operators of FTS5 are searched as words
+    assert index.build_query('words OR "summary" NEAR(') == '"words" "or" "summary" "near"'
+
+def test_backfill_skips_the_videos_it_cannot_download(index, monkeypatch, caplog):
+    from services.google_storage import GoogleStorageService
+    from services.summarization import SummarizationService
+
+    row = types.SimpleNamespace(youtube_video_id="videofill01", transcription_url="transcript.txt", summarization_url="summary.txt")
+    monkeypatch.setattr(SummarizationService, "get_cached_transcript", lambda video_id: None)
+
+    monkeypatch.setattr(GoogleStorageService, "download_content", lambda blob_name: None)
+    SummarizationService.backfill_search_index(row)
+    assert index.get_missing_video_ids(["videofill01"]) == ["videofill01"]
+
+    def unavailable(blob_name):
+        raise ConnectionError("storage is unavailable")
+
+    monkeypatch.setattr(GoogleStorageService, "download_content", unavailable)
+    SummarizationService.backfill_search_index(row)
+    assert index.get_missing_video_ids(["videofill01"]) == ["videofill01"]
+    assert "Search index backfill of videofill01 failed" in caplog.text
+
+    contents = {"transcript.txt": b"a transcript downloaded later", "summary.txt": b"its summary"}
+    monkeypatch.setattr(GoogleStorageService, "resolve_blob_name", lambda url: url)
+    monkeypatch.setattr(GoogleStorageService, "download_content", contents.get)
+    SummarizationService.backfill_search_index(row)
+    assert index.get_missing_video_ids(["videofill01"]) == []
+    assert [hit["kind"] for hit in index.search("downloaded", ["videofill01"], limit=10)] == [index.TRANSCRIPT]
+
+@pytest.mark.anyio
+async def test_search_only_finds_the_summarizations_of_the_user(client, signup):
+    headers = await signup("searcher@example.com")
+    other = await signup("searchother@example.com")
+    await run_job(client, headers, "searchmine1")
+    await run_job(client, other, "searchother")
+
+    response = await client.get("/summarization/search", params={"q": "word1"}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    hits = response.json()
+    assert hits
+    assert {hit["youtube_video_id"] for hit in hits} == {"searchmine1"}
+    assert all(hit["url"].startswith("https://www.youtube.com/watch?v=searchmine1") for hit in hits)
+
+@pytest.mark.anyio
+async def test_search_indexes_the_videos_summarized_before_the_index(client, signup, index):
+    import anyio
+    from services.summarization import SummarizationService
+
+    headers = await signup("backfill@example.com")
+    await run_job(client, headers, "backfilled1")
+    # Empty the index of the test, as if the video was summarized before the index existed
+    with index.get_connection() as connection:
+        connection.execute("DELETE FROM video_passages")
+        connection.execute("DELETE FROM passages")
+
+    assert (await client.get("/summarization/search", params={"q": "word1"}, headers=headers)).json() == []
+    # The first search scheduled the indexing of the video in the background
+    with anyio.fail_after(10):
+        while SummarizationService._backfilling:
+            await anyio.sleep(0.05)
+
+    hits = (await client.get("/summarization/search", params={"q": "word1"}, headers=headers)).json()
+    assert {hit["youtube_video_id"] for hit in hits} == {"backfilled1"}
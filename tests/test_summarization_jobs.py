@@ -0,0 +1,184 @@
+# tests/test_summarization_jobs.py
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+def url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+def parse_events(text: str) -> list[tuple[str, dict]]:
+    """
+    (event, data) of every event of a Server-Sent Events stream
+    """
+
+    events = []
+    for block in text.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":") and ": " in line)
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+async def run_job(client, headers: dict, video_id: str) -> tuple[dict, list[tuple[str, dict]]]:
+    """
+    Create a job and follow its events until it ends
+    """
+
+    response = await client.post("/summarization/", json={"youtube_video_url": url(video_id)}, headers=headers)
+    assert response.status_code == 202, response.text
+    job = response.json()
+    events = parse_events((await client.get(f"/summarization/jobs/{job['id']}/events", headers=headers)).text)
+    return job, events
+
+def create_job(video_id: str, user_id: int = None, **values) -> int:
+    """
+    Insert a job directly in the database, of a new user unless user_id is given
+    """
+
+    from db import SessionLocal
+    from models.user import UserModel
+    from models.summarization_job import SummarizationJobModel
+
+    db = SessionLocal()
+    try:
+        if user_id is None:
+            user = UserModel(email=f"{video_id}@example.com", password_hash="unused")
+            db.add(user)
+            db.flush()
+            user_id = user.id
+        job = SummarizationJobModel(user_id=user_id, youtube_video_url=url(video_id), youtube_video_id=video_id, **values)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+def get_job(job_id: int):
+    from db import SessionLocal
+    from models.summarization_job import SummarizationJobModel
+
+    db = SessionLocal()
+    try:
+        return db.get(SummarizationJobModel, job_id)
+    finally:
+        db.close()
+
+async def test_job_goes_through_the_pipeline_states(client, signup):
+    from models.summarization_job import SummarizationJobModel
+
+    headers = await signup("states@example.com")
+    job, events = await run_job(client, headers, "statesvideo")
+
+    assert job["state"] == SummarizationJobModel.QUEUED
+    states = [data["state"] for event, data in events if event == "state"]
+    # The stream may start after the first stages, the states it reports never go back
+    order = [SummarizationJobModel.QUEUED, SummarizationJobModel.DOWNLOADING, SummarizationJobModel.TRANSCRIBING, SummarizationJobModel.SUMMARIZING, SummarizationJobModel.DONE]
+    assert states == sorted(states, key=order.index), states
+    assert states[-1] == SummarizationJobModel.DONE
+    event, data = events[-1]
+    assert event == "done"
+    assert data["summarization_id"] is not None
+    assert set(data["timings"]) >= {"queued", "pipeline", "create_summarization"}
+
+async def test_known_video_is_done_without_the_pipeline(client, signup):
+    from models.summarization_job import SummarizationJobModel
+
+    await run_job(client, await signup("first@example.com"), "knownvideo1")
+    response = await client.post("/summarization/", json={"youtube_video_url": url("knownvideo1")}, headers=await signup("second@example.com"))
+
+    assert response.status_code == 202
+    assert response.json()["state"] == SummarizationJobModel.DONE
+
+async def test_events_of_another_users_job_are_not_found(client, signup):
+    job, _ = await run_job(client, await signup("owner@example.com"), "ownedvideo1")
+    response = await client.get(f"/summarization/jobs/{job['id']}/events", headers=await signup("intruder@example.com"))
+
+    assert response.status_code == 404
+
+async def test_concurrent_requests_for_a_known_video_create_one_summarization(client, signup):
+    await run_job(client, await signup("racefirst@example.com"), "racevideo01")
+    headers = await signup("racesecond@example.com")
+
+    responses = await asyncio.gather(*(client.post("/summarization/", json={"youtube_video_url": url("racevideo01")}, headers=headers) for _ in range(5)))
+
+    assert sorted(response.status_code for response in responses) == [202, 400, 400, 400, 400]
+    assert {response.json()["detail"] for response in responses if response.status_code == 400} == {"Summarization for this video & user already exists"}
+    assert len((await client.get("/summarization/", headers=headers)).json()) == 1
+
+async def test_second_job_of_a_user_for_a_video_fails_on_the_unique_key(client, signup):
+    from models.summarization_job import SummarizationJobModel
+    from services.summarization import SummarizationService
+
+    headers = await signup("unique@example.com")
+    first, _ = await run_job(client, headers, "uniquevideo")
+    # A job of the same user created before the first one stored its summarization
+    second = create_job("uniquevideo", user_id=get_job(first["id"]).user_id, state=SummarizationJobModel.QUEUED)
+
+    SummarizationService.run_summarization_job(second)
+
+    job = get_job(second)
+    assert job.state == SummarizationJobModel.FAILED
+    assert job.error == "Summarization for this video & user already exists"
+    assert get_job(first["id"]).state == SummarizationJobModel.DONE
+
+async def test_finished_job_is_not_run_again(client):
+    from models.summarization_job import SummarizationJobModel
+    from services.summarization import SummarizationService
+
+    job_id = create_job("finishedjob", state=SummarizationJobModel.FAILED, error="earlier failure")
+
+    SummarizationService.run_summarization_job(job_id)
+
+    job = get_job(job_id)
+    assert (job.state, job.error) == (SummarizationJobModel.FAILED, "earlier failure")
+
+async def test_job_of_a_live_worker_is_neither_recovered_nor_run(client):
+    from models.summarization_job import SummarizationJobModel
+    from services.summarization import SummarizationService
+
+    job_id = create_job("livelease01", state=SummarizationJobModel.TRANSCRIBING, claimed_by="other-host:1", heartbeat_at=datetime.utcnow())
+
+    SummarizationService.recover_pending_jobs(submit=False)
+    assert job_id not in SummarizationService.claim_queued_jobs(100)
+    SummarizationService.run_summarization_job(job_id)
+
+    job = get_job(job_id)
+    assert (job.state, job.claimed_by) == (SummarizationJobModel.TRANSCRIBING, "other-host:1")
+
+async def test_job_with_an_expired_lease_is_claimed_and_run(client):
+    from models.summarization_job import SummarizationJobModel
+    from services.job_queue import JobQueueService
+    from services.summarization import SummarizationService
+
+    expired = datetime.utcnow() - timedelta(seconds=SummarizationService.JOB_LEASE_SECONDS + 1)
+    job_id = create_job("expiredleas", state=SummarizationJobModel.TRANSCRIBING, claimed_by="other-host:1", heartbeat_at=expired)
+
+    assert job_id in SummarizationService.claim_expired_jobs(100)
+    assert get_job(job_id).claimed_by == JobQueueService.get_worker_id()
+    SummarizationService.run_summarization_job(job_id)
+
+    assert get_job(job_id).state == SummarizationJobModel.DONE
+
+async def test_unavailable_video_fails_and_is_rejected_afterwards(client, signup):
+    headers = await signup("unavailable@example.com")
+    job, events = await run_job(client, headers, "unavailable")
+
+    assert events[-1] == ("failed", {"error": "Video is unavailable"})
+    assert (await client.get(f"/summarization/jobs/{job['id']}", headers=headers)).json()["state"] == "failed"
+    # The failure is remembered, a new request is answered without a job
+    response = await client.post("/summarization/", json={"youtube_video_url": url("unavailable")}, headers=headers)
+    assert response.status_code == 400
+
+async def test_jobs_of_a_dead_worker_are_recovered_before_their_lease_expires(client):
+    from models.summarization_job import SummarizationJobModel
+    from services.summarization import SummarizationService
+
+    job_id = create_job("deadworker1", state=SummarizationJobModel.SUMMARIZING, claimed_by="this-host:4242", heartbeat_at=datetime.utcnow())
+
+    SummarizationService.recover_pending_jobs(submit=False, workers=("this-host:4242",))
+
+    job = get_job(job_id)
+    assert (job.state, job.claimed_by) == (SummarizationJobModel.QUEUED, None)